@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Measures worker time-to-first-request: a fresh interpreter imports main,
+# runs the startup handlers and serves one request, as a gunicorn worker does
+# after a restart. Supabase is replaced by a local stub that answers the
+# storage bucket calls after --storage-latency seconds (a typical round trip
+# to the hosted project), so the numbers do not depend on the network.
+#
+#   python benchmarks/cold_start.py --runs 7
+#   python benchmarks/cold_start.py --runs 7 --storage-latency 0.3 --json
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, os, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+from starlette.testclient import TestClient
+client = TestClient(main.app)
+client.__enter__()  # runs the startup handlers
+t2 = time.perf_counter()
+client.get("/__cold_start_probe")
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "startup_s": t2 - t1,
+    "first_request_s": t3 - t2,
+    "image_stack_loaded": "cv2" in sys.modules,
+}))
+sys.stdout.flush()
+os._exit(0)
+"""
+
+BUCKET = {
+    "id": "problems", "name": "problems", "owner": "", "public": True,
+    "created_at": "2026-01-01T00:00:00Z", "updated_at": "2026-01-01T00:00:00Z",
+    "file_size_limit": None, "allowed_mime_types": None,
+}
+
+
+def start_storage_stub(latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, body):
+            time.sleep(latency)
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._reply([BUCKET] if self.path.startswith("/storage/v1/bucket") else [])
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self._reply({"name": "problems"})
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_once(stub_url: str, work_dir: str, warm_cache: bool) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "SUPABASE_URL": stub_url,
+        "SUPABASE_KEY": "bench.bench.bench",
+        "JOB_DB_PATH": os.path.join(work_dir, "jobs.db"),
+        "IMAGE_CACHE_DIR": os.path.join(work_dir, "image_cache"),
+        "IMPORT_DIR": os.path.join(work_dir, "imports"),
+        "STORAGE_CHECK_CACHE": os.path.join(work_dir, "storage_check.json"),
+    })
+    if not warm_cache and os.path.exists(env["STORAGE_CHECK_CACHE"]):
+        os.remove(env["STORAGE_CHECK_CACHE"])
+
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True)
+    total = time.perf_counter() - start
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["total_s"] = total
+    return result
+
+
+def summarize(runs: list) -> dict:
+    summary = {}
+    for key in ("total_s", "import_s", "startup_s", "first_request_s"):
+        values = [r[key] for r in runs]
+        summary[key] = {"median": statistics.median(values), "min": min(values), "max": max(values)}
+    summary["image_stack_loaded"] = any(r["image_stack_loaded"] for r in runs)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--storage-latency", type=float, default=0.3, help="Seconds per stubbed storage call")
+    parser.add_argument("--warm-cache", action="store_true", help="Keep the storage check cache between runs (worker restarts)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    server = start_storage_stub(args.storage_latency)
+    stub_url = f"http://127.0.0.1:{server.server_address[1]}"
+    with tempfile.TemporaryDirectory() as work_dir:
+        # One untimed run to warm the OS file cache, like a worker restart on a running instance
+        run_once(stub_url, work_dir, args.warm_cache)
+        runs = [run_once(stub_url, work_dir, args.warm_cache) for _ in range(args.runs)]
+    server.shutdown()
+
+    report = {
+        "runs": args.runs,
+        "storage_latency_s": args.storage_latency,
+        "warm_cache": args.warm_cache,
+        "summary": summarize(runs),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{args.runs} runs, storage latency {args.storage_latency * 1000:.0f} ms, "
+          f"{'warm' if args.warm_cache else 'cold'} storage check cache")
+    for key, label in (("total_s", "time to first request"), ("import_s", "import main"),
+                       ("startup_s", "startup handlers"), ("first_request_s", "first request")):
+        s = report["summary"][key]
+        print(f"  {label:<22} median {s['median'] * 1000:7.1f} ms  (min {s['min'] * 1000:.1f}, max {s['max'] * 1000:.1f})")
+    print(f"  image stack loaded at first request: {report['summary']['image_stack_loaded']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+# Accuracy and latency of document detection (utils/image_processing.py) on
+# a synthetic corpus of photographed pages. Each case warps a generated page
+# onto a background with a known quadrilateral, then adds rotation,
+# perspective, a shadow, blur, sensor noise and JPEG compression, so the true
+# corners are known exactly. The corpus is deterministic for a given --seed.
+#
+# For every case the harness runs detect_document_corners, detect_document_bounds
+# and crop_document (what auto_crop_image runs), and reports corner IoU and
+# error, per-stage latency and peak traced memory, by resolution and by
+# background. Detection parameters can be overridden to compare settings:
+#
+#   python benchmarks/document_detection.py
+#   python benchmarks/document_detection.py --cases 40 --resolutions 1600x1200,3024x4032
+#   python benchmarks/document_detection.py --work-height 800 --canny-low 50 --json > tuned.json
+#   python benchmarks/document_detection.py --save-cases /tmp/doc-cases
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from utils import image_processing  # noqa: E402
+
+BACKGROUNDS = ("desk", "wood", "cloth", "dark", "light")
+STAGES = ("decode", "resize", "edges", "contours", "approx")
+# A4 portrait
+PAGE_ASPECT = 297 / 210
+
+
+def parse_resolution(value: str):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def make_page(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+    """White page with rows of dark "text" blocks and an occasional figure."""
+    paper = int(rng.integers(225, 256))
+    page = np.full((height, width, 3), paper, np.uint8)
+    margin = int(width * 0.08)
+    line_height = max(4, int(height * 0.025))
+    y = margin
+    while y + line_height < height - margin:
+        if rng.random() < 0.15:
+            # Figure or blank gap
+            box_h = line_height * int(rng.integers(3, 7))
+            if y + box_h < height - margin and rng.random() < 0.5:
+                x0 = int(rng.integers(margin, width // 2))
+                cv2.rectangle(page, (x0, y), (min(width - margin, x0 + box_h * 2), y + box_h),
+                              (60, 60, 60), max(1, line_height // 6))
+            y += box_h
+            continue
+        x = margin
+        right = width - margin - int(rng.integers(0, width // 3))
+        while x < right:
+            word = int(rng.integers(line_height, line_height * 5))
+            ink = int(rng.integers(10, 90))
+            cv2.rectangle(page, (x, y + line_height // 4), (min(right, x + word), y + line_height),
+                          (ink, ink, ink), -1)
+            x += word + line_height // 2
+        y += int(line_height * 1.8)
+    return page
+
+
+def make_background(rng: np.random.Generator, kind: str, width: int, height: int) -> np.ndarray:
+    small_w, small_h = max(8, width // 8), max(8, height // 8)
+    if kind == "wood":
+        xs = np.linspace(0, rng.uniform(20, 60), small_w)
+        grain = np.sin(xs[None, :] + rng.normal(0, 0.6, (small_h, 1)).cumsum(axis=0) * 0.05)
+        base = np.array(rng.uniform([40, 70, 110], [70, 110, 160]))
+        bg = base[None, None, :] * (1 + 0.2 * grain[:, :, None])
+    elif kind == "cloth":
+        base = rng.uniform(60, 180, 3)
+        bg = base[None, None, :] + rng.normal(0, 25, (small_h, small_w, 1))
+    else:
+        level = {"desk": (90, 170), "dark": (15, 60), "light": (175, 215)}[kind]
+        base = rng.uniform(level[0], level[1], 3)
+        # Low-frequency unevenness
+        bg = base[None, None, :] + cv2.resize(rng.normal(0, 12, (4, 4)), (small_w, small_h))[:, :, None]
+    bg = cv2.resize(np.clip(bg, 0, 255).astype(np.uint8), (width, height), interpolation=cv2.INTER_LINEAR)
+    if kind == "cloth":
+        # Fine weave texture at full resolution
+        bg = cv2.add(bg, rng.integers(0, 20, (height, width, 1), dtype=np.uint8).repeat(3, axis=2))
+    return bg
+
+
+def place_page(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+    """Random rotated, perspective-distorted quadrilateral fully inside the frame."""
+    for _ in range(100):
+        fill = rng.uniform(0.45, 0.8)
+        page_h = min(height, width * PAGE_ASPECT) * fill
+        page_w = page_h / PAGE_ASPECT
+        angle = np.deg2rad(rng.uniform(-20, 20))
+        rect = np.array([[-page_w, -page_h], [page_w, -page_h], [page_w, page_h], [-page_w, page_h]]) / 2
+        # Perspective: move each corner by up to 7% of the page size
+        rect += rng.uniform(-0.07, 0.07, (4, 2)) * [page_w, page_h]
+        rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+        center = [width / 2 + rng.uniform(-0.15, 0.15) * width, height / 2 + rng.uniform(-0.15, 0.15) * height]
+        quad = rect @ rotation.T + center
+        if quad.min() >= 2 and (quad[:, 0] < width - 2).all() and (quad[:, 1] < height - 2).all():
+            return quad.astype(np.float32)
+    raise RuntimeError("Could not place page inside the frame")
+
+
+def add_shadow(rng: np.random.Generator, image: np.ndarray, strength: float) -> np.ndarray:
+    """Darkens one side of the frame with a soft linear falloff, like a hand or phone shadow."""
+    height, width = image.shape[:2]
+    direction = rng.uniform(0, 2 * np.pi)
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    proj = (xs / width - 0.5) * np.cos(direction) + (ys / height - 0.5) * np.sin(direction)
+    edge = rng.uniform(-0.2, 0.3)
+    shade = 1 - strength * np.clip((proj - edge) / 0.25, 0, 1)
+    return (image * shade[:, :, None]).astype(np.uint8)
+
+
+def make_case(rng: np.random.Generator, index: int, width: int, height: int, background: str) -> dict:
+    scale = max(width, height) / 1000
+    quad = place_page(rng, width, height)
+    page_w = int(np.linalg.norm(quad[1] - quad[0]))
+    page_h = int(np.linalg.norm(quad[3] - quad[0]))
+    page = make_page(rng, max(page_w, 16), max(page_h, 16))
+
+    src = np.array([[0, 0], [page.shape[1] - 1, 0], [page.shape[1] - 1, page.shape[0] - 1], [0, page.shape[0] - 1]],
+                   np.float32)
+    M = cv2.getPerspectiveTransform(src, quad)
+    image = make_background(rng, background, width, height)
+    warped = cv2.warpPerspective(page, M, (width, height))
+    mask = cv2.warpPerspective(np.full(page.shape[:2], 255, np.uint8), M, (width, height))
+    image[mask > 0] = warped[mask > 0]
+
+    shadow = float(rng.uniform(0, 0.45)) if rng.random() < 0.6 else 0.0
+    if shadow:
+        image = add_shadow(rng, image, shadow)
+    blur = float(rng.uniform(0, 1.5) * scale)
+    if blur > 0.3:
+        image = cv2.GaussianBlur(image, (0, 0), blur)
+    noise = float(rng.uniform(0, 8))
+    image = np.clip(image + rng.normal(0, noise, image.shape), 0, 255).astype(np.uint8)
+    quality = int(rng.integers(75, 96))
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    assert ok
+
+    return {
+        "id": f"{index:03d}-{width}x{height}-{background}",
+        "resolution": f"{width}x{height}",
+        "background": background,
+        "shadow": round(shadow, 2),
+        "blur_sigma": round(blur, 2),
+        "noise_sigma": round(noise, 2),
+        "jpeg_quality": quality,
+        "corners": image_processing.order_points(quad),
+        "data": encoded.tobytes(),
+    }
+
+
+def build_corpus(resolutions, cases_per_resolution: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for width, height in resolutions:
+        for i in range(cases_per_resolution):
+            corpus.append(make_case(rng, len(corpus), width, height, BACKGROUNDS[i % len(BACKGROUNDS)]))
+    return corpus
+
+
+def polygon_iou(a: np.ndarray, b: np.ndarray, width: int, height: int) -> float:
+    """IoU of two polygons, rasterized at up to 1000px (the detected one need not be convex)."""
+    scale = min(1.0, 1000 / max(width, height))
+    size = (int(height * scale) + 1, int(width * scale) + 1)
+    mask_a = np.zeros(size, np.uint8)
+    mask_b = np.zeros(size, np.uint8)
+    cv2.fillPoly(mask_a, [np.round(a * scale).astype(np.int32)], 1)
+    cv2.fillPoly(mask_b, [np.round(b * scale).astype(np.int32)], 1)
+    union = np.count_nonzero(mask_a | mask_b)
+    return float(np.count_nonzero(mask_a & mask_b) / union) if union else 0.0
+
+
+def rect_iou(a: dict, b: dict) -> float:
+    x0, y0 = max(a["x"], b["x"]), max(a["y"], b["y"])
+    x1 = min(a["x"] + a["width"], b["x"] + b["width"])
+    y1 = min(a["y"] + a["height"], b["y"] + b["height"])
+    inter = max(0, x1 - x0) * max(0, y1 - y0)
+    union = a["width"] * a["height"] + b["width"] * b["height"] - inter
+    return inter / union if union else 0.0
+
+
+def timed(func, repeat: int):
+    """Median wall time of func over repeat calls, and its last result."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def peak_memory(func) -> int:
+    """Peak bytes traced while func runs: NumPy arrays, including the images OpenCV returns."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(case: dict, params: dict, repeat: int) -> dict:
+    data = case["data"]
+    width, height = parse_resolution(case["resolution"])
+    truth = case["corners"]
+
+    stage_runs = {stage: [] for stage in STAGES}
+    corners = None
+    for _ in range(repeat):
+        timings = {}
+        start = time.perf_counter()
+        image = image_processing.decode_image(data)
+        timings["decode"] = time.perf_counter() - start
+        quad, _, ratio = image_processing.find_document_contour(image, timings=timings, **params)
+        for stage in STAGES:
+            stage_runs[stage].append(timings[stage])
+        corners = None if quad is None else image_processing.order_points(quad.reshape(4, 2).astype(np.float32) * ratio)
+
+    bounds_s, bounds = timed(lambda: image_processing.detect_document_bounds(data, **params), repeat)
+    crop_s, cropped = timed(lambda: image_processing.crop_document(data, **params), repeat)
+
+    truth_rect = dict(zip(("x", "y", "width", "height"), cv2.boundingRect(truth)))
+    diagonal = float(np.hypot(width, height))
+    result = {
+        key: case[key] for key in ("id", "resolution", "background", "shadow", "blur_sigma", "noise_sigma", "jpeg_quality")
+    }
+    result.update({
+        "detected": corners is not None,
+        "iou": polygon_iou(corners, truth, width, height) if corners is not None else 0.0,
+        "corner_error_px": None,
+        "corner_error_pct": None,
+        "bounds_iou": rect_iou(bounds, truth_rect),
+        "cropped": cropped is not data,
+        "stages_s": {stage: statistics.median(values) for stage, values in stage_runs.items()},
+        "detect_bounds_s": bounds_s,
+        "crop_s": crop_s,
+        "peak_bytes": {
+            "detect_bounds": peak_memory(lambda: image_processing.detect_document_bounds(data, **params)),
+            "crop": peak_memory(lambda: image_processing.crop_document(data, **params)),
+        },
+    })
+    if corners is not None:
+        errors = np.linalg.norm(corners - truth, axis=1)
+        result["corner_error_px"] = float(errors.mean())
+        result["corner_error_pct"] = float(errors.mean() / diagonal * 100)
+        result["corner_error_max_px"] = float(errors.max())
+    return result
+
+
+def percentile(values: list, pct: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarize(results: list) -> dict:
+    detected = [r for r in results if r["detected"]]
+    errors = [r["corner_error_pct"] for r in detected]
+    ious = [r["iou"] for r in results]
+    summary = {
+        "cases": len(results),
+        "detection_rate": len(detected) / len(results) if results else 0.0,
+        # Accurate: corners within 1% of the image diagonal on average
+        "accurate_rate": sum(1 for e in errors if e <= 1.0) / len(results) if results else 0.0,
+        "iou_mean": statistics.mean(ious) if ious else 0.0,
+        "iou_p10": percentile(ious, 10),
+        "bounds_iou_mean": statistics.mean(r["bounds_iou"] for r in results) if results else 0.0,
+        "corner_error_pct_p50": percentile(errors, 50),
+        "corner_error_pct_p90": percentile(errors, 90),
+        "latency_ms": {},
+        "peak_mb": {
+            "detect_bounds": max(r["peak_bytes"]["detect_bounds"] for r in results) / 2 ** 20 if results else 0.0,
+            "crop": max(r["peak_bytes"]["crop"] for r in results) / 2 ** 20 if results else 0.0,
+        },
+    }
+    series = {stage: [r["stages_s"][stage] for r in results] for stage in STAGES}
+    series["detect_bounds"] = [r["detect_bounds_s"] for r in results]
+    series["crop"] = [r["crop_s"] for r in results]
+    for name, values in series.items():
+        summary["latency_ms"][name] = {"p50": percentile(values, 50) * 1000, "p95": percentile(values, 95) * 1000}
+    return summary
+
+
+def group_by(results: list, key: str) -> dict:
+    groups = {}
+    for r in results:
+        groups.setdefault(r[key], []).append(r)
+    return {name: summarize(rows) for name, rows in groups.items()}
+
+
+def print_summary(label: str, s: dict):
+    error = "-" if s["corner_error_pct_p50"] is None else f"{s['corner_error_pct_p50']:.2f}%/{s['corner_error_pct_p90']:.2f}%"
+    lat = s["latency_ms"]
+    print(f"  {label:<12} n={s['cases']:<4} found {s['detection_rate'] * 100:5.1f}%  accurate {s['accurate_rate'] * 100:5.1f}%  "
+          f"IoU {s['iou_mean']:.3f} (p10 {s['iou_p10']:.3f})  bounds IoU {s['bounds_iou_mean']:.3f}  "
+          f"corner err p50/p90 {error}  "
+          f"bounds {lat['detect_bounds']['p50']:6.1f} ms  crop {lat['crop']['p50']:6.1f} ms  "
+          f"peak {s['peak_mb']['crop']:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Document detection accuracy and latency benchmark")
+    parser.add_argument("--resolutions", default="1024x768,2016x1512,3024x4032",
+                        help="Comma-separated WIDTHxHEIGHT list")
+    parser.add_argument("--cases", type=int, default=20, help="Cases per resolution (backgrounds rotate)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (median is reported)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--work-height", type=int, default=image_processing.DETECT_WORK_HEIGHT)
+    parser.add_argument("--canny-low", type=int, default=image_processing.DETECT_CANNY_LOW)
+    parser.add_argument("--canny-high", type=int, default=image_processing.DETECT_CANNY_HIGH)
+    parser.add_argument("--max-contours", type=int, default=image_processing.DETECT_MAX_CONTOURS)
+    parser.add_argument("--epsilon", type=float, default=image_processing.DETECT_APPROX_EPSILON,
+                        help="approxPolyDP epsilon as a fraction of the contour perimeter")
+    parser.add_argument("--save-cases", metavar="DIR", help="Write the generated images and true corners to DIR")
+    parser.add_argument("--json", action="store_true", help="Print the report (with per-case results) as JSON")
+    args = parser.parse_args()
+
+    params = {
+        "work_height": args.work_height,
+        "canny_low": args.canny_low,
+        "canny_high": args.canny_high,
+        "max_contours": args.max_contours,
+        "approx_epsilon": args.epsilon,
+    }
+    resolutions = [parse_resolution(r) for r in args.resolutions.split(",") if r]
+    corpus = build_corpus(resolutions, args.cases, args.seed)
+
+    if args.save_cases:
+        os.makedirs(args.save_cases, exist_ok=True)
+        for case in corpus:
+            with open(os.path.join(args.save_cases, f"{case['id']}.jpg"), "wb") as f:
+                f.write(case["data"])
+        with open(os.path.join(args.save_cases, "corners.json"), "w") as f:
+            json.dump({case["id"]: case["corners"].tolist() for case in corpus}, f, indent=2)
+
+    # Warm up OpenCV (thread pool, codec tables) outside the measurements
+    run_case(corpus[0], params, 1)
+    results = [run_case(case, params, args.repeat) for case in corpus]
+
+    report = {
+        "params": params,
+        "seed": args.seed,
+        "overall": summarize(results),
+        "by_resolution": group_by(results, "resolution"),
+        "by_background": group_by(results, "background"),
+    }
+    if args.json:
+        report["cases"] = results
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{len(results)} cases, params " + ", ".join(f"{k}={v}" for k, v in params.items()))
+    print_summary("overall", report["overall"])
+    print("by resolution")
+    for name, s in report["by_resolution"].items():
+        print_summary(name, s)
+    print("by background")
+    for name, s in report["by_background"].items():
+        print_summary(name, s)
+    print("stage latency p50 / p95 (ms)")
+    for name, s in report["by_resolution"].items():
+        stages = "  ".join(f"{stage} {s['latency_ms'][stage]['p50']:.1f}/{s['latency_ms'][stage]['p95']:.1f}"
+                           for stage in STAGES)
+        print(f"  {name:<12} {stages}")
+    misses = [r["id"] for r in results if not r["detected"]]
+    if misses:
+        print(f"no quadrilateral found: {', '.join(misses[:10])}{' ...' if len(misses) > 10 else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,905 @@
+import argparse
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+# In-memory stand-in for the Supabase project, so the API can be run and
+# load tested locally without a live backend:
+#
+#   python benchmarks/supabase_stub.py --port 54321 --latency 0.01
+#   SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=stub.stub.stub uvicorn main:app --port 8000
+#
+# It speaks the subset of the PostgREST and Storage HTTP APIs that the
+# supabase client sends for this app: selects with embedded resources
+# (hints(...), problems!inner(user_id)), eq/neq/gt/gte/lt/lte/in/is/like
+# filters, or=(...), order, limit/offset, exact counts, single-object
+# responses, insert/upsert/update/delete with primary key, unique, foreign
+# key and ON DELETE rules, the RPCs in RPCS, and bucket objects.
+#
+# Tables, keys and defaults are read from schema.sql and the migrations in
+# sql/, in the order they are applied to the hosted project. There are no
+# transactions or row level security; every statement runs under one lock
+# and all data is lost on exit. --latency adds a fixed delay to every
+# response, like the round trip to the hosted project.
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_FILES = [os.path.join(BACKEND_DIR, "schema.sql")] + [
+    os.path.join(BACKEND_DIR, "sql", name) for name in sorted(os.listdir(os.path.join(BACKEND_DIR, "sql")))
+    if name.endswith(".sql")
+]
+CURRICULUM_PATH = os.path.join(BACKEND_DIR, "db", "curriculum_2022_revised.json")
+
+
+class PostgrestError(Exception):
+    def __init__(self, status: int, code: str, message: str, details: Optional[str] = None):
+        super().__init__(message)
+        self.status = status
+        self.body = {"code": code, "details": details, "hint": None, "message": message}
+
+
+# --- Schema ---
+
+class Column:
+    def __init__(self, name: str, type_: str, default=None, not_null: bool = False, identity: bool = False):
+        self.name = name
+        self.type = type_
+        self.default = default
+        self.not_null = not_null
+        self.identity = identity
+
+
+class Table:
+    def __init__(self, name: str):
+        self.name = name
+        self.columns: Dict[str, Column] = {}
+        self.primary_key: Tuple[str, ...] = ()
+        self.unique: List[Tuple[str, ...]] = []
+        self.references: Dict[str, Tuple[str, str, Optional[str]]] = {}  # column -> (table, column, on delete)
+
+    @property
+    def identity(self) -> Optional[str]:
+        return next((c.name for c in self.columns.values() if c.identity), None)
+
+    @property
+    def indexed(self) -> List[str]:
+        # Equality lookups on keys are served from an index instead of a scan
+        return sorted(set(self.primary_key[:1]) | set(self.references))
+
+
+def column_type(sql_type: str) -> str:
+    sql_type = sql_type.upper()
+    if sql_type.startswith(("BIGINT", "INTEGER", "INT", "SMALLINT")):
+        return "int"
+    if sql_type.startswith("BOOLEAN"):
+        return "bool"
+    if sql_type.startswith("TIMESTAMP"):
+        return "timestamp"
+    if sql_type.startswith("DATE"):
+        return "date"
+    if sql_type.startswith("JSON"):
+        return "json"
+    return "text"
+
+
+def column_default(expression: Optional[str]):
+    if expression is None:
+        return None
+    if "now()" in expression.lower():
+        return "now"
+    if expression.startswith("'"):
+        return expression.strip("'")
+    if expression.upper() in ("TRUE", "FALSE"):
+        return expression.upper() == "TRUE"
+    try:
+        return int(expression)
+    except ValueError:
+        return None
+
+
+def parse_column(table: Table, line: str):
+    column_name, rest = line.split(None, 1)
+    default = re.search(r"DEFAULT\s+(timezone\(.*?\)\)|'[^']*'|\S+)", rest, re.I)
+    table.columns[column_name] = Column(column_name, column_type(rest), column_default(default and default.group(1)),
+                                        not_null="NOT NULL" in rest or "PRIMARY KEY" in rest, identity="IDENTITY" in rest)
+    if "PRIMARY KEY" in rest:
+        table.primary_key = (column_name,)
+    if re.search(r"\bUNIQUE\b", rest):
+        table.unique.append((column_name,))
+    ref = re.search(r"REFERENCES (?:public\.)?(\w+)\((\w+)\)(?: ON DELETE (CASCADE|SET NULL))?", rest)
+    if ref:
+        table.references[column_name] = ref.groups()
+
+
+def parse_schema(paths: List[str]) -> Dict[str, Table]:
+    tables = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            sql = re.sub(r"--[^\n]*", "", f.read())
+        for name, body in re.findall(r"CREATE TABLE IF NOT EXISTS (?:public\.)?(\w+)\s*\((.*?)\n\);", sql, re.S):
+            if name in tables:
+                continue
+            table = tables[name] = Table(name)
+            for line in body.split("\n"):
+                line = line.strip().rstrip(",")
+                key = re.match(r"PRIMARY KEY\s*\(([^)]*)\)", line)
+                if key:
+                    table.primary_key = tuple(c.strip() for c in key.group(1).split(","))
+                elif line:
+                    parse_column(table, line)
+        for name, line in re.findall(r"ALTER TABLE (?:public\.)?(\w+) ADD COLUMN IF NOT EXISTS ([^;]+);", sql):
+            if line.split(None, 1)[0] not in tables[name].columns:
+                parse_column(tables[name], line)
+        for name, columns_ in re.findall(r"CREATE UNIQUE INDEX IF NOT EXISTS \w+ ON (?:public\.)?(\w+)\(([^)]*)\)", sql):
+            tables[name].unique.append(tuple(c.strip() for c in columns_.split(",")))
+    return tables
+
+
+# --- Values ---
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def parse_timestamp(value) -> datetime:
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc)
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00").replace(" ", "T"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def store_value(column: Column, value):
+    """Normalizes a JSON value from a request body to what the column holds."""
+    if value is None:
+        return None
+    try:
+        if column.type == "int":
+            return int(value)
+        if column.type == "bool":
+            return value if isinstance(value, bool) else str(value).lower() == "true"
+        if column.type == "timestamp":
+            return parse_timestamp(value).isoformat()
+        if column.type == "date":
+            return date.fromisoformat(str(value)[:10]).isoformat()
+    except (TypeError, ValueError):
+        raise PostgrestError(400, "22P02", f'invalid input syntax for type {column.type}: "{value}"')
+    return value
+
+
+def sort_key(column: Optional[Column], value):
+    """Comparable form of a stored value or a filter literal."""
+    if value is None:
+        return None
+    if column is None:
+        return value
+    if column.type == "timestamp":
+        return parse_timestamp(value)
+    if column.type == "int":
+        return int(value)
+    if column.type == "bool":
+        return value if isinstance(value, bool) else str(value).lower() == "true"
+    return str(value)
+
+
+def split_top(text: str, sep: str = ",") -> List[str]:
+    """Splits on sep outside parentheses and double quotes."""
+    parts, depth, quoted, current = [], 0, False, ""
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == sep and depth == 0 and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += ch
+    if current:
+        parts.append(current)
+    return [p.strip() for p in parts if p.strip()]
+
+
+# --- Filters ---
+
+class Condition:
+    """One PostgREST filter, e.g. user_id=eq.5, or an or=(...)/and=(...) group."""
+
+    def __init__(self, column: Optional[str], operator: str, value, negate: bool = False, children=None):
+        self.column = column
+        self.operator = operator
+        self.value = value
+        self.negate = negate
+        self.children = children or []
+
+    @classmethod
+    def parse(cls, column: str, expression: str) -> "Condition":
+        negate = expression.startswith("not.")
+        if negate:
+            expression = expression[4:]
+        operator, _, value = expression.partition(".")
+        if operator == "in":
+            value = [v.strip('"') for v in split_top(value.strip()[1:-1])]
+        elif operator == "is":
+            value = {"null": None, "true": True, "false": False}.get(value.lower(), value)
+        return cls(column, operator, value, negate)
+
+    @classmethod
+    def parse_group(cls, operator: str, expression: str, negate: bool = False) -> "Condition":
+        children = []
+        for part in split_top(expression.strip()[1:-1]):
+            group = re.match(r"(not\.)?(or|and)(\(.*\))$", part)
+            if group:
+                children.append(cls.parse_group(group.group(2), group.group(3), bool(group.group(1))))
+            else:
+                column, _, rest = part.partition(".")
+                children.append(cls.parse(column, rest))
+        return cls(None, operator, None, negate, children)
+
+    def matches(self, table: Table, row: dict) -> bool:
+        if self.operator in ("or", "and"):
+            results = (child.matches(table, row) for child in self.children)
+            result = any(results) if self.operator == "or" else all(results)
+            return result != self.negate
+        return self._compare(table.columns.get(self.column), row.get(self.column)) != self.negate
+
+    def _compare(self, column: Optional[Column], actual) -> bool:
+        op = self.operator
+        if op == "is":
+            return actual is self.value if self.value is None else actual == self.value
+        if actual is None:
+            return False
+        if op == "in":
+            return sort_key(column, actual) in {sort_key(column, v) for v in self.value}
+        if op in ("like", "ilike"):
+            pattern = "^" + re.escape(str(self.value)).replace(r"\*", ".*").replace("%", ".*") + "$"
+            return re.match(pattern, str(actual), re.I if op == "ilike" else 0) is not None
+        left, right = sort_key(column, actual), sort_key(column, self.value)
+        if op == "eq":
+            return left == right
+        if op == "neq":
+            return left != right
+        if op == "gt":
+            return left > right
+        if op == "gte":
+            return left >= right
+        if op == "lt":
+            return left < right
+        if op == "lte":
+            return left <= right
+        raise PostgrestError(400, "PGRST100", f'"{op}" is not a supported operator')
+
+
+# --- Database ---
+
+class Embed:
+    def __init__(self, name: str, inner: bool, relationship: Tuple[str, str, bool], columns_: List[str], embeds: list):
+        self.name = name
+        self.inner = inner
+        self.local, self.remote, self.many = relationship
+        self.columns = columns_
+        self.embeds = embeds
+        self.conditions: List[Condition] = []
+
+
+class Database:
+    def __init__(self, tables: Dict[str, Table]):
+        self.tables = tables
+        self.rows: Dict[str, Dict[int, dict]] = {name: {} for name in tables}  # rowid -> row
+        self.indexes: Dict[str, Dict[str, Dict[object, set]]] = {
+            name: {column: {} for column in table.indexed} for name, table in tables.items()
+        }
+        self.sequences: Dict[str, int] = {name: 0 for name in tables}
+        self._rowids = 0
+        self.lock = threading.RLock()
+
+    def table(self, name: str) -> Table:
+        if name not in self.tables:
+            raise PostgrestError(404, "42P01", f'relation "public.{name}" does not exist')
+        return self.tables[name]
+
+    # Indexes
+
+    def _index_add(self, name: str, rowid: int, row: dict):
+        for column, index in self.indexes[name].items():
+            index.setdefault(row.get(column), set()).add(rowid)
+
+    def _index_remove(self, name: str, rowid: int, row: dict):
+        for column, index in self.indexes[name].items():
+            ids = index.get(row.get(column))
+            if ids:
+                ids.discard(rowid)
+                if not ids:
+                    del index[row.get(column)]
+
+    def _candidates(self, name: str, conditions: List[Condition]):
+        """Row ids that can match, narrowed by an eq/in condition on an indexed column."""
+        table = self.tables[name]
+        for condition in conditions:
+            index = self.indexes[name].get(condition.column)
+            if index is None or condition.negate or condition.operator not in ("eq", "in"):
+                continue
+            column = table.columns[condition.column]
+            values = condition.value if condition.operator == "in" else [condition.value]
+            ids = set()
+            for value in values:
+                ids |= index.get(sort_key(column, value), set())
+            return sorted(ids)
+        return list(self.rows[name])
+
+    def find(self, name: str, conditions: List[Condition]) -> List[Tuple[int, dict]]:
+        table = self.tables[name]
+        rows = self.rows[name]
+        return [(rowid, rows[rowid]) for rowid in self._candidates(name, conditions)
+                if all(c.matches(table, rows[rowid]) for c in conditions)]
+
+    # Relationships
+
+    def relationship(self, name: str, target: str) -> Tuple[str, str, bool]:
+        """(local column, target column, many) for embedding target into rows of name."""
+        table, other = self.tables[name], self.table(target)
+        outgoing = [(col, ref[1]) for col, ref in table.references.items() if ref[0] == target]
+        incoming = [(ref[1], col) for col, ref in other.references.items() if ref[0] == name]
+        if len(outgoing) + len(incoming) != 1:
+            raise PostgrestError(300 if outgoing or incoming else 400, "PGRST201" if outgoing or incoming else "PGRST200",
+                                 f"Could not embed '{target}' in '{name}' (found {len(outgoing) + len(incoming)} relationships)")
+        if outgoing:
+            return outgoing[0][0], outgoing[0][1], False
+        return incoming[0][0], incoming[0][1], True
+
+    # Reads
+
+    def parse_select(self, name: str, select: str) -> Tuple[List[str], List[Embed]]:
+        table = self.tables[name]
+        columns_, embeds = [], []
+        for item in split_top(select or "*"):
+            embed = re.match(r"(\w+)(?:!(\w+))?\((.*)\)$", item, re.S)
+            if embed:
+                target, hint, inner_select = embed.groups()
+                relationship = self.relationship(name, target)
+                embeds.append(Embed(target, hint == "inner", relationship, *self.parse_select(target, inner_select)))
+                continue
+            if item == "*":
+                columns_.extend(table.columns)
+            elif item in table.columns:
+                columns_.append(item)
+            else:
+                raise PostgrestError(400, "42703", f"column {name}.{item} does not exist")
+        return columns_, embeds
+
+    def render(self, name: str, row: dict, columns_: List[str], embeds: List[Embed]) -> Optional[dict]:
+        """The row as PostgREST returns it, or None when an inner embed has no match."""
+        out = {column: row.get(column) for column in columns_}
+        for embed in embeds:
+            related = self.find(embed.name, [Condition(embed.remote, "eq", row.get(embed.local))] + embed.conditions) \
+                if row.get(embed.local) is not None else []
+            rendered = [r for r in (self.render(embed.name, sub, embed.columns, embed.embeds) for _, sub in related) if r is not None]
+            if embed.many:
+                out[embed.name] = rendered
+            else:
+                out[embed.name] = rendered[0] if rendered else None
+            if embed.inner and not rendered:
+                return None
+        return out
+
+    def select(self, name: str, select: str, conditions: List[Condition], embedded: Dict[str, List[Condition]],
+               order: List[Tuple[str, bool, bool]], limit: Optional[int], offset: int) -> Tuple[List[dict], int]:
+        table = self.table(name)
+        columns_, embeds = self.parse_select(name, select)
+        for embed in embeds:
+            embed.conditions = embedded.get(embed.name, [])
+        matched = [row for _, row in self.find(name, conditions)]
+        for column, descending, nulls_first in reversed(order):
+            if column not in table.columns:
+                raise PostgrestError(400, "42703", f"column {name}.{column} does not exist")
+            present = [r for r in matched if r.get(column) is not None]
+            missing = [r for r in matched if r.get(column) is None]
+            present.sort(key=lambda r: sort_key(table.columns[column], r[column]), reverse=descending)
+            matched = missing + present if nulls_first else present + missing
+        rendered = [r for r in (self.render(name, row, columns_, embeds) for row in matched) if r is not None]
+        total = len(rendered)
+        end = None if limit is None else offset + limit
+        return rendered[offset:end], total
+
+    # Writes
+
+    def _check_row(self, name: str, row: dict, rowid: Optional[int] = None, pending: List[dict] = ()):
+        table = self.tables[name]
+        for column in table.columns.values():
+            if column.not_null and row.get(column.name) is None:
+                raise PostgrestError(400, "23502", f'null value in column "{column.name}" of relation "{name}" violates not-null constraint')
+        for column, (target, target_column, _) in table.references.items():
+            value = row.get(column)
+            if value is None or (target == name and any(p.get(target_column) == value for p in pending)):
+                continue
+            if not self.find(target, [Condition(target_column, "eq", value)]):
+                raise PostgrestError(409, "23503", f'insert or update on table "{name}" violates foreign key constraint',
+                                     f'Key ({column})=({value}) is not present in table "{target}".')
+        for key in self.unique_keys(name):
+            values = tuple(row.get(c) for c in key)
+            if None in values:
+                continue
+            conditions = [Condition(c, "eq", v) for c, v in zip(key, values)]
+            clash = [rid for rid, _ in self.find(name, conditions) if rid != rowid]
+            if clash or any(tuple(p.get(c) for c in key) == values for p in pending):
+                raise PostgrestError(409, "23505", f'duplicate key value violates unique constraint on "{name}"',
+                                     f"Key ({', '.join(key)})=({', '.join(map(str, values))}) already exists.")
+
+    def unique_keys(self, name: str) -> List[Tuple[str, ...]]:
+        table = self.tables[name]
+        return ([table.primary_key] if table.primary_key else []) + table.unique
+
+    def _new_row(self, name: str, values: dict) -> dict:
+        table = self.tables[name]
+        row = {}
+        for column in table.columns.values():
+            if column.name in values:
+                row[column.name] = store_value(column, values[column.name])
+            elif column.identity:
+                self.sequences[name] += 1
+                row[column.name] = self.sequences[name]
+            elif column.default == "now":
+                row[column.name] = now_iso()
+            else:
+                row[column.name] = column.default
+        identity = table.identity
+        if identity and identity in values and row[identity] is not None:
+            self.sequences[name] = max(self.sequences[name], row[identity])
+        return row
+
+    def _store(self, name: str, row: dict):
+        self._rowids += 1
+        self.rows[name][self._rowids] = row
+        self._index_add(name, self._rowids, row)
+
+    def _unknown_columns(self, name: str, rows: List[dict]):
+        table = self.tables[name]
+        for row in rows:
+            for column in row:
+                if column not in table.columns:
+                    raise PostgrestError(400, "PGRST204", f"Could not find the '{column}' column of '{name}' in the schema cache")
+
+    def insert(self, name: str, rows: List[dict], on_conflict: Optional[List[str]] = None,
+               resolution: Optional[str] = None) -> List[dict]:
+        table = self.table(name)
+        self._unknown_columns(name, rows)
+        key = tuple(on_conflict or table.primary_key)
+        inserts, updates, result = [], [], []
+        for values in rows:
+            existing = None
+            if resolution and all(values.get(c) is not None for c in key):
+                existing = self.find(name, [Condition(c, "eq", values[c]) for c in key])
+            if existing:
+                if resolution == "merge-duplicates":
+                    rowid, row = existing[0]
+                    merged = {**row, **{c: store_value(table.columns[c], v) for c, v in values.items()}}
+                    self._check_row(name, merged, rowid)
+                    updates.append((rowid, row, merged))
+                continue
+            row = self._new_row(name, values)
+            self._check_row(name, row, pending=inserts)
+            inserts.append(row)
+        for rowid, row, merged in updates:
+            self._replace(name, rowid, row, merged)
+            result.append(dict(merged))
+        for row in inserts:
+            self._store(name, row)
+            result.append(dict(row))
+        return result
+
+    def _replace(self, name: str, rowid: int, row: dict, new_row: dict):
+        self._index_remove(name, rowid, row)
+        row.clear()
+        row.update(new_row)
+        self._index_add(name, rowid, row)
+
+    def update(self, name: str, values: dict, conditions: List[Condition]) -> List[dict]:
+        table = self.table(name)
+        self._unknown_columns(name, [values])
+        changes = {c: store_value(table.columns[c], v) for c, v in values.items()}
+        matched = self.find(name, conditions)
+        new_rows = [(rowid, row, {**row, **changes}) for rowid, row in matched]
+        for rowid, _, new_row in new_rows:
+            self._check_row(name, new_row, rowid)
+        for rowid, row, new_row in new_rows:
+            self._replace(name, rowid, row, new_row)
+        return [dict(row) for _, row, _ in new_rows]
+
+    def delete(self, name: str, conditions: List[Condition]) -> List[dict]:
+        self.table(name)
+        doomed: Dict[str, Dict[int, dict]] = {}
+        nulled: List[Tuple[str, int, dict, str]] = []
+        self._collect_delete(name, self.find(name, conditions), doomed, nulled)
+        for table_name, rowid, row, column in nulled:
+            if rowid not in doomed.get(table_name, {}):
+                self._replace(table_name, rowid, row, {**row, column: None})
+        for table_name, rows in doomed.items():
+            for rowid, row in rows.items():
+                self._index_remove(table_name, rowid, row)
+                del self.rows[table_name][rowid]
+        return [dict(row) for row in doomed.get(name, {}).values()]
+
+    def _collect_delete(self, name: str, matched: List[Tuple[int, dict]], doomed: dict, nulled: list):
+        new = [(rowid, row) for rowid, row in matched if rowid not in doomed.setdefault(name, {})]
+        for rowid, row in new:
+            doomed[name][rowid] = row
+        for child_name, child in self.tables.items():
+            for column, (target, target_column, on_delete) in child.references.items():
+                if target != name:
+                    continue
+                keys = [row[target_column] for _, row in new if row.get(target_column) is not None]
+                if not keys:
+                    continue
+                referencing = [(rid, r) for rid, r in self.find(child_name, [Condition(column, "in", keys)])
+                               if rid not in doomed.get(child_name, {})]
+                if not referencing:
+                    continue
+                if on_delete == "CASCADE":
+                    self._collect_delete(child_name, referencing, doomed, nulled)
+                elif on_delete == "SET NULL":
+                    nulled.extend((child_name, rid, r, column) for rid, r in referencing)
+                else:
+                    raise PostgrestError(409, "23503", f'update or delete on table "{name}" violates foreign key constraint on table "{child_name}"')
+
+
+# --- RPC ---
+
+def record_daily_activity(db: Database, p_user_id: int, p_items: List[dict]):
+    days = {}
+    for item in p_items:
+        if item.get("solve_log_id") is not None:
+            applied = {"user_id": p_user_id, "solve_log_id": item["solve_log_id"]}
+            if not db.insert("user_daily_solve_logs", [applied], resolution="ignore-duplicates"):
+                continue
+        day = days.setdefault(item["activity_date"], {"attempts": 0, "correct": 0, "total_time_spent": 0, "distinct_problems": 0})
+        day["attempts"] += 1
+        day["correct"] += bool(item.get("is_correct"))
+        day["total_time_spent"] += item.get("time_spent") or 0
+        seen = {"user_id": p_user_id, "activity_date": item["activity_date"], "problem_id": item["problem_id"]}
+        day["distinct_problems"] += len(db.insert("user_daily_problems", [seen], resolution="ignore-duplicates"))
+    for activity_date, totals in days.items():
+        key = [Condition("user_id", "eq", p_user_id), Condition("activity_date", "eq", activity_date)]
+        existing = db.find("user_daily_activity", key)
+        if existing:
+            row = existing[0][1]
+            db.update("user_daily_activity", {k: row[k] + v for k, v in totals.items()}, key)
+        else:
+            db.insert("user_daily_activity", [{"user_id": p_user_id, "activity_date": activity_date, **totals}])
+
+
+def record_recent_targets(db: Database, p_items: List[dict]):
+    for item in p_items:
+        if item["target_type"] == "folder":
+            owned = db.find("folders", [Condition("folder_id", "eq", item["target_id"]), Condition("user_id", "eq", item["user_id"])])
+        else:
+            owned = db.find("curriculums", [Condition("curriculum_id", "eq", item["target_id"])])
+        if not owned:
+            continue
+        key = [Condition(c, "eq", item[c]) for c in ("user_id", "target_type", "target_id")]
+        existing = db.find("recent_targets", key)
+        if existing:
+            row = existing[0][1]
+            last_used_at = max(parse_timestamp(row["last_used_at"]), parse_timestamp(item["last_used_at"]))
+            db.update("recent_targets", {"last_used_at": last_used_at.isoformat(), "use_count": row["use_count"] + item["uses"]}, key)
+        else:
+            db.insert("recent_targets", [{c: item[c] for c in ("user_id", "target_type", "target_id", "last_used_at")}
+                                         | {"use_count": item["uses"]}])
+
+
+RPCS = {
+    "record_daily_activity": record_daily_activity,
+    "record_recent_targets": record_recent_targets,
+}
+
+
+def seed_curriculums(db: Database, path: str) -> int:
+    with open(path, encoding="utf-8") as f:
+        tree = json.load(f)
+    count = 0
+
+    def walk(nodes: list, parent_id, level: int):
+        nonlocal count
+        for position, node in enumerate(nodes, start=1):
+            row = db.insert("curriculums", [{"name": node["name"], "parent_id": parent_id, "level": level,
+                                             "sort_order": int(node.get("sort_order", position))}])[0]
+            count += 1
+            walk(node.get("children") or [], row["curriculum_id"], level + 1)
+
+    walk(tree, None, 1)
+    return count
+
+
+# --- Storage ---
+
+class Bucket:
+    def __init__(self, name: str, public: bool):
+        self.name = name
+        self.public = public
+        self.created_at = now_iso()
+        self.objects: Dict[str, Tuple[bytes, str, str]] = {}  # path -> (data, content type, created_at)
+
+    def describe(self) -> dict:
+        return {"id": self.name, "name": self.name, "owner": "", "public": self.public,
+                "created_at": self.created_at, "updated_at": self.created_at,
+                "file_size_limit": None, "allowed_mime_types": None}
+
+    def list(self, prefix: str, limit: int, offset: int) -> List[dict]:
+        prefix = prefix.strip("/")
+        start = prefix + "/" if prefix else ""
+        entries = {}
+        for path, (data, content_type, created_at) in self.objects.items():
+            if not path.startswith(start):
+                continue
+            name, _, rest = path[len(start):].partition("/")
+            if rest:
+                entries.setdefault(name, {"name": name, "id": None, "updated_at": None, "created_at": None,
+                                          "last_accessed_at": None, "metadata": None})
+            else:
+                entries[name] = {"name": name, "id": str(uuid.uuid5(uuid.NAMESPACE_URL, path)),
+                                 "updated_at": created_at, "created_at": created_at, "last_accessed_at": created_at,
+                                 "metadata": {"size": len(data), "mimetype": content_type}}
+        return [entries[name] for name in sorted(entries)][offset:offset + limit]
+
+
+def multipart_file(body: bytes, content_type: str) -> Tuple[bytes, str]:
+    boundary = re.search(r"boundary=([^;]+)", content_type).group(1).strip('"').encode()
+    for part in body.split(b"--" + boundary):
+        head, _, data = part.partition(b"\r\n\r\n")
+        if b'name="file"' in head:
+            part_type = re.search(rb"Content-Type:\s*([^\r\n]+)", head, re.I)
+            return data[:-2] if data.endswith(b"\r\n") else data, part_type.group(1).decode() if part_type else "application/octet-stream"
+    raise ValueError("No file part in upload")
+
+
+class SupabaseStub:
+    def __init__(self, schema_files: List[str] = SCHEMA_FILES, latency: float = 0.0):
+        self.db = Database(parse_schema(schema_files))
+        self.buckets: Dict[str, Bucket] = {}
+        self.latency = latency
+        self.requests = 0
+        self.lock = self.db.lock
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "rows": {name: len(rows) for name, rows in self.db.rows.items()},
+                "objects": {name: len(bucket.objects) for name, bucket in self.buckets.items()},
+            }
+
+    # PostgREST
+
+    def rest(self, method: str, table: str, query: List[Tuple[str, str]], headers, body) -> Tuple[int, dict, object]:
+        prefer = {p.strip().split("=")[0]: (p.strip().split("=") + [""])[1]
+                  for p in (headers.get("Prefer") or "").split(",") if p.strip()}
+        params, conditions, embedded = {}, [], {}
+        for key, value in query:
+            if key in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+                params[key] = value
+            elif key in ("or", "and", "not.or", "not.and"):
+                conditions.append(Condition.parse_group(key.split(".")[-1], value, key.startswith("not.")))
+            elif "." in key:
+                target, column = key.rsplit(".", 1)
+                embedded.setdefault(target, []).append(Condition.parse(column, value))
+            else:
+                conditions.append(Condition.parse(key, value))
+
+        extra = {}
+        with self.lock:
+            if table.startswith("rpc/"):
+                function = RPCS.get(table[4:])
+                if function is None:
+                    raise PostgrestError(404, "PGRST202", f"Could not find the function public.{table[4:]} in the schema cache")
+                result = function(self.db, **(body or {}))
+                return (204, extra, None) if result is None else (200, extra, result)
+            if method == "GET":
+                order = []
+                for item in split_top(params.get("order", "")):
+                    parts = item.split(".")
+                    descending = "desc" in parts[1:]
+                    nulls_first = "nullsfirst" in parts[1:] or (descending and "nullslast" not in parts[1:])
+                    order.append((parts[0], descending, nulls_first))
+                limit = int(params["limit"]) if "limit" in params else None
+                offset = int(params.get("offset", 0))
+                rows, total = self.db.select(table, params.get("select", "*"), conditions, embedded, order, limit, offset)
+                if "count" in prefer:
+                    extra["Content-Range"] = f"{offset}-{offset + len(rows) - 1}/{total}" if rows else f"*/{total}"
+                if "vnd.pgrst.object" in (headers.get("Accept") or ""):
+                    if len(rows) != 1:
+                        raise PostgrestError(406, "PGRST116", "JSON object requested, multiple (or no) rows returned",
+                                             f"The result contains {len(rows)} rows")
+                    return 200, extra, rows[0]
+                return 200, extra, rows
+            if method == "POST":
+                rows = body if isinstance(body, list) else [body]
+                if "columns" in params:
+                    # Only these keys are written; a row without one gets NULL unless Prefer: missing=default
+                    keys = [c.strip().strip('"') for c in params["columns"].split(",")]
+                    if prefer.get("missing") == "default":
+                        rows = [{k: row[k] for k in keys if k in row} for row in rows]
+                    else:
+                        rows = [{k: row.get(k) for k in keys} for row in rows]
+                on_conflict = params.get("on_conflict")
+                resolution = prefer.get("resolution")
+                result = self.db.insert(table, rows, on_conflict.split(",") if on_conflict else None, resolution)
+                status = 201
+            elif method == "PATCH":
+                result = self.db.update(table, body or {}, conditions)
+                status = 200
+            elif method == "DELETE":
+                result = self.db.delete(table, conditions)
+                status = 200
+            else:
+                raise PostgrestError(405, "PGRST117", f"Unsupported HTTP method: {method}")
+        if prefer.get("return") != "representation":
+            return 204 if status == 200 else status, extra, None
+        return status, extra, result
+
+    # Storage
+
+    def storage(self, method: str, path: str, headers, raw: bytes) -> Tuple[int, dict, object]:
+        parts = [unquote(p) for p in path.split("/") if p]
+        with self.lock:
+            if parts[:1] == ["bucket"]:
+                if method == "GET" and len(parts) == 1:
+                    return 200, {}, [b.describe() for b in self.buckets.values()]
+                if method == "GET":
+                    bucket = self.buckets.get(parts[1])
+                    return (200, {}, bucket.describe()) if bucket else self._storage_error(404, "Bucket not found")
+                if method == "POST":
+                    options = json.loads(raw or b"{}")
+                    if options["id"] in self.buckets:
+                        return self._storage_error(409, "The resource already exists")
+                    self.buckets[options["id"]] = Bucket(options["id"], bool(options.get("public")))
+                    return 200, {}, {"name": options["id"]}
+            if parts[:1] != ["object"] or len(parts) < 2:
+                return self._storage_error(404, "Not found")
+            if parts[1] == "list" and method == "POST":
+                bucket = self.buckets.get(parts[2])
+                if not bucket:
+                    return self._storage_error(404, "Bucket not found")
+                options = json.loads(raw or b"{}")
+                return 200, {}, bucket.list(options.get("prefix", ""), int(options.get("limit", 100)), int(options.get("offset", 0)))
+            if parts[1] in ("public", "authenticated"):
+                parts = parts[1:]
+            bucket = self.buckets.get(parts[1])
+            if not bucket:
+                return self._storage_error(404, "Bucket not found")
+            object_path = "/".join(parts[2:])
+            if method == "DELETE":
+                removed = []
+                for prefix in json.loads(raw or b"{}").get("prefixes", []):
+                    if bucket.objects.pop(prefix, None) is not None:
+                        removed.append({"name": prefix, "bucket_id": bucket.name})
+                return 200, {}, removed
+            if method == "GET":
+                stored = bucket.objects.get(object_path)
+                if stored is None:
+                    return self._storage_error(404, "Object not found")
+                return 200, {"Content-Type": stored[1]}, stored[0]
+            if method in ("POST", "PUT"):
+                upsert = (headers.get("x-upsert") or "").lower() == "true" or method == "PUT"
+                if object_path in bucket.objects and not upsert:
+                    return self._storage_error(409, "The resource already exists")
+                content_type = headers.get("Content-Type") or "application/octet-stream"
+                if content_type.startswith("multipart/form-data"):
+                    data, content_type = multipart_file(raw, content_type)
+                else:
+                    data = raw
+                bucket.objects[object_path] = (data, content_type, now_iso())
+                return 200, {}, {"Key": f"{bucket.name}/{object_path}", "Id": str(uuid.uuid4())}
+        return self._storage_error(405, "Method not allowed")
+
+    @staticmethod
+    def _storage_error(status: int, message: str):
+        return status, {}, {"statusCode": str(status), "error": message, "message": message}
+
+
+def make_handler(stub: SupabaseStub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # Headers and body go out in separate writes; don't let Nagle hold the body back
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def _body(self) -> bytes:
+            if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                chunks = []
+                while True:
+                    size = int(self.rfile.readline().strip() or b"0", 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        return b"".join(chunks)
+                    chunks.append(self.rfile.read(size))
+                    self.rfile.readline()
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def _handle(self):
+            raw = self._body()
+            url = urlsplit(self.path)
+            with stub.lock:
+                stub.requests += 1
+            try:
+                if url.path.startswith("/rest/v1/"):
+                    body = json.loads(raw) if raw else None
+                    query = parse_qsl(url.query, keep_blank_values=True)
+                    status, headers, payload = stub.rest(self.command, url.path[len("/rest/v1/"):], query, self.headers, body)
+                elif url.path.startswith("/storage/v1/"):
+                    status, headers, payload = stub.storage(self.command, url.path[len("/storage/v1/"):], self.headers, raw)
+                elif url.path == "/__stub/stats":
+                    status, headers, payload = 200, {}, stub.stats()
+                else:
+                    status, headers, payload = 404, {}, {"message": f"No route for {url.path}"}
+            except PostgrestError as e:
+                status, headers, payload = e.status, {}, e.body
+            except (KeyError, TypeError, ValueError) as e:
+                status, headers, payload = 400, {}, {"code": "PGRST100", "details": None, "hint": None, "message": str(e)}
+            if stub.latency:
+                time.sleep(stub.latency)
+            self._reply(status, headers, payload)
+
+        def _reply(self, status: int, headers: dict, payload):
+            if isinstance(payload, bytes):
+                data = payload
+            elif payload is None:
+                data = b""
+            else:
+                data = json.dumps(payload, default=str).encode()
+                headers.setdefault("Content-Type", "application/json")
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _handle
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_stub(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+               curriculum_path: Optional[str] = CURRICULUM_PATH) -> Tuple[ThreadingHTTPServer, SupabaseStub]:
+    stub = SupabaseStub(latency=latency)
+    if curriculum_path:
+        seed_curriculums(stub.db, curriculum_path)
+    ThreadingHTTPServer.request_queue_size = 256
+    server = ThreadingHTTPServer((host, port), make_handler(stub))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory Supabase stand-in (PostgREST + Storage)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--curriculums", default=CURRICULUM_PATH, help="Curriculum tree to seed ('' for none)")
+    args = parser.parse_args()
+
+    server, stub = start_stub(args.host, args.port, args.latency, args.curriculums or None)
+    print(f"Supabase stand-in on http://{args.host}:{server.server_address[1]} "
+          f"({len(stub.db.tables)} tables, {len(stub.db.rows['curriculums'])} curriculums, "
+          f"latency {args.latency * 1000:.0f} ms)", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -42,6 +42,7 @@ CREATE TABLE IF NOT EXISTS problems (
     title TEXT NOT NULL,
     problem_image_url TEXT,
     answer_image_url TEXT,
+    image_hash TEXT, -- perceptual hash of the problem image (16 hex digits)
     sort_order INTEGER DEFAULT 0,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()),
@@ -68,6 +69,7 @@ CREATE TABLE IF NOT EXISTS solve_logs (
     is_correct BOOLEAN DEFAULT FALSE,
     time_spent INTEGER, -- in seconds
     image_url TEXT, -- solution image
+    client_key TEXT, -- client-generated idempotency key for batch sync
     created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
 );
 
@@ -95,10 +97,41 @@ CREATE TABLE IF NOT EXISTS study_session_folders (
     PRIMARY KEY (study_session_id, folder_id)
 );
 
+-- 10. Daily activity rollups (maintained by record_daily_activity, see sql/003_add_daily_activity.sql)
+CREATE TABLE IF NOT EXISTS user_daily_activity (
+    user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
+    activity_date DATE NOT NULL,
+    attempts INTEGER DEFAULT 0 NOT NULL,
+    correct INTEGER DEFAULT 0 NOT NULL,
+    total_time_spent BIGINT DEFAULT 0 NOT NULL, -- in seconds
+    distinct_problems INTEGER DEFAULT 0 NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()),
+    PRIMARY KEY (user_id, activity_date)
+);
+
+CREATE TABLE IF NOT EXISTS user_daily_problems (
+    user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
+    activity_date DATE NOT NULL,
+    problem_id BIGINT NOT NULL,
+    PRIMARY KEY (user_id, activity_date, problem_id)
+);
+
+-- 11. Recently used folders / curriculums (written in batches by the API, see sql/006_add_recent_targets.sql)
+CREATE TABLE IF NOT EXISTS recent_targets (
+    user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
+    target_type TEXT NOT NULL, -- 'folder' or 'curriculum'
+    target_id BIGINT NOT NULL,
+    last_used_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    use_count INTEGER DEFAULT 0 NOT NULL,
+    PRIMARY KEY (user_id, target_type, target_id)
+);
+
 -- Indexes for performance
 CREATE INDEX IF NOT EXISTS idx_problems_folder ON problems(folder_id);
 CREATE INDEX IF NOT EXISTS idx_problems_curriculum ON problems(curriculum_id);
 CREATE INDEX IF NOT EXISTS idx_solve_logs_user_problem ON solve_logs(user_id, problem_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_solve_logs_user_client_key ON solve_logs(user_id, client_key);
+CREATE INDEX IF NOT EXISTS idx_recent_targets_user_time ON recent_targets(user_id, target_type, last_used_at DESC);
 
 -- Initial Seed Data
 -- INSERT INTO users (username, email) VALUES ('student1', 'student1@example.com');
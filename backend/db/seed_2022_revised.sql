@@ -1,4 +1,6 @@
 -- 2022 개정 교육과정 데이터 시드
+-- 같은 내용이 db/curriculum_2022_revised.json 에 있습니다. 다시 실행해도 중복이 생기지 않도록
+-- scripts/load_curriculum_tree.py 로 반영하는 것을 권장합니다.
 
 -- 대수 (고등)
 INSERT INTO curriculums (name, level, sort_order) VALUES ('대수 (고등)', 1, 10);
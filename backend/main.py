@@ -1,25 +1,90 @@
-from fastapi import FastAPI, HTTPException, Depends, status, File, UploadFile, Form
+from fastapi import FastAPI, HTTPException, Depends, status, File, UploadFile, Form, Query, Request, Header
 import uuid
+import mimetypes
+import shutil
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from typing import List, Optional
 import os
-from datetime import datetime, timedelta
+import json
+import hmac
+import time
+import asyncio
+import tempfile
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 import models
-from utils.image_processing import auto_crop_image, detect_document_bounds
-from fastapi.responses import Response, JSONResponse
+from utils.workbook_export import iter_pdf, iter_zip
+from utils.image_cache import ImageDiskCache
+from utils.bulk_import import ProblemImportJob, ManifestError, read_manifest, job_summary
+from utils.job_queue import JobQueue
+from utils.bounded_executor import BoundedExecutor, ExecutorBusy
+from utils.search_index import ProblemSearchIndex
+from utils.phash_index import PerceptualHashIndex, hash_from_hex, hash_to_hex
+from utils.lazy_import import LazyModule
+from utils.coherence import VersionTable, VersionedValue
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.queries import UserScope, columns
+from utils.curriculum_tree import CurriculumTree
+from utils.recent_usage import PartialFlushError, RecentUsageBuffer
+from utils.event_stream import EventBroker, TooManyStreams
+from utils.result_cache import VersionedResultCache
+from utils.request_profiler import RequestProfiler, SamplingProfiler, ProfileStore, folded
+from fastapi.responses import Response, JSONResponse, FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter
 
 load_dotenv()
 
 app = FastAPI()
 
-# Ensure Storage Bucket Exists
-@app.on_event("startup")
-async def startup_event():
+# Per-request profiling: requests sent with X-Debug-Profile: <ADMIN_TOKEN>, plus a random
+# PROFILE_SAMPLE_RATE share of all requests, are sampled and saved as speedscope files.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "odapclean-profiles"))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 200))
+PROFILE_MAX_BYTES = int(os.environ.get("PROFILE_MAX_BYTES", 100 * 1024 * 1024))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+PROFILE_MAX_ACTIVE = int(os.environ.get("PROFILE_MAX_ACTIVE", 4))
+request_profiler = RequestProfiler(
+    ProfileStore(PROFILE_DIR, PROFILE_MAX_FILES, PROFILE_MAX_BYTES),
+    SamplingProfiler(interval=PROFILE_INTERVAL_MS / 1000, max_active=PROFILE_MAX_ACTIVE),
+    sample_rate=PROFILE_SAMPLE_RATE,
+    token=ADMIN_TOKEN,
+)
+# Must be set before any route is registered
+app.router.route_class = request_profiler.route_class()
+
+# OpenCV / NumPy take a large share of worker start-up time and only a few
+# endpoints need them, so they are imported on first use.
+image_processing = LazyModule("utils.image_processing")
+time_analytics = LazyModule("utils.time_analytics")
+PRELOAD_IMAGE_STACK = os.environ.get("PRELOAD_IMAGE_STACK", "0") == "1"
+
+# Result of the bucket check is shared by worker processes through a small file,
+# so restarted workers skip the network round trip.
+STORAGE_CHECK_CACHE = os.environ.get("STORAGE_CHECK_CACHE", os.path.join(tempfile.gettempdir(), "odapclean_storage_check.json"))
+STORAGE_CHECK_TTL = int(os.environ.get("STORAGE_CHECK_TTL", 3600))
+storage_status = {"status": "pending", "checked_at": None, "error": None, "cached": False}
+startup_complete = False
+_startup_tasks = []
+
+def ensure_storage_bucket():
+    try:
+        with open(STORAGE_CHECK_CACHE) as f:
+            cached = json.load(f)
+        if cached["status"] == "ok" and time.time() - cached["checked_at"] < STORAGE_CHECK_TTL:
+            storage_status.update(cached, cached=True)
+            return
+    except (OSError, ValueError, KeyError):
+        pass
+
     try:
         # Check if 'problems' bucket exists
         buckets = supabase.storage.list_buckets()
@@ -31,6 +96,39 @@ async def startup_event():
             print("Created 'problems' bucket successfully.")
     except Exception as e:
         print(f"Warning: Failed to initialize storage bucket automatically. Please run 'backend/db/create_storage_bucket.sql' in Supabase SQL Editor. Error: {e}")
+        storage_status.update(status="failed", checked_at=time.time(), error=str(e))
+        return
+
+    storage_status.update(status="ok", checked_at=time.time(), error=None)
+    try:
+        tmp_path = f"{STORAGE_CHECK_CACHE}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"status": "ok", "checked_at": storage_status["checked_at"], "error": None}, f)
+        os.replace(tmp_path, STORAGE_CHECK_CACHE)
+    except OSError as e:
+        print(f"Could not cache storage check: {e}")
+
+# Ensure Storage Bucket Exists
+@app.on_event("startup")
+async def startup_event():
+    global startup_complete
+    # Runs in the background so the worker can serve requests right away
+    _startup_tasks.append(asyncio.create_task(run_in_threadpool(ensure_storage_bucket)))
+    if PRELOAD_IMAGE_STACK:
+        _startup_tasks.append(asyncio.create_task(run_in_threadpool(image_processing.load)))
+
+    await job_queue.start()
+    schedule_storage_sweep()
+    await recent_usage.start(RECENT_USAGE_FLUSH_INTERVAL)
+    event_broker.start()
+    startup_complete = True
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    event_broker.close()
+    await recent_usage.stop()
+    await job_queue.stop()
+    hash_executor.shutdown()
 
 # CORS
 origins = ["*"]
@@ -40,6 +138,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id"],
 )
 
 # Supabase Client
@@ -47,13 +146,76 @@ url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_KEY")
 supabase: Client = create_client(url, key)
 
+def scoped(user_id: int) -> UserScope:
+    # Statements on per-user tables go through this (utils/queries.py); checked by tests/test_queries.py
+    return UserScope(supabase, user_id)
+
+# Columns each endpoint reads, derived from its response model
+USER_COLUMNS = columns(models.User)
+FOLDER_COLUMNS = columns(models.Folder)
+CURRICULUM_COLUMNS = columns(models.Curriculum)
+PROBLEM_COLUMNS = columns(models.Problem)
+HINT_COLUMNS = columns(models.Hint)
+SESSION_COLUMNS = columns(models.StudySession, exclude=('curriculum_ids', 'folder_ids'),
+                          extra=('study_session_curriculums(curriculum_id)', 'study_session_folders(folder_id)'))
+
 # --- Auth Configuration ---
 SECRET_KEY = os.environ.get("SECRET_KEY", "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# --- Image Cache Configuration ---
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", "/tmp/odapclean-image-cache")
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+IMAGE_FORMATS = {"jpg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+# Variants pre-rendered in the background after a problem is created
+IMAGE_RENDITION_WIDTHS = [int(w) for w in os.environ.get("IMAGE_RENDITION_WIDTHS", "320,640").split(",") if w]
+
+image_cache = ImageDiskCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+
+# bcrypt cost factor. Hashes with a different cost are rehashed on the next login.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+# Password hashing runs on its own small pool so a login burst cannot starve
+# the threadpool used by the DB-bound endpoints.
+AUTH_HASH_WORKERS = int(os.environ.get("AUTH_HASH_WORKERS", 2))
+AUTH_HASH_MAX_QUEUE = int(os.environ.get("AUTH_HASH_MAX_QUEUE", 32))
+
+# Day boundary for activity rollups (must match scripts/backfill_daily_activity.py)
+ACTIVITY_TIMEZONE = ZoneInfo(os.environ.get("ACTIVITY_TIMEZONE", "Asia/Seoul"))
+ACTIVITY_MAX_RANGE_DAYS = 731
+
+# --- Background Job Configuration ---
+# SQLite file shared by all workers on the machine; queued jobs survive restarts
+JOB_DB_PATH = os.environ.get("JOB_DB_PATH", "/tmp/odapclean-jobs.sqlite3")
+JOB_WORKER_THREADS = int(os.environ.get("JOB_WORKER_THREADS", 4))
+
+job_queue = JobQueue(JOB_DB_PATH, worker_threads=JOB_WORKER_THREADS)
+
+# In-process caches are kept coherent across gunicorn workers through a
+# shared version table. Write endpoints bump the entity's key, e.g.
+# "curriculums", "problems:{user_id}", "image_hashes:{user_id}",
+# "solve_logs:{user_id}", and caches reload when the version they were
+# built at has changed.
+VERSION_TABLE_PATH = os.environ.get("VERSION_TABLE_PATH", os.path.join(tempfile.gettempdir(), "odapclean-versions.bin"))
+VERSION_TABLE_SLOTS = int(os.environ.get("VERSION_TABLE_SLOTS", 65536))
+versions = VersionTable(VERSION_TABLE_PATH, VERSION_TABLE_SLOTS)
+# Curriculums can also be changed by scripts/load_curriculum_tree.py, which cannot bump versions
+CURRICULUM_CACHE_MAX_AGE = float(os.environ.get("CURRICULUM_CACHE_MAX_AGE", 300))
+
+# --- Bulk Import Configuration ---
+IMPORT_DIR = os.environ.get("IMPORT_DIR", "/tmp/odapclean-imports")
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 20))
+IMPORT_PARALLELISM = int(os.environ.get("IMPORT_PARALLELISM", 4))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/token")
+hash_executor = BoundedExecutor("auth-hash", AUTH_HASH_WORKERS, AUTH_HASH_MAX_QUEUE)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -61,6 +223,16 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def run_password_hashing(fn, *args):
+    try:
+        return await hash_executor.run(fn, *args)
+    except ExecutorBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -87,18 +259,90 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         raise credentials_exception
     
     # Fetch user from DB
-    response = supabase.table('users').select("*").eq('username', token_data.username).single().execute()
+    response = supabase.table('users').select(USER_COLUMNS).eq('username', token_data.username).single().execute()
     if not response.data:
         raise credentials_exception
     user = models.User(**response.data)
     return user
 
-@app.post("/api/v1/utils/auto-crop")
+async def get_stream_user(request: Request, token: Optional[str] = None):
+    # EventSource cannot send headers, so streams also accept ?token=
+    authorization = request.headers.get("Authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return await get_current_user(token)
+
+# --- Admission Control ---
+
+# Per route: rate = sustained requests/second per client, burst = token bucket size,
+# concurrency = requests in flight per worker, cpu = takes a slot of the CPU budget.
+# Override with ADMISSION_LIMITS, e.g. '{"auto_crop": {"rate": 1, "burst": 10}}'.
+ADMISSION_LIMITS = {
+    "auto_crop": {"rate": 0.5, "burst": 5, "concurrency": 2, "cpu": True},
+    "statistics": {"rate": 0.5, "burst": 5, "concurrency": 4, "cpu": True},
+    "problems_all": {"rate": 2, "burst": 10, "concurrency": 8, "cpu": True},
+}
+for route, overrides in json.loads(os.environ.get("ADMISSION_LIMITS", "{}")).items():
+    ADMISSION_LIMITS[route] = {**ADMISSION_LIMITS.get(route, {"rate": 1, "burst": 5, "concurrency": 4}), **overrides}
+ADMISSION_CPU_SLOTS = int(os.environ.get("ADMISSION_CPU_SLOTS", max(2, os.cpu_count() or 1)))
+# Proxies in front of the app that append to X-Forwarded-For (Render's load balancer);
+# 0 when clients connect directly, so the header is ignored
+TRUSTED_PROXY_HOPS = int(os.environ.get("TRUSTED_PROXY_HOPS", 1))
+
+admission = AdmissionController(ADMISSION_CPU_SLOTS)
+for route, limits in ADMISSION_LIMITS.items():
+    admission.configure(route, **limits)
+
+# The admission dependencies are async so the check runs on the event loop: an
+# over-limit request is rejected without waiting for a threadpool thread.
+@contextmanager
+def _admit(route: str, client: str):
+    try:
+        admission.acquire(route, client)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+    try:
+        yield
+    finally:
+        admission.release(route)
+
+def client_address(request: Request) -> str:
+    # Each trusted proxy appends the address it received the request from. Earlier
+    # entries come from the client and can be forged to get a fresh rate limit bucket.
+    forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    if TRUSTED_PROXY_HOPS and forwarded:
+        return forwarded[-min(TRUSTED_PROXY_HOPS, len(forwarded))]
+    return request.client.host if request.client else "unknown"
+
+def admit_user(route: str):
+    async def dependency(current_user: models.User = Depends(get_current_user)):
+        with _admit(route, f"user:{current_user.user_id}"):
+            yield
+    return dependency
+
+def admit_ip(route: str):
+    # For endpoints that do not require login
+    async def dependency(request: Request):
+        with _admit(route, f"ip:{client_address(request)}"):
+            yield
+    return dependency
+
+async def admit_unfiltered_problems(request: Request, current_user: models.User = Depends(get_current_user)):
+    # Only the full-library listing is expensive; filtered listings are not limited
+    if request.query_params.get('folder_id') or request.query_params.get('curriculum_id'):
+        yield
+        return
+    with _admit("problems_all", f"user:{current_user.user_id}"):
+        yield
+
+@app.post("/api/v1/utils/auto-crop", dependencies=[Depends(admit_ip("auto_crop"))])
 async def api_auto_crop(file: UploadFile = File(...)):
     try:
         file_data = await file.read()
         # Instead of returning processed image, return the bounding box
-        bounds = detect_document_bounds(file_data)
+        bounds = await run_in_threadpool(image_processing.detect_document_bounds, file_data)
         return JSONResponse(content=bounds)
     except Exception as e:
         print(f"Auto crop error: {e}")
@@ -107,26 +351,30 @@ async def api_auto_crop(file: UploadFile = File(...)):
 # --- Auth Endpoints ---
 
 @app.post("/api/v1/register", response_model=models.User)
-def register(user: models.UserCreate):
-    existing = supabase.table('users').select("user_id").eq('username', user.username).execute()
+async def register(user: models.UserCreate):
+    existing = await run_in_threadpool(
+        lambda: supabase.table('users').select("user_id").eq('username', user.username).execute()  # columns: existence check
+    )
     if existing.data:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await run_password_hashing(get_password_hash, user.password)
     user_data = {
         "username": user.username,
         "email": user.email,
         "hashed_password": hashed_password
     }
-    response = supabase.table('users').insert(user_data).execute()
+    response = await run_in_threadpool(lambda: supabase.table('users').insert(user_data).execute())
     if not response.data:
         raise HTTPException(status_code=400, detail="Registration failed")
     
     return response.data[0]
 
 @app.post("/api/v1/token", response_model=models.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    response = supabase.table('users').select("*").eq('username', form_data.username).single().execute()
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+    response = await run_in_threadpool(
+        lambda: supabase.table('users').select(columns(models.UserInDB)).eq('username', form_data.username).single().execute()
+    )
     if not response.data:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -135,12 +383,24 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
         )
     
     user_dict = response.data
-    if not verify_password(form_data.password, user_dict['hashed_password']):
+    is_valid, new_hash = await run_password_hashing(
+        pwd_context.verify_and_update, form_data.password, user_dict['hashed_password']
+    )
+    if not is_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    if new_hash:
+        # Stored hash used an outdated bcrypt cost; upgrade it transparently
+        try:
+            await run_in_threadpool(
+                lambda: supabase.table('users').update({"hashed_password": new_hash}).eq('user_id', user_dict['user_id']).execute()
+            )
+        except Exception as e:
+            print(f"Password rehash failed for user {user_dict['user_id']}: {e}")
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -148,61 +408,116 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # Admin endpoints do not exist unless ADMIN_TOKEN is configured
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+# --- Metrics ---
+
+# Internal queue, admission and cache state, so only for operators
+@app.get("/api/v1/metrics", dependencies=[Depends(require_admin)])
+def get_metrics():
+    return {
+        "auth_hashing": hash_executor.stats(),
+        "image_cache": image_cache.stats(),
+        "jobs": job_queue.stats(),
+        "admission": admission.stats(),
+        "recent_usage": recent_usage.stats(),
+        "events": event_broker.stats(),
+        "profiler": request_profiler.stats(),
+        "problem_list_cache": problem_list_cache.stats(),
+    }
+
+@app.get("/api/v1/admin/profiles", dependencies=[Depends(require_admin)])
+def list_profiles():
+    return request_profiler.store.list()
+
+@app.get("/api/v1/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+def get_profile(profile_id: str, format: str = Query("speedscope", pattern="^(speedscope|folded)$")):
+    path = request_profiler.store.path_for(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        with open(path) as f:
+            return Response(folded(json.load(f)), media_type="text/plain")
+    return FileResponse(path, media_type="application/json", filename=os.path.basename(path))
+
+@app.get("/api/v1/ready")
+def readiness():
+    # Ready once start-up has finished and the storage check has come back (even if it failed)
+    ready = startup_complete and storage_status["status"] != "pending"
+    body = {
+        "status": "ready" if ready else "starting",
+        "storage": storage_status,
+        "image_stack_loaded": image_processing.loaded,
+    }
+    return JSONResponse(content=body, status_code=200 if ready else 503)
+
 # --- Folder Endpoints ---
 
 @app.get("/api/v1/folders", response_model=List[models.Folder])
 def get_folders(current_user: models.User = Depends(get_current_user)):
-    response = supabase.table('folders').select("*").eq('user_id', current_user.user_id).order('sort_order', desc=False).order('created_at', desc=True).execute()
+    response = scoped(current_user.user_id).select('folders', FOLDER_COLUMNS).order('sort_order', desc=False).order('created_at', desc=True).execute()
     return response.data
 
 @app.put("/api/v1/folders/reorder")
 def reorder_folders(items: List[models.FolderReorderItem], current_user: models.User = Depends(get_current_user)):
     for item in items:
-        supabase.table('folders').update({"sort_order": item.sort_order}).eq('folder_id', item.folder_id).eq('user_id', current_user.user_id).execute()
+        scoped(current_user.user_id).update('folders', {"sort_order": item.sort_order}).eq('folder_id', item.folder_id).execute()
     return {"message": "Folders reordered"}
 
 @app.post("/api/v1/folders", response_model=models.Folder)
 def create_folder(folder: models.FolderCreate, current_user: models.User = Depends(get_current_user)):
-    folder_data = folder.model_dump()
-    folder_data['user_id'] = current_user.user_id
-    response = supabase.table('folders').insert(folder_data).execute()
+    response = scoped(current_user.user_id).insert('folders', folder.model_dump()).execute()
     return response.data[0]
 
 @app.put("/api/v1/folders/{folder_id}", response_model=models.Folder)
 def update_folder(folder_id: int, folder: models.FolderCreate, current_user: models.User = Depends(get_current_user)):
+    # user_id cannot be changed; the scope drops it
     update_data = folder.model_dump(exclude_unset=True)
-    # Don't allow changing user_id
-    if 'user_id' in update_data:
-        del update_data['user_id']
-        
-    response = supabase.table('folders').update(update_data).eq('folder_id', folder_id).eq('user_id', current_user.user_id).execute()
+    response = scoped(current_user.user_id).update('folders', update_data).eq('folder_id', folder_id).execute()
     if not response.data:
          raise HTTPException(status_code=404, detail="Folder not found")
     return response.data[0]
 
 @app.delete("/api/v1/folders/{folder_id}")
 def delete_folder(folder_id: int, current_user: models.User = Depends(get_current_user)):
-    response = supabase.table('folders').delete().eq('folder_id', folder_id).eq('user_id', current_user.user_id).execute()
+    response = scoped(current_user.user_id).delete('folders').eq('folder_id', folder_id).execute()
     if not response.data:
         raise HTTPException(status_code=404, detail="Folder not found")
+    # Its problems were moved out of the folder by ON DELETE SET NULL
+    versions.bump(f"problems:{current_user.user_id}")
+    recent_usage.forget(current_user.user_id, "folder", folder_id)
+    scoped(current_user.user_id).delete('recent_targets').eq('target_type', 'folder').eq('target_id', folder_id).execute()
     return {"message": "Folder deleted"}
 
 # --- Curriculum Endpoints ---
 
+# Shared by all users; treat the cached rows as read-only
+curriculum_rows = VersionedValue(
+    versions, "curriculums",
+    lambda: supabase.table('curriculums').select(CURRICULUM_COLUMNS).order('sort_order').execute().data,
+    max_age=CURRICULUM_CACHE_MAX_AGE,
+)
+
 @app.get("/api/v1/curriculums", response_model=List[models.Curriculum])
 def get_curriculums(current_user: models.User = Depends(get_current_user)):
-    response = supabase.table('curriculums').select("*").order('sort_order').execute()
-    return response.data
+    return curriculum_rows.get()
 
 @app.put("/api/v1/curriculums/reorder")
 def reorder_curriculums(items: List[models.CurriculumReorderItem], current_user: models.User = Depends(get_current_user)):
     for item in items:
         supabase.table('curriculums').update({"sort_order": item.sort_order}).eq('curriculum_id', item.curriculum_id).execute()
+    versions.bump("curriculums")
     return {"message": "Curriculums reordered"}
 
 @app.post("/api/v1/curriculums", response_model=models.Curriculum)
 def create_curriculum(curriculum: models.CurriculumCreate, current_user: models.User = Depends(get_current_user)):
     response = supabase.table('curriculums').insert(curriculum.model_dump()).execute()
+    versions.bump("curriculums")
     return response.data[0]
 
 @app.put("/api/v1/curriculums/{curriculum_id}", response_model=models.Curriculum)
@@ -210,6 +525,7 @@ def update_curriculum(curriculum_id: int, curriculum: models.CurriculumCreate, c
     response = supabase.table('curriculums').update(curriculum.model_dump(exclude_unset=True)).eq('curriculum_id', curriculum_id).execute()
     if not response.data:
         raise HTTPException(status_code=404, detail="Curriculum not found")
+    versions.bump("curriculums")
     return response.data[0]
 
 @app.delete("/api/v1/curriculums/{curriculum_id}")
@@ -217,11 +533,188 @@ def delete_curriculum(curriculum_id: int, current_user: models.User = Depends(ge
     response = supabase.table('curriculums').delete().eq('curriculum_id', curriculum_id).execute()
     if not response.data:
          raise HTTPException(status_code=404, detail="Curriculum not found")
+    versions.bump("curriculums")
     return {"message": "Curriculum deleted"}
 
+# --- Live Events ---
+
+# Per-user server-sent events, so the dashboard can patch its state instead of re-polling
+SSE_HEARTBEAT_INTERVAL = float(os.environ.get("SSE_HEARTBEAT_INTERVAL", 15))
+SSE_POLL_INTERVAL = float(os.environ.get("SSE_POLL_INTERVAL", 1))
+event_broker = EventBroker(
+    lambda user_id: versions.version(f"events:{user_id}"),
+    max_queue=int(os.environ.get("SSE_MAX_QUEUE", 100)),
+    max_streams_per_user=int(os.environ.get("SSE_MAX_STREAMS_PER_USER", 5)),
+)
+
+def publish_event(user_id: int, event_type: str, **data):
+    # The version bump also tells streams in other workers to resync
+    event_broker.publish(user_id, {"type": event_type, "version": versions.bump(f"events:{user_id}"), **data})
+
+def counter_deltas(problem: dict, total: int, before: str, after: str) -> List[dict]:
+    """
+    Changes to the folder / curriculum counters of get_statistics when a problem is
+    added (total=1), removed (total=-1) or its latest status goes from before to after.
+    path lists the curriculum and its ancestors, for the subtree statistics.
+    """
+    solved = (after != 'not_attempted') - (before != 'not_attempted')
+    correct = (after == 'correct') - (before == 'correct')
+    if not (total or solved or correct):
+        return []
+    deltas = []
+    if problem.get('folder_id'):
+        deltas.append({"scope": "folder", "id": problem['folder_id'], "total": total, "solved": solved, "correct": correct})
+    if problem.get('curriculum_id'):
+        deltas.append({"scope": "curriculum", "id": problem['curriculum_id'], "path": curriculum_tree.get().path(problem['curriculum_id']),
+                       "total": total, "solved": solved, "correct": correct})
+    return deltas
+
+def problem_status(user_id: int, problem_id: int) -> str:
+    logs = scoped(user_id).select('solve_logs', "problem_id, is_correct").eq('problem_id', problem_id)\
+        .order('created_at', desc=True).limit(1).execute().data
+    return summarize_solve_logs(logs).get(problem_id, EMPTY_PROBLEM_STATS)["latest_status"]
+
+def publish_solve(user_id: int, problem_id: int, new_logs: List[dict]):
+    # One query: the problem's location with all of its logs
+    rows = scoped(user_id).select('problems', "folder_id, curriculum_id, solve_logs(solve_log_id, problem_id, is_correct, created_at)")\
+        .eq('problem_id', problem_id).execute().data
+    if not rows:
+        return
+    logs = sorted(rows[0]['solve_logs'], key=lambda log: log['created_at'], reverse=True)
+    new_ids = {log['solve_log_id'] for log in new_logs}
+    after = summarize_solve_logs(logs).get(problem_id, EMPTY_PROBLEM_STATS)
+    before = summarize_solve_logs([log for log in logs if log['solve_log_id'] not in new_ids]).get(problem_id, EMPTY_PROBLEM_STATS)
+    publish_event(user_id, "problem_stats", problem_id=problem_id, **after,
+                  counters=counter_deltas(rows[0], 0, before["latest_status"], after["latest_status"]))
+
+@app.get("/api/v1/events")
+async def stream_events(request: Request, current_user: models.User = Depends(get_stream_user)):
+    """
+    Server-sent events for the current user:
+      problem_stats    a solve changed a problem's latest_status / counts
+      problem_created, problem_updated, problem_deleted
+      resync           changes that are not sent as deltas (batches, other workers,
+                       a client that fell behind); refetch
+    Every event carries counters (folder / curriculum deltas) where they change, and
+    a version that is also the SSE id; a reconnect with an older Last-Event-ID resyncs.
+    """
+    try:
+        subscription = event_broker.subscribe(current_user.user_id)
+    except TooManyStreams:
+        raise HTTPException(status_code=429, detail="Too many open event streams")
+    try:
+        last_event_id = int(request.headers.get("Last-Event-ID", ""))
+    except ValueError:
+        last_event_id = None
+    return StreamingResponse(
+        event_broker.stream(subscription, SSE_HEARTBEAT_INTERVAL, SSE_POLL_INTERVAL, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- Recent Targets ---
+
+# Folder / curriculum accesses are buffered in memory and written in batches
+RECENT_USAGE_FLUSH_INTERVAL = float(os.environ.get("RECENT_USAGE_FLUSH_INTERVAL", 30))
+RECENT_USAGE_FLUSH_BATCH = 500
+RECENT_TARGETS_PER_USER = 20
+
+def _flush_recent_targets(items: List[dict]):
+    for item in items:
+        item["last_used_at"] = datetime.fromtimestamp(item["last_used_at"], timezone.utc).isoformat()
+    for i in range(0, len(items), RECENT_USAGE_FLUSH_BATCH):
+        try:
+            supabase.rpc("record_recent_targets", {"p_items": items[i:i + RECENT_USAGE_FLUSH_BATCH]}).execute()
+        except Exception as e:
+            # Earlier batches are committed; only the rest may be retried
+            raise PartialFlushError(items[i:], str(e)) from e
+
+def _load_recent_targets(user_id: int) -> List[dict]:
+    # columns: read by RecentUsageBuffer
+    rows = scoped(user_id).select('recent_targets', "target_type, target_id, last_used_at, use_count")\
+        .order('last_used_at', desc=True)\
+        .limit(RECENT_TARGETS_PER_USER * 2)\
+        .execute().data
+    for row in rows:
+        row['last_used_at'] = datetime.fromisoformat(row['last_used_at'].replace('Z', '+00:00')).timestamp()
+    return rows
+
+recent_usage = RecentUsageBuffer(_flush_recent_targets, _load_recent_targets, per_user=RECENT_TARGETS_PER_USER)
+
+def record_target_use(user_id: int, folder_ids: List[Optional[int]] = (), curriculum_ids: List[Optional[int]] = ()):
+    for folder_id in folder_ids:
+        recent_usage.record(user_id, "folder", folder_id)
+    for curriculum_id in curriculum_ids:
+        recent_usage.record(user_id, "curriculum", curriculum_id)
+
+@app.get("/api/v1/recent-targets", response_model=models.RecentTargetsResponse)
+def get_recent_targets(limit: int = Query(3, ge=1, le=RECENT_TARGETS_PER_USER), current_user: models.User = Depends(get_current_user)):
+    # Served from this worker's view; the database is read only when it is missing or stale
+    tree = curriculum_tree.get()
+    curriculums = [t for t in recent_usage.top(current_user.user_id, "curriculum", RECENT_TARGETS_PER_USER) if t["target_id"] in tree.nodes]
+    return models.RecentTargetsResponse(
+        folders=recent_usage.top(current_user.user_id, "folder", limit),
+        curriculums=curriculums[:limit],
+    )
+
 # --- Problem Endpoints ---
 
-@app.get("/api/v1/problems", response_model=List[models.ProblemListResponse])
+curriculum_tree = VersionedValue(
+    versions, "curriculums",
+    lambda: CurriculumTree(curriculum_rows.get()),
+    max_age=CURRICULUM_CACHE_MAX_AGE,
+)
+
+def curriculum_descendants(curriculum_id: int) -> set:
+    # The curriculum itself plus all of its descendants
+    return curriculum_tree.get().descendants(curriculum_id)
+
+def require_curriculum(curriculum_id: int):
+    # Unknown ids would otherwise fail on the foreign key with a 500.
+    # The cached tree can lag behind scripts/load_curriculum_tree.py, so a miss is confirmed against the table.
+    if curriculum_id in curriculum_tree.get().nodes:
+        return
+    existing = supabase.table('curriculums').select("curriculum_id").eq('curriculum_id', curriculum_id).execute()  # columns: existence check
+    if not existing.data:
+        raise HTTPException(status_code=400, detail="Curriculum not found")
+
+EMPTY_PROBLEM_STATS = {"solve_count": 0, "correct_rate": 0.0, "latest_status": "not_attempted"}
+
+def summarize_solve_logs(logs: List[dict]) -> dict:
+    """Per-problem solve_count, correct_rate and latest_status from logs ordered by created_at desc."""
+    problem_stats = {}
+    correct_counts = {}
+    for log in logs:
+        pid = log['problem_id']
+        if pid not in problem_stats:
+            # Since logs are ordered by created_at desc, the first one encountered is the latest
+            problem_stats[pid] = {
+                "solve_count": 0,
+                "correct_rate": 0.0,
+                "latest_status": "correct" if log['is_correct'] else "wrong"
+            }
+            correct_counts[pid] = 0
+        problem_stats[pid]["solve_count"] += 1
+        if log['is_correct']:
+            correct_counts[pid] += 1
+
+    for pid, stat in problem_stats.items():
+        stat["correct_rate"] = (correct_counts[pid] / stat["solve_count"]) * 100
+    return problem_stats
+
+# Encoded problem list responses per (user, filters). The version covers everything the
+# list is built from, so any write to the user's problems or solve logs (or to the
+# curriculum tree, for the descendant filter) makes older entries unreachable.
+PROBLEM_LIST_CACHE_MAX_ENTRIES = int(os.environ.get("PROBLEM_LIST_CACHE_MAX_ENTRIES", 4096))
+PROBLEM_LIST_CACHE_MAX_BYTES = int(os.environ.get("PROBLEM_LIST_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+problem_list_cache = VersionedResultCache(PROBLEM_LIST_CACHE_MAX_ENTRIES, PROBLEM_LIST_CACHE_MAX_BYTES)
+problem_list_adapter = TypeAdapter(List[models.ProblemListResponse])
+
+def problem_list_version(user_id: int) -> tuple:
+    return (versions.version(f"problems:{user_id}"), versions.version(f"solve_logs:{user_id}"),
+            versions.version("curriculums"))
+
+@app.get("/api/v1/problems", response_model=List[models.ProblemListResponse], dependencies=[Depends(admit_unfiltered_problems)])
 def get_problems(
     status: str = 'all', 
     folder_id: Optional[int] = None, 
@@ -229,75 +722,33 @@ def get_problems(
     sort_by: str = 'date_desc',
     current_user: models.User = Depends(get_current_user)
 ):
-    query = supabase.table('problems').select("*").eq('user_id', current_user.user_id)
+    record_target_use(current_user.user_id, [folder_id], [curriculum_id])
+
+    # Read before querying: a write that lands meanwhile moves the version past this one
+    cache_key = (current_user.user_id, status, folder_id, curriculum_id, sort_by)
+    version = problem_list_version(current_user.user_id)
+    cached = problem_list_cache.get(cache_key, version)
+    if cached is not None:
+        return Response(cached, media_type="application/json")
+
+    query = scoped(current_user.user_id).select('problems', PROBLEM_COLUMNS)
     
     if folder_id:
         query = query.eq('folder_id', folder_id)
     if curriculum_id:
         # Hierarchical filtering: Get all descendants
-        all_curriculums = supabase.table('curriculums').select("curriculum_id, parent_id").execute().data
-        
-        target_ids = {curriculum_id}
-        current_level_ids = {curriculum_id}
-        
-        while current_level_ids:
-            next_level_ids = set()
-            for c in all_curriculums:
-                if c['parent_id'] in current_level_ids:
-                    next_level_ids.add(c['curriculum_id'])
-            
-            if not next_level_ids:
-                break
-                
-            target_ids.update(next_level_ids)
-            current_level_ids = next_level_ids
-            
-        query = query.in_('curriculum_id', list(target_ids))
+        query = query.in_('curriculum_id', list(curriculum_descendants(curriculum_id)))
         
     response = query.execute()
     problems = response.data
     
     # Fetch logs for stats
-    log_response = supabase.table('solve_logs').select("problem_id, is_correct, created_at").eq('user_id', current_user.user_id).order('created_at', desc=True).execute()
-    logs = log_response.data
-    
-    problem_stats = {}
-    
-    for log in logs:
-        pid = log['problem_id']
-        if pid not in problem_stats:
-            # Since logs are ordered by created_at desc, the first one encountered is the latest
-            problem_stats[pid] = {
-                "solve_count": 0,
-                "correct_count": 0,
-                "latest_status": "correct" if log['is_correct'] else "wrong"
-            }
-        
-        problem_stats[pid]["solve_count"] += 1
-        if log['is_correct']:
-            problem_stats[pid]["correct_count"] += 1
+    log_response = scoped(current_user.user_id).select('solve_logs', "problem_id, is_correct").order('created_at', desc=True).execute()
+    problem_stats = summarize_solve_logs(log_response.data)
             
     final_list = []
     for p in problems:
-        pid = p['problem_id']
-        stat = problem_stats.get(pid, {
-            "solve_count": 0,
-            "correct_count": 0,
-            "latest_status": "not_attempted"
-        })
-        
-        # Calculate correct rate
-        if stat["solve_count"] > 0:
-            correct_rate = (stat["correct_count"] / stat["solve_count"]) * 100
-        else:
-            correct_rate = 0.0
-            
-        p_with_stats = models.ProblemListResponse(
-            **p,
-            solve_count=stat["solve_count"],
-            correct_rate=correct_rate,
-            latest_status=stat["latest_status"]
-        )
+        p_with_stats = models.ProblemListResponse(**p, **problem_stats.get(p['problem_id'], EMPTY_PROBLEM_STATS))
         
         # Filter Logic
         if status == 'not_attempted' and p_with_stats.latest_status != 'not_attempted':
@@ -318,26 +769,54 @@ def get_problems(
         final_list.sort(key=lambda x: x.title)
     elif sort_by == 'order_asc':
         final_list.sort(key=lambda x: x.sort_order)
-        
-    return final_list
 
-@app.get("/api/v1/statistics", response_model=models.StatisticsResponse)
+    # Same JSON FastAPI would produce from the response model
+    body = problem_list_adapter.dump_json(final_list)
+    problem_list_cache.put(cache_key, version, body)
+    return Response(body, media_type="application/json")
+
+# --- Search ---
+
+def _load_search_documents(user_id: int) -> List[tuple]:
+    # One embedded query: every problem of the user with its hints
+    response = scoped(user_id).select('problems', f"{PROBLEM_COLUMNS}, hints(content, step_number)").execute()
+    documents = []
+    for problem in response.data:
+        hints = sorted(problem.pop('hints') or [], key=lambda h: h['step_number'])
+        documents.append((problem, [h['content'] for h in hints]))
+    return documents
+
+search_index = ProblemSearchIndex(_load_search_documents, version=lambda user_id: versions.version(f"problems:{user_id}"))
+
+@app.get("/api/v1/problems/search", response_model=List[models.ProblemSearchResult])
+def search_problems(
+    q: str = Query(..., min_length=1, max_length=200),
+    folder_id: Optional[int] = None,
+    curriculum_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: models.User = Depends(get_current_user)
+):
+    curriculum_ids = curriculum_descendants(curriculum_id) if curriculum_id else None
+    results = search_index.search(current_user.user_id, q, limit, folder_id, curriculum_ids)
+    return [models.ProblemSearchResult(**r["problem"], score=r["score"]) for r in results]
+
+@app.get("/api/v1/statistics", response_model=models.StatisticsResponse, dependencies=[Depends(admit_user("statistics"))])
 def get_statistics(current_user: models.User = Depends(get_current_user)):
     # 1. Fetch all problems
-    problems_response = supabase.table('problems').select("*").eq('user_id', current_user.user_id).execute()
+    db = scoped(current_user.user_id)
+    problems_response = db.select('problems', "problem_id, folder_id, curriculum_id").execute()
     problems = problems_response.data
     
     # 2. Fetch all solve logs (latest per problem is enough for status, but for total solves we need all)
     # Actually, let's just fetch all logs to compute accurate stats
-    logs_response = supabase.table('solve_logs').select("*").eq('user_id', current_user.user_id).execute()
+    logs_response = db.select('solve_logs', "problem_id, is_correct, created_at").execute()
     logs = logs_response.data
     
     # 3. Fetch folders and curriculums for names
-    folders_response = supabase.table('folders').select("*").execute()
+    folders_response = db.select('folders', "folder_id, name").execute()
     folders = {f['folder_id']: f['name'] for f in folders_response.data}
     
-    curriculums_response = supabase.table('curriculums').select("*").execute()
-    curriculums = {c['curriculum_id']: c['name'] for c in curriculums_response.data}
+    curriculums = {c['curriculum_id']: c['name'] for c in curriculum_rows.get()}
     
     # Aggregation Data Structures
     total_problems = len(problems)
@@ -436,7 +915,146 @@ def get_statistics(current_user: models.User = Depends(get_current_user)):
     )
 
 
-@app.post("/api/v1/problems", response_model=models.Problem)
+def upload_problem_image(user_id: int, file_content: bytes, file_ext: str, content_type: Optional[str] = None) -> str:
+    # Upload image to Supabase Storage and return its public URL
+    try:
+        file_name = f"{user_id}/{uuid.uuid4()}.{file_ext}"
+        if not content_type:
+            content_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+
+        # Assuming 'problems' bucket exists
+        supabase.storage.from_("problems").upload(
+            file_name, 
+            file_content, 
+            {"content-type": content_type}
+        )
+        
+        # Get Public URL
+        public_url = supabase.storage.from_("problems").get_public_url(file_name)
+        return public_url
+    except Exception as e:
+        print(f"Upload failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Image upload failed: {str(e)}")
+
+# --- Time Analytics ---
+
+SOLVE_LOG_PAGE_SIZE = 1000
+
+def _fetch_solve_logs_since(user_id: int, after_id: int) -> List[dict]:
+    # PostgREST caps rows per request, so page through by solve_log_id
+    rows = []
+    while True:
+        # columns: read by time_analytics.SolveLogColumnStore
+        page = scoped(user_id).select('solve_logs', "solve_log_id, problem_id, is_correct, time_spent, created_at")\
+            .gt('solve_log_id', after_id)\
+            .order('solve_log_id')\
+            .limit(SOLVE_LOG_PAGE_SIZE)\
+            .execute().data
+        rows.extend(page)
+        if len(page) < SOLVE_LOG_PAGE_SIZE:
+            return rows
+        after_id = page[-1]['solve_log_id']
+
+def _count_solve_logs(user_id: int) -> int:
+    response = scoped(user_id).select('solve_logs', "solve_log_id", count="exact").limit(1).execute()
+    return response.count or 0
+
+solve_log_columns = None
+
+def get_solve_log_columns():
+    # Created on first use so that NumPy is not imported at start-up
+    global solve_log_columns
+    if solve_log_columns is None:
+        solve_log_columns = time_analytics.SolveLogColumnStore(
+            _fetch_solve_logs_since, _count_solve_logs, version=lambda user_id: versions.version(f"solve_logs:{user_id}"))
+    return solve_log_columns
+
+@app.get("/api/v1/statistics/time", response_model=models.TimeAnalyticsResponse)
+def get_time_statistics(weeks: int = Query(12, ge=1, le=104), current_user: models.User = Depends(get_current_user)):
+    log_columns = get_solve_log_columns().get(current_user.user_id)
+    problems = scoped(current_user.user_id).select('problems', "problem_id, folder_id, curriculum_id").execute().data
+
+    analytics = time_analytics.compute_time_analytics(log_columns, problems, datetime.now(timezone.utc).timestamp(), weeks)
+
+    folder_ids = list(analytics["folder"])
+    curriculum_ids = list(analytics["curriculum"])
+    folders = {}
+    if folder_ids:
+        folders_response = scoped(current_user.user_id).select('folders', "folder_id, name").in_('folder_id', folder_ids).execute()
+        folders = {f['folder_id']: f['name'] for f in folders_response.data}
+    curriculums = {c['curriculum_id']: c['name'] for c in curriculum_rows.get()}
+
+    return models.TimeAnalyticsResponse(
+        weeks=weeks,
+        overall=analytics["overall"].get(0),
+        by_folder=[
+            models.FolderTimeStatItem(folder_id=fid, name=folders.get(fid, f"Unknown Folder {fid}"), **stats)
+            for fid, stats in analytics["folder"].items()
+        ],
+        by_curriculum=[
+            models.CurriculumTimeStatItem(curriculum_id=cid, name=curriculums.get(cid, f"Unknown Curriculum {cid}"), **stats)
+            for cid, stats in analytics["curriculum"].items()
+        ],
+    )
+
+@app.get("/api/v1/statistics/curriculums", response_model=models.CurriculumStatsResponse, dependencies=[Depends(admit_user("statistics"))])
+def get_curriculum_statistics(
+    weeks: int = Query(12, ge=1, le=104),
+    include_empty: bool = False,
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Statistics for every curriculum subtree (e.g. 대수 as a whole, not only its
+    leaf units), nested like the curriculum tree. Subtrees without problems are
+    left out unless include_empty is set.
+    """
+    tree = curriculum_tree.get()
+    log_columns = get_solve_log_columns().get(current_user.user_id)
+    problems = scoped(current_user.user_id).select('problems', "problem_id, folder_id, curriculum_id").execute().data
+    outcomes = time_analytics.latest_outcomes(log_columns)
+
+    counts = {}
+    for p in problems:
+        if p['curriculum_id'] not in tree.depth:
+            continue
+        stat = counts.setdefault(p['curriculum_id'], {"total": 0, "solved": 0, "correct": 0})
+        stat["total"] += 1
+        if p['problem_id'] in outcomes:
+            stat["solved"] += 1
+            if outcomes[p['problem_id']]:
+                stat["correct"] += 1
+    totals = tree.rollup(counts, ("total", "solved", "correct"))
+
+    # Curriculums at the same depth are disjoint, so each depth is one ordinary
+    # grouping of the problems by their ancestor at that depth
+    levels = {
+        f"depth_{depth}": [tree.ancestor_at(p['curriculum_id'], depth) for p in problems]
+        for depth in range(tree.max_depth + 1)
+    }
+    analytics = time_analytics.compute_time_analytics(columns, problems, datetime.now(timezone.utc).timestamp(), weeks, levels)
+    time_stats = {}
+    for name in levels:
+        time_stats.update(analytics[name])
+
+    # Children before parents, so each node can take its finished children
+    nodes = {}
+    for cid in reversed(tree.order):
+        stat = totals[cid]
+        if stat["total"] == 0 and not include_empty:
+            continue
+        row = tree.nodes[cid]
+        nodes[cid] = models.CurriculumStatNode(
+            curriculum_id=cid,
+            name=row['name'],
+            level=row['level'] or 0,
+            **stat,
+            correct_rate=(stat["correct"] / stat["solved"] * 100) if stat["solved"] > 0 else 0.0,
+            time=time_stats.get(cid),
+            children=[nodes[child] for child in tree.children.get(cid, []) if child in nodes],
+        )
+    return models.CurriculumStatsResponse(weeks=weeks, roots=[nodes[cid] for cid in tree.roots if cid in nodes])
+
+@app.post("/api/v1/problems", response_model=models.ProblemCreateResponse)
 async def create_problem(
     title: str = Form(...),
     folder_id: Optional[int] = Form(None),
@@ -446,29 +1064,24 @@ async def create_problem(
     answer_image: UploadFile = File(...),
     current_user: models.User = Depends(get_current_user)
 ):
-    # Helper to upload image to Supabase Storage
-    async def upload_image(file: UploadFile) -> str:
-        try:
-            file_ext = file.filename.split('.')[-1]
-            file_name = f"{current_user.user_id}/{uuid.uuid4()}.{file_ext}"
-            file_content = await file.read()
-            
-            # Assuming 'problems' bucket exists
-            supabase.storage.from_("problems").upload(
-                file_name, 
-                file_content, 
-                {"content-type": file.content_type}
-            )
-            
-            # Get Public URL
-            public_url = supabase.storage.from_("problems").get_public_url(file_name)
-            return public_url
-        except Exception as e:
-            print(f"Upload failed: {e}")
-            raise HTTPException(status_code=500, detail=f"Image upload failed: {str(e)}")
+    async def upload_image(file: UploadFile, file_content: bytes) -> str:
+        file_ext = file.filename.split('.')[-1]
+        return upload_problem_image(current_user.user_id, file_content, file_ext, file.content_type)
+
+    content_data = await content_image.read()
+    content_url = await upload_image(content_image, content_data)
+    try:
+        answer_url = await upload_image(answer_image, await answer_image.read())
+    except Exception:
+        enqueue_storage_cleanup([content_url], current_user.user_id)
+        raise
 
-    content_url = await upload_image(content_image)
-    answer_url = await upload_image(answer_image)
+    # Look for earlier registrations of the same photo
+    image_hash = await run_in_threadpool(image_hash_or_none, content_data)
+    duplicates = []
+    if image_hash is not None:
+        duplicates = await run_in_threadpool(
+            phash_index.query, current_user.user_id, image_hash, DUPLICATE_IMAGE_MAX_DISTANCE)
 
     problem_data = {
         "user_id": current_user.user_id,
@@ -476,65 +1089,525 @@ async def create_problem(
         "folder_id": folder_id,
         "curriculum_id": curriculum_id,
         "problem_image_url": content_url,
-        "answer_image_url": answer_url
+        "answer_image_url": answer_url,
+        "image_hash": hash_to_hex(image_hash) if image_hash is not None else None
     }
     
-    response = supabase.table('problems').insert(problem_data).execute()
+    try:
+        response = scoped(current_user.user_id).insert('problems', problem_data).execute()
+    except Exception:
+        enqueue_storage_cleanup([content_url, answer_url], current_user.user_id)
+        raise
     if not response.data:
+        enqueue_storage_cleanup([content_url, answer_url], current_user.user_id)
         raise HTTPException(status_code=400, detail="Failed to create problem")
     
     new_problem = response.data[0]
     problem_id = new_problem['problem_id']
     
-    if hints:
-        hint_list = [h.strip() for h in hints.split(',') if h.strip()]
-        if hint_list:
-            hints_data = [{"problem_id": problem_id, "content": h, "step_number": i+1} for i, h in enumerate(hint_list)]
-            supabase.table('hints').insert(hints_data).execute()
-        
+    hint_list = [h.strip() for h in hints.split(',') if h.strip()] if hints else []
+    if hint_list:
+        hints_data = [{"problem_id": problem_id, "content": h, "step_number": i+1} for i, h in enumerate(hint_list)]
+        scoped(current_user.user_id).insert('hints', hints_data).execute()
+
+    job_queue.enqueue("image_renditions", {"urls": [content_url, answer_url]}, user_id=current_user.user_id)
+    record_target_use(current_user.user_id, [folder_id], [curriculum_id])
+    # Bump before publishing, so clients that refetch on the event do not get cached results
+    search_index.upsert(current_user.user_id, new_problem, hint_list, version=versions.bump(f"problems:{current_user.user_id}"))
+    if image_hash is not None:
+        phash_index.add(current_user.user_id, problem_id, image_hash,
+                        version=versions.bump(f"image_hashes:{current_user.user_id}"))
+    publish_event(current_user.user_id, "problem_created", problem=models.Problem(**new_problem).model_dump(mode="json"),
+                  counters=counter_deltas(new_problem, 1, 'not_attempted', 'not_attempted'))
+
+    new_problem["similar_problems"] = await run_in_threadpool(similar_problems, current_user.user_id, duplicates)
     return new_problem
 
+# --- Bulk Import Endpoints ---
+
+def _import_job(job_id: str) -> ProblemImportJob:
+    return ProblemImportJob(
+        os.path.join(IMPORT_DIR, job_id),
+        supabase,
+        upload_image=lambda user_id, data, ext: upload_problem_image(user_id, data, ext),
+        process_image=lambda data: image_processing.crop_document(data),
+        batch_size=IMPORT_BATCH_SIZE,
+        parallelism=IMPORT_PARALLELISM,
+        # Committed rows show up in the problem list and search while the import runs
+        on_batch=lambda user_id: versions.bump(f"problems:{user_id}"),
+    )
+
+@job_queue.handler("problem_import", concurrency=2, max_attempts=3)
+def run_problem_import(payload: dict):
+    state = _import_job(payload["import_id"]).run()
+    # Rebuilt from the database on the next search
+    versions.bump(f"problems:{state['user_id']}")
+    search_index.invalidate(state["user_id"])
+    phash_index.invalidate(state["user_id"])
+    publish_event(state["user_id"], "resync")
+    _enqueue_image_hash_backfill(state["user_id"])
+    if state["status"] == "failed":
+        # Let the queue retry with backoff; the next run resumes from the checkpoint
+        raise RuntimeError(state.get("error") or "Import failed")
+    return job_summary(state)
+
+def _start_import(job_id: str, user_id: int):
+    job_queue.enqueue("problem_import", {"import_id": job_id}, user_id=user_id, dedupe_key=f"import:{job_id}")
+
+def _load_import_state(job_id: str, user_id: int) -> dict:
+    job_dir = os.path.join(IMPORT_DIR, job_id)
+    if not job_id.isalnum() or not os.path.exists(os.path.join(job_dir, "state.json")):
+        raise HTTPException(status_code=404, detail="Import job not found")
+    state = _import_job(job_id).load_state()
+    if state["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Import job not found")
+
+    active = job_queue.find_active(f"import:{job_id}")
+    if active:
+        # Queued for a retry after a failed attempt
+        state["status"] = active["status"]
+    elif state["status"] in ("queued", "running"):
+        state["status"] = "interrupted"
+    return state
+
+@app.post("/api/v1/problems/import", response_model=models.ImportJobStatus)
+def import_problems(
+    archive: UploadFile = File(...),
+    manifest: Optional[UploadFile] = File(None),
+    auto_crop: bool = Form(False),
+    current_user: models.User = Depends(get_current_user)
+):
+    job_id = uuid.uuid4().hex
+    job_dir = os.path.join(IMPORT_DIR, job_id)
+    os.makedirs(job_dir)
+    # Spool the archive to disk; entries are read one by one during the import
+    with open(os.path.join(job_dir, "archive.zip"), "wb") as f:
+        shutil.copyfileobj(archive.file, f, 1024 * 1024)
+
+    try:
+        manifest_data = manifest.file.read() if manifest else None
+        rows = read_manifest(
+            os.path.join(job_dir, "archive.zip"),
+            manifest_data,
+            manifest.filename if manifest else "",
+        )
+    except ManifestError as e:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    state = ProblemImportJob.create(job_dir, current_user.user_id, rows, auto_crop)
+    _start_import(job_id, current_user.user_id)
+    return job_summary(state)
+
+@app.get("/api/v1/problems/import/{job_id}", response_model=models.ImportJobStatus)
+def get_import_status(job_id: str, current_user: models.User = Depends(get_current_user)):
+    return job_summary(_load_import_state(job_id, current_user.user_id))
+
+@app.post("/api/v1/problems/import/{job_id}/resume", response_model=models.ImportJobStatus)
+def resume_import(job_id: str, current_user: models.User = Depends(get_current_user)):
+    state = _load_import_state(job_id, current_user.user_id)
+    if state["status"] in ("queued", "running"):
+        raise HTTPException(status_code=409, detail="Import job is still running")
+    if state["status"] == "completed":
+        return job_summary(state)
+
+    _start_import(job_id, current_user.user_id)
+    state["status"] = "queued"
+    return job_summary(state)
+
 @app.put("/api/v1/problems/{problem_id}", response_model=models.Problem)
 def update_problem(problem_id: int, problem: models.ProblemUpdate, current_user: models.User = Depends(get_current_user)):
     data = problem.model_dump(exclude_unset=True)
     if not data:
         raise HTTPException(status_code=400, detail="No data to update")
     
+    if data.get('curriculum_id') is not None:
+        require_curriculum(data['curriculum_id'])
+
     data['updated_by'] = current_user.user_id
+    if 'problem_image_url' in data:
+        # Re-hashed in the background
+        data['image_hash'] = None
+
+    image_columns = [c for c in ('problem_image_url', 'answer_image_url') if c in data]
+    location_columns = [c for c in ('folder_id', 'curriculum_id') if c in data]
+    old_urls = []
+    old = None
+    if image_columns or location_columns:
+        # Replaced images are garbage collected after the update; moves change the stats counters
+        existing = scoped(current_user.user_id).select('problems', ", ".join(image_columns + location_columns)).eq('problem_id', problem_id).execute()
+        old_urls = [row[c] for row in existing.data for c in image_columns if row[c] != data[c]]
+        old = existing.data[0] if existing.data else None
     
-    response = supabase.table('problems').update(data).eq('problem_id', problem_id).eq('user_id', current_user.user_id).execute()
+    response = scoped(current_user.user_id).update('problems', data).eq('problem_id', problem_id).execute()
     if not response.data:
         raise HTTPException(status_code=404, detail="Problem not found")
+    enqueue_storage_cleanup(old_urls, current_user.user_id)
+    counters = []
+    moved_from = {c: old[c] for c in location_columns if old[c] != data[c]} if old else {}
+    if moved_from:
+        latest = problem_status(current_user.user_id, problem_id)
+        moved_to = {c: response.data[0][c] for c in moved_from}
+        counters = counter_deltas(moved_from, -1, latest, 'not_attempted') + counter_deltas(moved_to, 1, 'not_attempted', latest)
+    search_index.upsert(current_user.user_id, response.data[0], version=versions.bump(f"problems:{current_user.user_id}"))
+    if 'problem_image_url' in data:
+        phash_index.remove(current_user.user_id, problem_id, version=versions.bump(f"image_hashes:{current_user.user_id}"))
+        _enqueue_image_hash_backfill(current_user.user_id)
+    publish_event(current_user.user_id, "problem_updated", problem=models.Problem(**response.data[0]).model_dump(mode="json"), counters=counters)
     return response.data[0]
 
+def _after_problems_deleted(user_id: int, rows: List[dict]):
+    enqueue_storage_cleanup([url for row in rows for url in (row['problem_image_url'], row['answer_image_url'])], user_id)
+    for row in rows:
+        search_index.remove(user_id, row['problem_id'], version=versions.bump(f"problems:{user_id}"))
+        phash_index.remove(user_id, row['problem_id'], version=versions.bump(f"image_hashes:{user_id}"))
+    # Their solve logs were deleted by the cascade
+    versions.bump(f"solve_logs:{user_id}")
+
 @app.delete("/api/v1/problems/{problem_id}")
 def delete_problem(problem_id: int, current_user: models.User = Depends(get_current_user)):
-    # Hints cascade delete if configured in DB, otherwise delete manually
-    supabase.table('hints').delete().eq('problem_id', problem_id).execute()
-    
-    response = supabase.table('problems').delete().eq('problem_id', problem_id).eq('user_id', current_user.user_id).execute()
+    # Read before the delete; hints and solve logs are removed by ON DELETE CASCADE
+    latest = problem_status(current_user.user_id, problem_id)
+    response = scoped(current_user.user_id).delete('problems').eq('problem_id', problem_id).execute()
     if not response.data:
         raise HTTPException(status_code=404, detail="Problem not found")
+    _after_problems_deleted(current_user.user_id, response.data)
+    publish_event(current_user.user_id, "problem_deleted", problem_id=problem_id,
+                  counters=counter_deltas(response.data[0], -1, latest, 'not_attempted'))
     return {"message": "Problem deleted"}
 
+PROBLEM_BATCH_MAX_ITEMS = 500
+
+def _batch_problem_ids(problem_ids: List[int]) -> List[int]:
+    ids = list(dict.fromkeys(problem_ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="No problems selected")
+    if len(ids) > PROBLEM_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {PROBLEM_BATCH_MAX_ITEMS} problems per batch")
+    return ids
+
+@app.post("/api/v1/problems/batch/delete", response_model=List[models.ProblemBatchResult])
+def delete_problems_batch(batch: models.ProblemBatchDelete, current_user: models.User = Depends(get_current_user)):
+    ids = _batch_problem_ids(batch.problem_ids)
+    # One statement, so the batch is deleted atomically; ids of other users simply do not match
+    response = scoped(current_user.user_id).delete('problems').in_('problem_id', ids).execute()
+    deleted = {row['problem_id'] for row in response.data}
+    if response.data:
+        _after_problems_deleted(current_user.user_id, response.data)
+        publish_event(current_user.user_id, "resync")
+    return [models.ProblemBatchResult(problem_id=pid, status="deleted" if pid in deleted else "not_found") for pid in ids]
+
+@app.post("/api/v1/problems/batch/update", response_model=List[models.ProblemBatchResult])
+def update_problems_batch(batch: models.ProblemBatchUpdate, current_user: models.User = Depends(get_current_user)):
+    ids = _batch_problem_ids(batch.problem_ids)
+    data = batch.model_dump(exclude_unset=True, exclude={'problem_ids'})
+    if not data:
+        raise HTTPException(status_code=400, detail="No data to update")
+    if data.get('folder_id') is not None:
+        folder = scoped(current_user.user_id).select('folders', "folder_id").eq('folder_id', data['folder_id']).execute()
+        if not folder.data:
+            raise HTTPException(status_code=404, detail="Folder not found")
+    if data.get('curriculum_id') is not None:
+        require_curriculum(data['curriculum_id'])
+
+    data['updated_by'] = current_user.user_id
+    response = scoped(current_user.user_id).update('problems', data).in_('problem_id', ids).execute()
+    for row in response.data:
+        search_index.upsert(current_user.user_id, row, version=versions.bump(f"problems:{current_user.user_id}"))
+    if response.data:
+        record_target_use(current_user.user_id, [data.get('folder_id')], [data.get('curriculum_id')])
+        publish_event(current_user.user_id, "resync")
+    updated = {row['problem_id'] for row in response.data}
+    return [models.ProblemBatchResult(problem_id=pid, status="updated" if pid in updated else "not_found") for pid in ids]
+
 @app.put("/api/v1/problems/reorder")
 def reorder_problems(items: List[models.ProblemReorderItem], current_user: models.User = Depends(get_current_user)):
     for item in items:
-        supabase.table('problems').update({"sort_order": item.sort_order}).eq('problem_id', item.problem_id).eq('user_id', current_user.user_id).execute()
+        scoped(current_user.user_id).update('problems', {"sort_order": item.sort_order}).eq('problem_id', item.problem_id).execute()
+    versions.bump(f"problems:{current_user.user_id}")
     return {"message": "Problems reordered"}
 
+PROBLEM_DETAIL_MAX_ITEMS = int(os.environ.get("PROBLEM_DETAIL_MAX_ITEMS", 20))
+
+@app.get("/api/v1/problems/details", response_model=List[models.ProblemDetail])
+def get_problem_details(ids: List[int] = Query(...), current_user: models.User = Depends(get_current_user)):
+    """
+    Several problems with their hints and solve stats, e.g. the next few of a
+    study session for prefetching. Two queries in total regardless of the count.
+    Ids that do not exist or belong to someone else are left out.
+    """
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > PROBLEM_DETAIL_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {PROBLEM_DETAIL_MAX_ITEMS} problems per request")
+
+    db = scoped(current_user.user_id)
+    response = db.select('problems', f"{PROBLEM_COLUMNS}, hints({HINT_COLUMNS})").in_('problem_id', ids).execute()
+    log_response = db.select('solve_logs', "problem_id, is_correct")\
+        .in_('problem_id', ids)\
+        .order('created_at', desc=True)\
+        .execute()
+    problem_stats = summarize_solve_logs(log_response.data)
+
+    by_id = {}
+    for problem in response.data:
+        problem['hints'] = sorted(problem.get('hints') or [], key=lambda h: h['step_number'])
+        by_id[problem['problem_id']] = models.ProblemDetail(**problem, **problem_stats.get(problem['problem_id'], EMPTY_PROBLEM_STATS))
+    # Same order as requested
+    return [by_id[pid] for pid in ids if pid in by_id]
+
 @app.get("/api/v1/problems/{problem_id}", response_model=models.ProblemWithHints)
 def get_problem(problem_id: int, current_user: models.User = Depends(get_current_user)):
-    response = supabase.table('problems').select("*").eq('problem_id', problem_id).eq('user_id', current_user.user_id).single().execute()
+    db = scoped(current_user.user_id)
+    response = db.select('problems', PROBLEM_COLUMNS).eq('problem_id', problem_id).single().execute()
     if not response.data:
         raise HTTPException(status_code=404, detail="Problem not found")
     problem = response.data
     
-    hints_response = supabase.table('hints').select("*").eq('problem_id', problem_id).order('step_number').execute()
+    hints_response = db.select('hints', HINT_COLUMNS).eq('problem_id', problem_id).order('step_number').execute()
     problem['hints'] = hints_response.data
     
     return problem
 
+def storage_path_from_url(public_url: str) -> Optional[str]:
+    # Public URLs look like {SUPABASE_URL}/storage/v1/object/public/problems/{path}
+    marker = "/object/public/problems/"
+    if not public_url or marker not in public_url:
+        return None
+    return public_url.split(marker, 1)[1].split("?", 1)[0]
+
+@app.get("/api/v1/problems/{problem_id}/image")
+def get_problem_image(
+    problem_id: int,
+    request: Request,
+    kind: str = 'problem',
+    width: int = Query(640, ge=16, le=2048),
+    format: str = 'jpg',
+    v: Optional[str] = None,
+    current_user: models.User = Depends(get_current_user)
+):
+    if kind not in ('problem', 'answer'):
+        raise HTTPException(status_code=400, detail="kind must be 'problem' or 'answer'")
+    if format not in IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(IMAGE_FORMATS)}")
+
+    # columns: read as f"{kind}_image_url"
+    response = scoped(current_user.user_id).select('problems', "problem_image_url, answer_image_url").eq('problem_id', problem_id).execute()
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Problem not found")
+
+    source_path = storage_path_from_url(response.data[0][f"{kind}_image_url"])
+    if not source_path:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    # Uploaded objects are never overwritten (every upload gets a new uuid path),
+    # so the storage path identifies the original content and the variant key
+    # doubles as a content hash for ETag / long-lived caching.
+    variant_key = f"{source_path}:{width}:{format}"
+    etag = f'"{os.path.basename(image_cache.path_for(variant_key))[:32]}"'
+    if v and f'"{v}"' == etag:
+        cache_control = "private, max-age=31536000, immutable"
+    else:
+        cache_control = "private, no-cache"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    try:
+        path = render_image_variant(source_path, width, format)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return FileResponse(path, media_type=IMAGE_FORMATS[format], headers=headers)
+
+def render_image_variant(source_path: str, width: int, format: str) -> str:
+    # Returns the cached file for a resized variant, fetching the original from storage once
+    def load_original() -> bytes:
+        try:
+            return supabase.storage.from_("problems").download(source_path)
+        except Exception as e:
+            print(f"Image download failed: {e}")
+            raise HTTPException(status_code=502, detail="Failed to fetch original image")
+
+    def render_variant() -> bytes:
+        original_path = image_cache.get_or_create(f"{source_path}:original", load_original)
+        with open(original_path, "rb") as f:
+            original = f.read()
+        return image_processing.resize_image(original, width, format)
+
+    return image_cache.get_or_create(f"{source_path}:{width}:{format}", render_variant)
+
+@job_queue.handler("image_renditions", concurrency=2, max_attempts=3)
+def warm_image_renditions(payload: dict):
+    for url in payload["urls"]:
+        source_path = storage_path_from_url(url)
+        if not source_path:
+            continue
+        for width in IMAGE_RENDITION_WIDTHS:
+            render_image_variant(source_path, width, "jpg")
+
+# --- Storage Garbage Collection ---
+
+# Images no longer referenced by any problem are removed in the background.
+# Deletion waits STORAGE_DELETE_DELAY so in-flight downloads (exports, renditions) can finish.
+STORAGE_DELETE_DELAY = float(os.environ.get("STORAGE_DELETE_DELAY", 60))
+STORAGE_REMOVE_BATCH_SIZE = 100
+# The sweep compares the bucket against the problems table to catch anything missed.
+# Objects younger than the grace period may belong to an upload whose row is not inserted yet.
+STORAGE_SWEEP_INTERVAL = int(os.environ.get("STORAGE_SWEEP_INTERVAL", 24 * 3600))
+STORAGE_SWEEP_GRACE = int(os.environ.get("STORAGE_SWEEP_GRACE", 24 * 3600))
+STORAGE_LIST_PAGE_SIZE = 1000
+
+def enqueue_storage_cleanup(urls: List[Optional[str]], user_id: Optional[int] = None):
+    paths = sorted({p for p in (storage_path_from_url(u) for u in urls if u) if p})
+    if paths:
+        job_queue.enqueue("storage_cleanup", {"paths": paths}, user_id=user_id, delay=STORAGE_DELETE_DELAY)
+
+def _referenced_paths(paths: List[str]) -> set:
+    # Another problem may point at the same object (URLs can be set through update_problem)
+    bucket = supabase.storage.from_("problems")
+    urls = []
+    for path in paths:
+        url = bucket.get_public_url(path)
+        # Older clients stored public URLs with a trailing "?"
+        urls.extend([url.rstrip("?"), url.rstrip("?") + "?"])
+    referenced = set()
+    for column in ('problem_image_url', 'answer_image_url'):
+        response = supabase.table('problems').select(column).in_(column, urls).execute()  # unscoped: references from every user count
+        referenced.update(storage_path_from_url(row[column]) for row in response.data)
+    return referenced
+
+def remove_unreferenced_objects(paths: List[str]) -> int:
+    removed = 0
+    for i in range(0, len(paths), STORAGE_REMOVE_BATCH_SIZE):
+        batch = paths[i:i + STORAGE_REMOVE_BATCH_SIZE]
+        referenced = _referenced_paths(batch)
+        orphans = [p for p in batch if p not in referenced]
+        if orphans:
+            supabase.storage.from_("problems").remove(orphans)
+            removed += len(orphans)
+    return removed
+
+@job_queue.handler("storage_cleanup", concurrency=1, max_attempts=5)
+def run_storage_cleanup(payload: dict):
+    return {"removed": remove_unreferenced_objects(payload["paths"])}
+
+def _list_bucket(prefix: str) -> List[dict]:
+    entries = []
+    while True:
+        page = supabase.storage.from_("problems").list(prefix, {"limit": STORAGE_LIST_PAGE_SIZE, "offset": len(entries)})
+        entries.extend(page)
+        if len(page) < STORAGE_LIST_PAGE_SIZE:
+            return entries
+
+def schedule_storage_sweep():
+    if STORAGE_SWEEP_INTERVAL <= 0:
+        return
+    # All workers compute the same key for the next period, so only one sweep is queued per period
+    next_period = int(time.time() // STORAGE_SWEEP_INTERVAL) + 1
+    job_queue.enqueue("storage_sweep", {"period": next_period},
+                      delay=next_period * STORAGE_SWEEP_INTERVAL - time.time(),
+                      dedupe_key=f"storage_sweep:{next_period}")
+
+@job_queue.handler("storage_sweep", concurrency=1, max_attempts=3)
+def run_storage_sweep(payload: dict):
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=STORAGE_SWEEP_GRACE)
+    scanned = 0
+    removed = 0
+    try:
+        # Objects are stored as {user_id}/{uuid}.{ext}
+        for folder in _list_bucket(""):
+            if folder.get('id') is not None or not folder['name'].isdigit():
+                continue
+            candidates = []
+            for entry in _list_bucket(folder['name']):
+                if entry.get('id') is None or not entry.get('created_at'):
+                    continue
+                scanned += 1
+                created_at = datetime.fromisoformat(entry['created_at'].replace('Z', '+00:00'))
+                if created_at < cutoff:
+                    candidates.append(f"{folder['name']}/{entry['name']}")
+            removed += remove_unreferenced_objects(candidates)
+    finally:
+        schedule_storage_sweep()
+    return {"scanned": scanned, "removed": removed}
+
+# --- Similar Problems ---
+
+# Hamming distance (out of 64 bits) under which images count as the same photo
+DUPLICATE_IMAGE_MAX_DISTANCE = int(os.environ.get("DUPLICATE_IMAGE_MAX_DISTANCE", 6))
+SIMILAR_IMAGE_MAX_DISTANCE = int(os.environ.get("SIMILAR_IMAGE_MAX_DISTANCE", 12))
+IMAGE_HASH_BATCH_SIZE = 50
+
+def image_hash_or_none(file_data: bytes) -> Optional[int]:
+    try:
+        return image_processing.perceptual_hash(file_data)
+    except Exception as e:
+        print(f"Image hash failed: {e}")
+        return None
+
+def _enqueue_image_hash_backfill(user_id: int):
+    job_queue.enqueue("image_hash", {"user_id": user_id}, user_id=user_id, dedupe_key=f"image_hash:{user_id}")
+
+def _load_image_hashes(user_id: int) -> List[tuple]:
+    response = scoped(user_id).select('problems', "problem_id, image_hash").execute()
+    if any(row['image_hash'] is None for row in response.data):
+        # Problems created before hashing existed (or by the bulk import)
+        _enqueue_image_hash_backfill(user_id)
+    return [(row['problem_id'], hash_from_hex(row['image_hash'])) for row in response.data if row['image_hash']]
+
+phash_index = PerceptualHashIndex(_load_image_hashes, version=lambda user_id: versions.version(f"image_hashes:{user_id}"))
+
+@job_queue.handler("image_hash", concurrency=1, max_attempts=3)
+def backfill_image_hashes(payload: dict):
+    user_id = payload["user_id"]
+    hashed = 0
+    # Loop until nothing is left, so rows reset while this job was running are picked up too
+    while True:
+        rows = scoped(user_id).select('problems', "problem_id, problem_image_url") \
+            .is_('image_hash', 'null').limit(IMAGE_HASH_BATCH_SIZE).execute().data
+        if not rows:
+            break
+        for row in rows:
+            try:
+                value = image_processing.perceptual_hash(fetch_problem_image(row['problem_image_url']))
+            except ValueError as e:
+                # Missing or undecodable image: mark it so it is not retried forever
+                print(f"Image hash skipped for problem {row['problem_id']}: {e}")
+                scoped(user_id).update('problems', {"image_hash": ""}).eq('problem_id', row['problem_id']).execute()
+                continue
+            scoped(user_id).update('problems', {"image_hash": hash_to_hex(value)}).eq('problem_id', row['problem_id']).execute()
+            phash_index.add(user_id, row['problem_id'], value, version=versions.bump(f"image_hashes:{user_id}"))
+            hashed += 1
+    return {"hashed": hashed}
+
+def similar_problems(user_id: int, matches: List[dict]) -> List[models.SimilarProblem]:
+    if not matches:
+        return []
+    ids = [m['problem_id'] for m in matches]
+    response = scoped(user_id).select('problems', "problem_id, title, problem_image_url").in_('problem_id', ids).execute()
+    problems = {p['problem_id']: p for p in response.data}
+    return [
+        models.SimilarProblem(**problems[m['problem_id']], distance=m['distance'])
+        for m in matches if m['problem_id'] in problems
+    ]
+
+@app.get("/api/v1/problems/{problem_id}/similar", response_model=List[models.SimilarProblem])
+def get_similar_problems(
+    problem_id: int,
+    max_distance: int = Query(SIMILAR_IMAGE_MAX_DISTANCE, ge=0, le=32),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: models.User = Depends(get_current_user)
+):
+    value = phash_index.hash_of(current_user.user_id, problem_id)
+    if value is None:
+        response = scoped(current_user.user_id).select('problems', "problem_id").eq('problem_id', problem_id).execute()
+        if not response.data:
+            raise HTTPException(status_code=404, detail="Problem not found")
+        # Image not hashed yet (the backfill job is queued by the index load)
+        return []
+    matches = phash_index.query(current_user.user_id, value, max_distance, exclude=problem_id, limit=limit)
+    return similar_problems(current_user.user_id, matches)
+
 @app.post("/api/v1/problems/{problem_id}/solve")
 def solve_problem(problem_id: int, log_data: dict, current_user: models.User = Depends(get_current_user)):
     insert_data = {
@@ -546,24 +1619,180 @@ def solve_problem(problem_id: int, log_data: dict, current_user: models.User = D
         "time_spent": log_data.get('time_spent'),
     }
     
-    response = supabase.table('solve_logs').insert(insert_data).execute()
+    response = scoped(current_user.user_id).insert('solve_logs', insert_data).execute()
+    versions.bump(f"solve_logs:{current_user.user_id}")
+    record_daily_activity(current_user.user_id, response.data)
+    publish_solve(current_user.user_id, problem_id, response.data)
     return response.data
 
+def record_daily_activity(user_id: int, logs: List[dict]):
+    # Incrementally update the per-day rollups for newly inserted solve logs.
+    # Runs as a background job so the solve response does not wait for it.
+    # The job may be retried after the RPC committed; the RPC skips solve logs it has already counted.
+    if not logs:
+        return
+    items = []
+    for log in logs:
+        created_at = datetime.fromisoformat(log['created_at'].replace('Z', '+00:00'))
+        items.append({
+            "solve_log_id": log['solve_log_id'],
+            "activity_date": created_at.astimezone(ACTIVITY_TIMEZONE).date().isoformat(),
+            "problem_id": log['problem_id'],
+            "is_correct": log['is_correct'],
+            "time_spent": log['time_spent'],
+        })
+    job_queue.enqueue("daily_activity", {"user_id": user_id, "items": items}, user_id=user_id)
+
+@job_queue.handler("daily_activity", concurrency=4, max_attempts=8)
+def apply_daily_activity(payload: dict):
+    supabase.rpc("record_daily_activity", {"p_user_id": payload["user_id"], "p_items": payload["items"]}).execute()
+
+@app.get("/api/v1/activity", response_model=models.ActivityResponse)
+def get_activity(start: Optional[date] = None, end: Optional[date] = None, current_user: models.User = Depends(get_current_user)):
+    today = datetime.now(ACTIVITY_TIMEZONE).date()
+    end = end or today
+    start = start or end - timedelta(days=364)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days >= ACTIVITY_MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range must be at most {ACTIVITY_MAX_RANGE_DAYS} days")
+
+    # Reads one rollup row per active day in the range, regardless of how many logs exist
+    response = scoped(current_user.user_id).select('user_daily_activity', "activity_date, attempts, correct, total_time_spent, distinct_problems")\
+        .gte('activity_date', start.isoformat())\
+        .lte('activity_date', end.isoformat())\
+        .order('activity_date')\
+        .execute()
+    rows = {row['activity_date']: row for row in response.data}
+
+    days = []
+    longest_streak = 0
+    streak = 0
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        row = rows.get(day.isoformat())
+        if row and row['attempts'] > 0:
+            days.append(models.ActivityDay(
+                date=day,
+                attempts=row['attempts'],
+                correct=row['correct'],
+                total_time_spent=row['total_time_spent'],
+                distinct_problems=row['distinct_problems'],
+            ))
+            streak += 1
+            longest_streak = max(longest_streak, streak)
+        else:
+            days.append(models.ActivityDay(date=day))
+            streak = 0
+
+    # Current streak ends at `end`; if that is today and nothing is solved yet, it ends yesterday
+    current_streak = 0
+    index = len(days) - 1
+    if end == today and days[index].attempts == 0:
+        index -= 1
+    while index >= 0 and days[index].attempts > 0:
+        current_streak += 1
+        index -= 1
+
+    return models.ActivityResponse(
+        start=start,
+        end=end,
+        days=days,
+        total_attempts=sum(d.attempts for d in days),
+        active_days=sum(1 for d in days if d.attempts > 0),
+        current_streak=current_streak,
+        longest_streak=longest_streak,
+    )
+
+SOLVE_LOG_BATCH_MAX_ITEMS = 500
+
+@app.post("/api/v1/solve-logs/batch", response_model=List[models.SolveLogBatchResult])
+def solve_problems_batch(items: List[models.SolveLogBatchItem], current_user: models.User = Depends(get_current_user)):
+    if len(items) > SOLVE_LOG_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {SOLVE_LOG_BATCH_MAX_ITEMS} items per batch")
+
+    results = {}
+    problem_ids = list({item.problem_id for item in items})
+    owned = set()
+    if problem_ids:
+        owned_response = scoped(current_user.user_id).select('problems', "problem_id").in_('problem_id', problem_ids).execute()
+        owned = {p['problem_id'] for p in owned_response.data}
+
+    now = datetime.now(timezone.utc)
+    rows = []
+    seen_keys = set()
+    for item in items:
+        if item.client_key in seen_keys:
+            continue
+        seen_keys.add(item.client_key)
+        if item.problem_id not in owned:
+            results[item.client_key] = models.SolveLogBatchResult(client_key=item.client_key, status="rejected", detail="Problem not found")
+            continue
+
+        row = {
+            "user_id": current_user.user_id,
+            "problem_id": item.problem_id,
+            "study_session_id": item.study_session_id,
+            "solution": item.solution,
+            "is_correct": item.is_correct,
+            "time_spent": item.time_spent,
+            # Every row carries every key: a bulk upsert sends the union of the keys and
+            # PostgREST writes NULL for the ones a row lacks (created_at is NOT NULL)
+            "created_at": now.isoformat(),
+            "client_key": item.client_key,
+        }
+        if item.client_created_at:
+            # Keep offline attempts in the order they were solved, but never in the future
+            created_at = item.client_created_at
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            row["created_at"] = min(created_at, now).isoformat()
+        rows.append(row)
+
+    if rows:
+        # Single round trip; rows whose (user_id, client_key) already exists are skipped
+        response = scoped(current_user.user_id).upsert('solve_logs', rows, on_conflict="user_id,client_key", ignore_duplicates=True).execute()
+        for log in response.data:
+            results[log['client_key']] = models.SolveLogBatchResult(client_key=log['client_key'], status="created", solve_log_id=log['solve_log_id'])
+        if response.data:
+            versions.bump(f"solve_logs:{current_user.user_id}")
+            publish_event(current_user.user_id, "resync")
+        record_daily_activity(current_user.user_id, response.data)
+
+        duplicate_keys = [r['client_key'] for r in rows if r['client_key'] not in results]
+        if duplicate_keys:
+            existing = scoped(current_user.user_id).select('solve_logs', "solve_log_id, client_key").in_('client_key', duplicate_keys).execute()
+            existing_ids = {log['client_key']: log['solve_log_id'] for log in existing.data}
+            for key in duplicate_keys:
+                results[key] = models.SolveLogBatchResult(client_key=key, status="duplicate", solve_log_id=existing_ids.get(key))
+
+    # One result per distinct key, in request order
+    ordered = []
+    for item in items:
+        if item.client_key in results:
+            ordered.append(results.pop(item.client_key))
+    return ordered
+
+# --- Background Job Endpoints ---
+
+@app.get("/api/v1/jobs", response_model=List[models.Job])
+def get_jobs(status: Optional[str] = None, job_type: Optional[str] = None, limit: int = Query(50, ge=1, le=200), current_user: models.User = Depends(get_current_user)):
+    return job_queue.list(user_id=current_user.user_id, status=status, job_type=job_type, limit=limit)
+
+@app.get("/api/v1/jobs/{job_id}", response_model=models.Job)
+def get_job(job_id: str, current_user: models.User = Depends(get_current_user)):
+    job = job_queue.get(job_id)
+    if not job or job["user_id"] != current_user.user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 # --- Study Session Endpoints ---
 
 @app.get("/api/v1/sessions", response_model=List[models.StudySession])
 def get_sessions(current_user: models.User = Depends(get_current_user)):
-    response = supabase.table('study_sessions').select("*").eq('user_id', current_user.user_id).order('updated_at', desc=True).execute()
-    sessions = response.data
-    
-    for session in sessions:
-        curr_response = supabase.table('study_session_curriculums').select('curriculum_id').eq('study_session_id', session['study_session_id']).execute()
-        session['curriculum_ids'] = [item['curriculum_id'] for item in curr_response.data]
-        
-        folder_response = supabase.table('study_session_folders').select('folder_id').eq('study_session_id', session['study_session_id']).execute()
-        session['folder_ids'] = [item['folder_id'] for item in folder_response.data]
-        
-    return sessions
+    # Targets are embedded, so this is one query however many sessions there are
+    response = scoped(current_user.user_id).select('study_sessions', SESSION_COLUMNS).order('updated_at', desc=True).execute()
+    return [session_with_targets(session) for session in response.data]
 
 @app.post("/api/v1/sessions", response_model=models.StudySession)
 def create_session(session: models.StudySessionCreate, current_user: models.User = Depends(get_current_user)):
@@ -574,7 +1803,7 @@ def create_session(session: models.StudySessionCreate, current_user: models.User
         "created_by": current_user.user_id,
         "updated_by": current_user.user_id
     }
-    response = supabase.table('study_sessions').insert(session_data).execute()
+    response = scoped(current_user.user_id).insert('study_sessions', session_data).execute()
     if not response.data:
         raise HTTPException(status_code=400, detail="Failed to create session")
     
@@ -583,39 +1812,44 @@ def create_session(session: models.StudySessionCreate, current_user: models.User
     
     if session.curriculum_ids:
         curr_data = [{"study_session_id": session_id, "curriculum_id": cid} for cid in session.curriculum_ids]
-        supabase.table('study_session_curriculums').insert(curr_data).execute()
+        scoped(current_user.user_id).insert('study_session_curriculums', curr_data).execute()
         
     if session.folder_ids:
         folder_data = [{"study_session_id": session_id, "folder_id": fid} for fid in session.folder_ids]
-        supabase.table('study_session_folders').insert(folder_data).execute()
+        scoped(current_user.user_id).insert('study_session_folders', folder_data).execute()
         
     new_session['curriculum_ids'] = session.curriculum_ids
     new_session['folder_ids'] = session.folder_ids
+    record_target_use(current_user.user_id, session.folder_ids, session.curriculum_ids)
     
     return new_session
 
 @app.delete("/api/v1/sessions/{session_id}")
 def delete_session(session_id: int, current_user: models.User = Depends(get_current_user)):
-    response = supabase.table('study_sessions').delete().eq('study_session_id', session_id).eq('user_id', current_user.user_id).execute()
+    response = scoped(current_user.user_id).delete('study_sessions').eq('study_session_id', session_id).execute()
     if not response.data:
         raise HTTPException(status_code=404, detail="Session not found")
     return {"message": "Session deleted"}
 
-@app.get("/api/v1/sessions/{session_id}/problems", response_model=List[models.Problem])
-def get_session_problems(session_id: int, current_user: models.User = Depends(get_current_user)):
-    session_response = supabase.table('study_sessions').select("*").eq('study_session_id', session_id).eq('user_id', current_user.user_id).single().execute()
+def session_with_targets(session: dict) -> dict:
+    # Flattens the embedded target rows of a SESSION_COLUMNS select
+    session['curriculum_ids'] = [item['curriculum_id'] for item in session.pop('study_session_curriculums', None) or []]
+    session['folder_ids'] = [item['folder_id'] for item in session.pop('study_session_folders', None) or []]
+    return session
+
+def get_session_targets(session_id: int, user_id: int):
+    # Returns (session, folder_ids, curriculum_ids) for one of the user's study sessions
+    session_response = scoped(user_id).select('study_sessions', SESSION_COLUMNS).eq('study_session_id', session_id).single().execute()
     if not session_response.data:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = session_response.data
-    
-    curr_response = supabase.table('study_session_curriculums').select('curriculum_id').eq('study_session_id', session_id).execute()
-    curriculum_ids = [item['curriculum_id'] for item in curr_response.data]
-    
-    folder_response = supabase.table('study_session_folders').select('folder_id').eq('study_session_id', session_id).execute()
-    folder_ids = [item['folder_id'] for item in folder_response.data]
-    
-    query = supabase.table('problems').select("*").eq('user_id', current_user.user_id)
+    session = session_with_targets(session_response.data)
+    return session, session['folder_ids'], session['curriculum_ids']
+
+def select_problems(user_id: int, folder_ids: List[int], curriculum_ids: List[int], mode: str) -> List[dict]:
+    # Problems in any of the folders or curriculums (all problems if neither is given),
+    # filtered by mode: 'all', 'not_attempted' or 'wrong' (latest attempt was wrong)
+    query = scoped(user_id).select('problems', PROBLEM_COLUMNS)
     
     or_conditions = []
     if folder_ids:
@@ -629,17 +1863,15 @@ def get_session_problems(session_id: int, current_user: models.User = Depends(ge
     problems_response = query.execute()
     problems = problems_response.data
     
-    if session['mode'] == 'all':
+    if mode == 'all':
         return problems
     
     problem_ids = [p['problem_id'] for p in problems]
     if not problem_ids:
         return []
         
-    logs_response = supabase.table('solve_logs')\
-        .select("problem_id, is_correct, created_at")\
+    logs_response = scoped(user_id).select('solve_logs', "problem_id, is_correct")\
         .in_('problem_id', problem_ids)\
-        .eq('user_id', current_user.user_id)\
         .order('created_at', desc=True)\
         .execute()
         
@@ -652,11 +1884,75 @@ def get_session_problems(session_id: int, current_user: models.User = Depends(ge
     final_list = []
     for p in problems:
         pid = p['problem_id']
-        if session['mode'] == 'not_attempted':
+        if mode == 'not_attempted':
             if pid not in latest_status:
                 final_list.append(p)
-        elif session['mode'] == 'wrong':
+        elif mode == 'wrong':
             if pid in latest_status and not latest_status[pid]:
                 final_list.append(p)
                 
     return final_list
+
+@app.get("/api/v1/sessions/{session_id}/problems", response_model=List[models.Problem])
+def get_session_problems(session_id: int, current_user: models.User = Depends(get_current_user)):
+    session, folder_ids, curriculum_ids = get_session_targets(session_id, current_user.user_id)
+    record_target_use(current_user.user_id, folder_ids, curriculum_ids)
+    return select_problems(current_user.user_id, folder_ids, curriculum_ids, session['mode'])
+
+# --- Export Endpoints ---
+
+EXPORT_FETCH_CONCURRENCY = int(os.environ.get("EXPORT_FETCH_CONCURRENCY", 4))
+EXPORT_MAX_PROBLEMS = int(os.environ.get("EXPORT_MAX_PROBLEMS", 500))
+
+def fetch_problem_image(url: str) -> bytes:
+    source_path = storage_path_from_url(url)
+    if not source_path:
+        raise ValueError(f"Not a problem image URL: {url}")
+    return supabase.storage.from_("problems").download(source_path)
+
+@app.get("/api/v1/export")
+def export_problems(
+    format: str = 'pdf',
+    session_id: Optional[int] = None,
+    folder_id: Optional[int] = None,
+    curriculum_id: Optional[int] = None,
+    mode: Optional[str] = None,
+    include_answers: bool = True,
+    current_user: models.User = Depends(get_current_user)
+):
+    if format not in ('pdf', 'zip'):
+        raise HTTPException(status_code=400, detail="format must be 'pdf' or 'zip'")
+    if mode not in (None, 'all', 'wrong', 'not_attempted'):
+        raise HTTPException(status_code=400, detail="mode must be 'all', 'wrong' or 'not_attempted'")
+
+    folder_ids = [folder_id] if folder_id else []
+    curriculum_ids = [curriculum_id] if curriculum_id else []
+    name = "odapclean"
+    if session_id:
+        session, session_folder_ids, session_curriculum_ids = get_session_targets(session_id, current_user.user_id)
+        folder_ids += session_folder_ids
+        curriculum_ids += session_curriculum_ids
+        mode = mode or session['mode']
+        name = f"session-{session_id}"
+    problems = select_problems(current_user.user_id, folder_ids, curriculum_ids, mode or 'all')
+    if not problems:
+        raise HTTPException(status_code=404, detail="No problems to export")
+    if len(problems) > EXPORT_MAX_PROBLEMS:
+        raise HTTPException(status_code=400, detail=f"At most {EXPORT_MAX_PROBLEMS} problems per export")
+    problems.sort(key=lambda p: (p['sort_order'] or 0, p['created_at']))
+
+    hints = {}
+    hints_response = scoped(current_user.user_id).select('hints', "problem_id, content, step_number").in_('problem_id', [p['problem_id'] for p in problems]).order('step_number').execute()
+    for hint in hints_response.data:
+        hints.setdefault(hint['problem_id'], []).append(hint)
+
+    if format == 'pdf':
+        body = iter_pdf(problems, hints, fetch_problem_image, image_processing.to_jpeg, include_answers, EXPORT_FETCH_CONCURRENCY)
+        media_type = "application/pdf"
+    else:
+        body = iter_zip(problems, hints, fetch_problem_image, include_answers, EXPORT_FETCH_CONCURRENCY)
+        media_type = "application/zip"
+
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="{name}.{format}"',
+    })
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Any, List, Optional
 
 class User(BaseModel):
     user_id: int
@@ -91,6 +91,11 @@ class Problem(BaseModel):
 class ProblemWithHints(Problem):
     hints: List[Hint] = []
 
+class ProblemDetail(ProblemWithHints):
+    solve_count: int = 0
+    correct_rate: float = 0.0
+    latest_status: str = "not_attempted"
+
 class ProblemCreate(BaseModel):
     title: str
     folder_id: Optional[int] = None
@@ -115,6 +120,19 @@ class ProblemListResponse(Problem):
     correct_rate: float = 0.0
     latest_status: str = "not_attempted"
 
+class ProblemSearchResult(Problem):
+    score: float
+
+class SimilarProblem(BaseModel):
+    problem_id: int
+    title: str
+    problem_image_url: Optional[str] = None
+    distance: int
+
+class ProblemCreateResponse(Problem):
+    # Earlier problems whose image looks like the same photo
+    similar_problems: List[SimilarProblem] = []
+
 class StudySession(BaseModel):
     study_session_id: int
     user_id: int
@@ -133,6 +151,21 @@ class StudySessionCreate(BaseModel):
     curriculum_ids: List[int] = []
     folder_ids: List[int] = []
 
+class SolveLogBatchItem(BaseModel):
+    client_key: str = Field(..., min_length=1, max_length=128)
+    problem_id: int
+    is_correct: bool = False
+    time_spent: Optional[int] = None
+    study_session_id: Optional[int] = None
+    solution: str = ''
+    client_created_at: Optional[datetime] = None
+
+class SolveLogBatchResult(BaseModel):
+    client_key: str
+    status: str  # 'created', 'duplicate' or 'rejected'
+    solve_log_id: Optional[int] = None
+    detail: Optional[str] = None
+
 class FolderStatItem(BaseModel):
     folder_id: int
     name: str
@@ -157,6 +190,82 @@ class StatisticsResponse(BaseModel):
     by_folder: List[FolderStatItem]
     by_curriculum: List[CurriculumStatItem]
 
+class TimeTrendPoint(BaseModel):
+    week_start: datetime
+    attempts: int
+    mean_time: float
+
+class TimeStatItem(BaseModel):
+    attempts: int
+    mean_time: Optional[float] = None
+    median_time: Optional[float] = None
+    p90_time: Optional[float] = None
+    trend_per_week: Optional[float] = None  # change in seconds per week (negative = getting faster)
+    weekly: List[TimeTrendPoint] = []
+    resolved_problems: int = 0
+    mean_improvement: Optional[float] = None  # seconds saved between first and latest attempt
+    mean_improvement_rate: Optional[float] = None  # percent
+
+class FolderTimeStatItem(TimeStatItem):
+    folder_id: int
+    name: str
+
+class CurriculumTimeStatItem(TimeStatItem):
+    curriculum_id: int
+    name: str
+
+class TimeAnalyticsResponse(BaseModel):
+    weeks: int
+    overall: Optional[TimeStatItem] = None
+    by_folder: List[FolderTimeStatItem]
+    by_curriculum: List[CurriculumTimeStatItem]
+
+class CurriculumStatNode(BaseModel):
+    # Counts and times cover the whole subtree (the curriculum and all its descendants)
+    curriculum_id: int
+    name: str
+    level: int = 0
+    total: int
+    solved: int
+    correct: int
+    correct_rate: float
+    time: Optional[TimeStatItem] = None
+    children: List["CurriculumStatNode"] = []
+
+class CurriculumStatsResponse(BaseModel):
+    weeks: int
+    roots: List[CurriculumStatNode]
+
+class ActivityDay(BaseModel):
+    date: date
+    attempts: int = 0
+    correct: int = 0
+    total_time_spent: int = 0
+    distinct_problems: int = 0
+
+class ActivityResponse(BaseModel):
+    start: date
+    end: date
+    days: List[ActivityDay]
+    total_attempts: int
+    active_days: int
+    current_streak: int
+    longest_streak: int
+
+class Job(BaseModel):
+    job_id: str
+    job_type: str
+    status: str
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    last_error: Optional[str] = None
+    result: Optional[Any] = None
+    created_at: datetime
+    updated_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
 class FolderReorderItem(BaseModel):
     folder_id: int
     sort_order: int
@@ -165,6 +274,43 @@ class CurriculumReorderItem(BaseModel):
     curriculum_id: int
     sort_order: int
 
+class RecentTarget(BaseModel):
+    target_id: int
+    last_used_at: datetime
+    use_count: int
+
+class RecentTargetsResponse(BaseModel):
+    folders: List[RecentTarget]
+    curriculums: List[RecentTarget]
+
 class ProblemReorderItem(BaseModel):
     problem_id: int
     sort_order: int
+
+class ProblemBatchDelete(BaseModel):
+    problem_ids: List[int]
+
+class ProblemBatchUpdate(BaseModel):
+    problem_ids: List[int]
+    # Only the fields that are sent are changed; null clears them
+    folder_id: Optional[int] = None
+    curriculum_id: Optional[int] = None
+
+class ProblemBatchResult(BaseModel):
+    problem_id: int
+    status: str  # 'deleted', 'updated' or 'not_found'
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportJobStatus(BaseModel):
+    job_id: str
+    status: str
+    total: int
+    processed: int
+    imported: int
+    failed: int
+    errors: List[ImportRowError] = []
+    problem_ids: List[int] = []
+    error: Optional[str] = None
@@ -0,0 +1,33 @@
+import os
+import sys
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+load_dotenv()
+
+url: str = os.environ.get("SUPABASE_URL")
+key: str = os.environ.get("SUPABASE_KEY")
+
+if not url or not key:
+    print("Error: SUPABASE_URL or SUPABASE_KEY not found in environment variables.")
+    sys.exit(1)
+
+supabase: Client = create_client(url, key)
+
+# Must match ACTIVITY_TIMEZONE used by the API
+ACTIVITY_TIMEZONE = os.environ.get("ACTIVITY_TIMEZONE", "Asia/Seoul")
+
+def backfill(user_id: int = None):
+    params = {"p_user_id": user_id, "p_timezone": ACTIVITY_TIMEZONE}
+    response = supabase.rpc("backfill_daily_activity", params).execute()
+    target = f"user {user_id}" if user_id else "all users"
+    print(f"Backfilled {response.data} activity days for {target} ({ACTIVITY_TIMEZONE}).")
+
+def main():
+    # Usage: python scripts/backfill_daily_activity.py [user_id]
+    user_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    backfill(user_id)
+
+if __name__ == "__main__":
+    main()
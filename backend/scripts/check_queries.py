@@ -0,0 +1,208 @@
+import ast
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from utils.queries import CHILD_TABLES, USER_TABLES
+
+# Static check for the query layer (utils/queries.py). Run by
+# tests/test_queries.py, or directly:
+#
+#   python scripts/check_queries.py
+#
+# Fails (exit status 1) when the API code
+#   - calls .table() on a per-user table directly instead of going through
+#     UserScope, so the user_id filter could be missing,
+#   - selects "*" (also inside embedded resources), so unused columns are sent, or
+#   - lists a column in a literal select that the code never reads.
+# A direct call that is meant to span users is allowed when its line carries
+# an "# unscoped: <reason>" comment.
+#
+# Column use is judged statically: a selected column counts as read when
+# its name appears as a string in the function that runs the query (other
+# than in the select itself or in filter and order arguments), or in a
+# function it calls, up to CALL_DEPTH levels. Rows unpacked with ** count
+# as reading every column. Select lists built from a response model with
+# columns() are not checked, since the model defines what is returned.
+# Queries whose rows are only counted or tested for existence, or that
+# are read in a way the check cannot follow (computed keys, rows returned
+# to a caller), need a "# columns: <reason>" comment on the select line
+# or the line above it.
+
+CHECKED_FILES = ["main.py"] + [
+    os.path.join("utils", name) for name in sorted(os.listdir(os.path.join(BACKEND_DIR, "utils")))
+    if name.endswith(".py") and name != "queries.py"
+]
+SCOPED_TABLES = USER_TABLES | set(CHILD_TABLES)
+# Builder methods whose string arguments name columns without reading them
+FILTER_METHODS = {"eq", "neq", "gt", "gte", "lt", "lte", "in_", "is_", "like", "ilike", "contains",
+                  "order", "not_", "or_", "filter", "match"}
+CALL_DEPTH = 2
+
+
+def string_parts(node) -> list:
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return [node.value]
+    if isinstance(node, ast.JoinedStr):
+        return [v.value for v in node.values if isinstance(v, ast.Constant)]
+    return []
+
+
+def split_columns(select: str) -> list:
+    """Top-level column names of a select list; embedded resources are skipped."""
+    names, depth, current = [], 0, ""
+    for ch in select + ",":
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            name = current.strip()
+            if name and "(" not in name and name.isidentifier():
+                names.append(name)
+            current = ""
+        else:
+            current += ch
+    return names
+
+
+def select_argument(node: ast.Call):
+    """The select-list argument of a .select() call: the second for UserScope.select(table, columns)."""
+    literal = [arg for arg in node.args if string_parts(arg)]
+    if len(node.args) >= 2 and literal and literal[0] is node.args[0]:
+        return node.args[1] if string_parts(node.args[1]) else None
+    return node.args[0] if node.args and string_parts(node.args[0]) else None
+
+
+class FunctionInfo:
+    def __init__(self, node):
+        self.node = node
+        self.strings = set()     # string constants read outside select and filter arguments
+        self.calls = set()       # names of the functions it calls
+        self.unpacks = False     # uses ** on something
+        ignored = set()
+        for child in ast.walk(node):
+            if isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute) and \
+                    child.func.attr in FILTER_METHODS | {"select"}:
+                for arg in child.args:
+                    ignored.update(id(n) for n in ast.walk(arg))
+        for child in ast.walk(node):
+            if id(child) not in ignored:
+                self.strings.update(string_parts(child))
+            if isinstance(child, ast.Call):
+                if isinstance(child.func, ast.Name):
+                    self.calls.add(child.func.id)
+                elif isinstance(child.func, ast.Attribute):
+                    self.calls.add(child.func.attr)
+                if any(kw.arg is None for kw in child.keywords):
+                    self.unpacks = True
+            elif isinstance(child, ast.Dict) and None in child.keys:
+                self.unpacks = True
+
+
+def read_sources(paths) -> dict:
+    sources = {}
+    for path in paths:
+        with open(os.path.join(BACKEND_DIR, path), encoding="utf-8") as f:
+            sources[path] = f.read()
+    return sources
+
+
+def function_index(trees: dict) -> dict:
+    """
+    Name -> FunctionInfo for the module-level functions of all checked files.
+    Methods are left out: a call like .get() cannot be resolved by name.
+    """
+    index = {}
+    for tree in trees.values():
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                index.setdefault(node.name, []).append(FunctionInfo(node))
+    return index
+
+
+def reads(info: FunctionInfo, index: dict) -> tuple:
+    """(strings read, unpacks rows) for a function and the functions it calls."""
+    strings, unpacks = set(info.strings), info.unpacks
+    seen, frontier = {id(info.node)}, [info]
+    for _ in range(CALL_DEPTH):
+        next_frontier = []
+        for current in frontier:
+            for name in current.calls:
+                for callee in index.get(name, []):
+                    if id(callee.node) not in seen:
+                        seen.add(id(callee.node))
+                        strings |= callee.strings
+                        next_frontier.append(callee)
+        frontier = next_frontier
+    return strings, unpacks
+
+
+def check_columns(path: str, tree, lines: list, index: dict) -> list:
+    problems = []
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        info = None
+        for call in ast.walk(node):
+            if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute) and call.func.attr == "select"):
+                continue
+            argument = select_argument(call)
+            if argument is None or isinstance(argument, ast.JoinedStr) and any(
+                    isinstance(v, ast.FormattedValue) for v in argument.values):
+                # Built from a response model (columns()) or partly computed
+                continue
+            marked = any("# columns:" in line for line in lines[max(0, call.lineno - 2):call.lineno])
+            if any(kw.arg == "count" for kw in call.keywords) or marked:
+                continue
+            if info is None:
+                info = FunctionInfo(node)
+                strings, unpacks = reads(info, index)
+            if unpacks:
+                continue
+            unused = [c for c in split_columns("".join(string_parts(argument))) if c not in strings]
+            if unused:
+                problems.append((call.lineno, f"selected but never read: {', '.join(unused)}"))
+    return problems
+
+
+def check_files(paths=None) -> list:
+    """Problems found in the given files (default CHECKED_FILES), as "path:line: message"."""
+    sources = read_sources(paths or CHECKED_FILES)
+    trees = {path: ast.parse(source, path) for path, source in sources.items()}
+    index = function_index(trees)
+    problems = []
+    for path, tree in trees.items():
+        lines = sources[path].splitlines()
+        found = []
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Attribute):
+                continue
+            name = node.func.attr
+            if name == "table" and node.args:
+                table = "".join(string_parts(node.args[0]))
+                if table in SCOPED_TABLES and "# unscoped:" not in lines[node.lineno - 1]:
+                    found.append((node.lineno, f"'{table}' is queried without UserScope"))
+            elif name == "select":
+                if any("*" in part for arg in node.args for part in string_parts(arg)):
+                    found.append((node.lineno, "select lists no columns (*)"))
+        found.extend(check_columns(path, tree, lines, index))
+        # A select inside a nested function is seen from both functions
+        problems.extend(f"{path}:{line}: {message}" for line, message in sorted(set(found)))
+    return problems
+
+
+def main():
+    problems = check_files()
+    for problem in problems:
+        print(problem)
+    if problems:
+        print(f"\n{len(problems)} query problem(s) found.")
+        sys.exit(1)
+    print(f"Checked {len(CHECKED_FILES)} files, all queries are scoped and read the columns they select.")
+
+
+if __name__ == "__main__":
+    main()
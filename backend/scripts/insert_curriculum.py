@@ -18,6 +18,8 @@ if not url or not key:
 
 supabase: Client = create_client(url, key)
 
+# Creates nodes one by one (two round trips per node). For whole trees use
+# load_curriculum_tree.py, which applies all changes in one transaction.
 def get_or_create_curriculum(name: str, level: int, parent_id: int = None, sort_order: int = 0):
     # Check if exists
     query = supabase.table('curriculums').select("*").eq('name', name).eq('level', level)
@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import sys
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+load_dotenv()
+
+# Loads a nested curriculum definition (JSON) into the curriculums table.
+#
+#   python scripts/load_curriculum_tree.py db/curriculum_2022_revised.json --dry-run
+#   python scripts/load_curriculum_tree.py db/curriculum_2022_revised.json
+#
+# The definition is a list of nodes: {"name": ..., "sort_order": ..., "children": [...]}.
+# sort_order defaults to the position among the siblings. Existing rows are matched
+# by (parent, name); a node can also give "id" (curriculum_id) or "renamed_from"
+# (list of earlier names) to rename a row instead of creating a new one.
+# Rows that are not in the definition are reported but never deleted, since
+# problems may still reference them.
+#
+# All inserts and updates are applied by one apply_curriculum_tree() call
+# (sql/005_add_apply_curriculum_tree.sql), so they commit or fail together.
+
+PAGE_SIZE = 1000
+
+
+class DefinitionError(Exception):
+    pass
+
+
+def read_definition(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        try:
+            tree = json.load(f)
+        except json.JSONDecodeError as e:
+            raise DefinitionError(f"{path} is not valid JSON: {e}")
+    if not isinstance(tree, list):
+        raise DefinitionError("The definition must be a list of top-level curriculum nodes")
+    return tree
+
+
+def fetch_existing(supabase) -> list:
+    rows = []
+    while True:
+        page = supabase.table('curriculums').select("curriculum_id, name, parent_id, level, sort_order") \
+            .order('curriculum_id').range(len(rows), len(rows) + PAGE_SIZE - 1).execute().data
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+
+
+def diff_tree(tree: list, existing: list) -> dict:
+    """
+    Compares the definition with the existing rows and returns
+    {"inserts", "updates", "unchanged", "untouched", "warnings"}.
+    """
+    by_id = {row['curriculum_id']: row for row in existing}
+    children = {}  # parent_id -> {name: row}
+    warnings = []
+    for row in existing:
+        siblings = children.setdefault(row['parent_id'], {})
+        if row['name'] in siblings:
+            warnings.append(f"Duplicate existing rows for '{row['name']}' under parent {row['parent_id']}: "
+                            f"using {siblings[row['name']]['curriculum_id']}, ignoring {row['curriculum_id']}")
+            continue
+        siblings[row['name']] = row
+
+    result = {"inserts": [], "updates": [], "unchanged": 0, "untouched": [], "warnings": warnings}
+    matched = set()
+
+    def find_row(node: dict, name: str, parent_id) -> dict:
+        if node.get('id') is not None:
+            row = by_id.get(node['id'])
+            if row is None:
+                raise DefinitionError(f"'{name}': curriculum_id {node['id']} does not exist")
+            if row['parent_id'] != parent_id:
+                raise DefinitionError(f"'{name}': moving curriculum_id {node['id']} to another parent is not supported")
+            return row
+        siblings = children.get(parent_id, {})
+        for candidate in [name] + list(node.get('renamed_from') or []):
+            if candidate in siblings:
+                return siblings[candidate]
+        return None
+
+    def walk(nodes: list, parent_id, parent_key: str, parent_is_new: bool, level: int):
+        names = set()
+        for position, node in enumerate(nodes, start=1):
+            name = str(node.get('name') or "").strip()
+            if not name:
+                raise DefinitionError(f"A node under '{parent_key or '(root)'}' has no name")
+            if name in names:
+                raise DefinitionError(f"'{name}' appears twice under '{parent_key or '(root)'}'")
+            names.add(name)
+            key = f"{parent_key} > {name}" if parent_key else name
+            sort_order = int(node.get('sort_order', position))
+
+            row = None if parent_is_new else find_row(node, name, parent_id)
+            if row is None:
+                result["inserts"].append({
+                    "key": key,
+                    "parent_key": parent_key if parent_is_new else None,
+                    "parent_id": None if parent_is_new else parent_id,
+                    "name": name,
+                    "level": level,
+                    "sort_order": sort_order,
+                })
+                walk(node.get('children') or [], None, key, True, level + 1)
+                continue
+
+            if row['curriculum_id'] in matched:
+                raise DefinitionError(f"'{key}' matches curriculum_id {row['curriculum_id']}, which is already used")
+            matched.add(row['curriculum_id'])
+            desired = {"name": name, "level": level, "sort_order": sort_order}
+            changes = {field: (row[field], value) for field, value in desired.items() if row[field] != value}
+            if changes:
+                result["updates"].append({"curriculum_id": row['curriculum_id'], "key": key, **desired, "changes": changes})
+            else:
+                result["unchanged"] += 1
+            walk(node.get('children') or [], row['curriculum_id'], key, False, level + 1)
+
+    walk(tree, None, "", False, 1)
+
+    # Rows next to the managed ones that the definition does not mention
+    managed_parents = matched | {None}
+    result["untouched"] = [
+        row for row in existing
+        if row['curriculum_id'] not in matched and row['parent_id'] in managed_parents
+    ]
+    return result
+
+
+def print_diff(diff: dict):
+    for warning in diff["warnings"]:
+        print(f"! {warning}")
+    for item in diff["inserts"]:
+        print(f"+ {item['key']}  (level {item['level']}, sort_order {item['sort_order']})")
+    for item in diff["updates"]:
+        changes = ", ".join(f"{field}: {old!r} -> {new!r}" for field, (old, new) in item["changes"].items())
+        print(f"~ {item['key']} (ID: {item['curriculum_id']})  {changes}")
+    for row in diff["untouched"]:
+        print(f"? {row['name']} (ID: {row['curriculum_id']}) is not in the definition, left unchanged")
+    print(f"\n{len(diff['inserts'])} to insert, {len(diff['updates'])} to update, "
+          f"{diff['unchanged']} unchanged, {len(diff['untouched'])} not in the definition")
+
+
+def apply_diff(supabase, diff: dict) -> dict:
+    updates = [{k: item[k] for k in ("curriculum_id", "name", "level", "sort_order")} for item in diff["updates"]]
+    inserts = [{k: item[k] for k in ("key", "parent_key", "parent_id", "name", "level", "sort_order")} for item in diff["inserts"]]
+    response = supabase.rpc("apply_curriculum_tree", {"p_updates": updates, "p_inserts": inserts}).execute()
+    return response.data or {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a curriculum tree definition into the curriculums table.")
+    parser.add_argument("definition", help="JSON curriculum tree")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the changes")
+    args = parser.parse_args()
+
+    from supabase import create_client, Client
+
+    url: str = os.environ.get("SUPABASE_URL")
+    key: str = os.environ.get("SUPABASE_KEY")
+
+    if not url or not key:
+        print("Error: SUPABASE_URL or SUPABASE_KEY not found in environment variables.")
+        sys.exit(1)
+
+    supabase: Client = create_client(url, key)
+
+    try:
+        diff = diff_tree(read_definition(args.definition), fetch_existing(supabase))
+    except DefinitionError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print_diff(diff)
+    if args.dry_run:
+        print("Dry run, nothing was changed.")
+        return
+    if not diff["inserts"] and not diff["updates"]:
+        print("Already up to date.")
+        return
+
+    created = apply_diff(supabase, diff)
+    print(f"Applied: created {len(created)}, updated {len(diff['updates'])}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+-- solve_logs 테이블에 클라이언트 멱등성 키(client_key) 컬럼 추가
+-- 오프라인 풀이 기록을 일괄 전송할 때 재시도로 인한 중복 저장을 막습니다.
+-- 이 쿼리를 Supabase Dashboard > SQL Editor에서 실행하세요.
+
+ALTER TABLE solve_logs ADD COLUMN IF NOT EXISTS client_key TEXT;
+
+-- (user_id, client_key) 조합은 한 번만 저장됩니다. client_key가 NULL인 기존 기록은 영향을 받지 않습니다.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_solve_logs_user_client_key ON solve_logs(user_id, client_key);
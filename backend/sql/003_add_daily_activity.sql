@@ -0,0 +1,127 @@
+-- 사용자별 일간 학습 활동 집계 테이블 (캘린더 히트맵 / 연속 학습일 표시용)
+-- solve_logs 전체를 매번 다시 읽지 않도록 풀이 기록 시 증분으로 갱신합니다.
+-- 이 쿼리를 Supabase Dashboard > SQL Editor에서 실행한 뒤
+-- 기존 기록은 backend/scripts/backfill_daily_activity.py 로 채워 주세요.
+
+CREATE TABLE IF NOT EXISTS user_daily_activity (
+    user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
+    activity_date DATE NOT NULL,
+    attempts INTEGER DEFAULT 0 NOT NULL,
+    correct INTEGER DEFAULT 0 NOT NULL,
+    total_time_spent BIGINT DEFAULT 0 NOT NULL, -- in seconds
+    distinct_problems INTEGER DEFAULT 0 NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()),
+    PRIMARY KEY (user_id, activity_date)
+);
+
+-- 하루 동안 푼 문제 목록 (distinct_problems 증분 계산용)
+-- 문제가 삭제되어도 과거 활동 기록은 유지되도록 problems 를 참조하지 않습니다.
+CREATE TABLE IF NOT EXISTS user_daily_problems (
+    user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
+    activity_date DATE NOT NULL,
+    problem_id BIGINT NOT NULL,
+    PRIMARY KEY (user_id, activity_date, problem_id)
+);
+
+-- 이미 집계에 반영된 풀이 기록 (재시도된 반영 작업이 같은 기록을 두 번 더하지 않도록)
+-- 문제와 함께 풀이 기록이 삭제되어도 집계는 유지되므로 solve_logs 를 참조하지 않습니다.
+CREATE TABLE IF NOT EXISTS user_daily_solve_logs (
+    user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
+    solve_log_id BIGINT NOT NULL,
+    PRIMARY KEY (user_id, solve_log_id)
+);
+
+-- 풀이 기록 반영: p_items = [{"solve_log_id": 10, "activity_date": "2026-02-08", "problem_id": 1, "is_correct": true, "time_spent": 45}, ...]
+-- user_daily_solve_logs 에 새로 들어간 기록만 더하므로 같은 항목으로 여러 번 호출해도 결과가 같습니다.
+-- solve_log_id 가 없는 항목(이전 버전에서 큐에 들어간 작업)은 그대로 더합니다.
+CREATE OR REPLACE FUNCTION record_daily_activity(p_user_id BIGINT, p_items JSONB)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    WITH items AS (
+        SELECT
+            (i->>'solve_log_id')::bigint AS solve_log_id,
+            (i->>'activity_date')::date AS activity_date,
+            (i->>'problem_id')::bigint AS problem_id,
+            COALESCE((i->>'is_correct')::boolean, FALSE) AS is_correct,
+            COALESCE((i->>'time_spent')::integer, 0) AS time_spent
+        FROM jsonb_array_elements(p_items) AS i
+    ), new_logs AS (
+        INSERT INTO user_daily_solve_logs (user_id, solve_log_id)
+        SELECT DISTINCT p_user_id, solve_log_id FROM items WHERE solve_log_id IS NOT NULL
+        ON CONFLICT DO NOTHING
+        RETURNING solve_log_id
+    ), new_items AS (
+        SELECT DISTINCT ON (solve_log_id) items.* FROM items JOIN new_logs USING (solve_log_id)
+        UNION ALL
+        SELECT * FROM items WHERE solve_log_id IS NULL
+    ), new_problems AS (
+        INSERT INTO user_daily_problems (user_id, activity_date, problem_id)
+        SELECT DISTINCT p_user_id, activity_date, problem_id FROM new_items
+        ON CONFLICT DO NOTHING
+        RETURNING activity_date
+    ), new_problem_counts AS (
+        SELECT activity_date, COUNT(*) AS n FROM new_problems GROUP BY activity_date
+    ), day_totals AS (
+        SELECT
+            activity_date,
+            COUNT(*) AS attempts,
+            COUNT(*) FILTER (WHERE is_correct) AS correct,
+            SUM(time_spent) AS total_time_spent
+        FROM new_items
+        GROUP BY activity_date
+    )
+    INSERT INTO user_daily_activity (user_id, activity_date, attempts, correct, total_time_spent, distinct_problems)
+    SELECT p_user_id, d.activity_date, d.attempts, d.correct, d.total_time_spent, COALESCE(n.n, 0)
+    FROM day_totals d
+    LEFT JOIN new_problem_counts n USING (activity_date)
+    ON CONFLICT (user_id, activity_date) DO UPDATE SET
+        attempts = user_daily_activity.attempts + EXCLUDED.attempts,
+        correct = user_daily_activity.correct + EXCLUDED.correct,
+        total_time_spent = user_daily_activity.total_time_spent + EXCLUDED.total_time_spent,
+        distinct_problems = user_daily_activity.distinct_problems + EXCLUDED.distinct_problems,
+        updated_at = timezone('utc'::text, now());
+$$;
+
+-- 기존 solve_logs 로부터 집계를 다시 계산 (p_user_id 가 NULL 이면 전체 사용자)
+-- 집계 테이블을 잠그므로 그동안의 풀이 기록 반영은 백필이 끝날 때까지 대기합니다.
+CREATE OR REPLACE FUNCTION backfill_daily_activity(p_user_id BIGINT DEFAULT NULL, p_timezone TEXT DEFAULT 'Asia/Seoul')
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    day_count INTEGER;
+BEGIN
+    LOCK TABLE user_daily_activity, user_daily_problems, user_daily_solve_logs IN EXCLUSIVE MODE;
+
+    DELETE FROM user_daily_activity WHERE p_user_id IS NULL OR user_id = p_user_id;
+    DELETE FROM user_daily_problems WHERE p_user_id IS NULL OR user_id = p_user_id;
+    DELETE FROM user_daily_solve_logs WHERE p_user_id IS NULL OR user_id = p_user_id;
+
+    -- 백필 전에 큐에 들어가 백필 후에 실행되는 반영 작업이 같은 기록을 다시 더하지 않도록
+    INSERT INTO user_daily_solve_logs (user_id, solve_log_id)
+    SELECT user_id, solve_log_id
+    FROM solve_logs
+    WHERE (p_user_id IS NULL OR user_id = p_user_id) AND user_id IS NOT NULL;
+
+    INSERT INTO user_daily_problems (user_id, activity_date, problem_id)
+    SELECT DISTINCT user_id, (created_at AT TIME ZONE p_timezone)::date, problem_id
+    FROM solve_logs
+    WHERE (p_user_id IS NULL OR user_id = p_user_id) AND user_id IS NOT NULL AND problem_id IS NOT NULL;
+
+    INSERT INTO user_daily_activity (user_id, activity_date, attempts, correct, total_time_spent, distinct_problems)
+    SELECT
+        user_id,
+        (created_at AT TIME ZONE p_timezone)::date,
+        COUNT(*),
+        COUNT(*) FILTER (WHERE is_correct),
+        COALESCE(SUM(time_spent), 0),
+        COUNT(DISTINCT problem_id)
+    FROM solve_logs
+    WHERE (p_user_id IS NULL OR user_id = p_user_id) AND user_id IS NOT NULL
+    GROUP BY 1, 2;
+
+    GET DIAGNOSTICS day_count = ROW_COUNT;
+    RETURN day_count;
+END;
+$$;
@@ -0,0 +1,7 @@
+-- problems 테이블에 문제 이미지의 지각 해시(pHash) 컬럼 추가
+-- 같은 문제 사진을 다시 등록했을 때 중복/유사 문제를 찾는 데 사용합니다.
+-- 64비트 해시를 16자리 16진수 문자열로 저장합니다.
+-- 이 쿼리를 Supabase Dashboard > SQL Editor에서 실행하세요.
+-- 기존 문제의 해시는 API 서버가 백그라운드 작업(image_hash)으로 채웁니다.
+
+ALTER TABLE problems ADD COLUMN IF NOT EXISTS image_hash TEXT;
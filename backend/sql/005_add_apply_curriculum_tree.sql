@@ -0,0 +1,55 @@
+-- 교육과정 트리 일괄 반영 함수 (backend/scripts/load_curriculum_tree.py 에서 호출)
+-- 노드마다 조회/삽입을 반복하는 대신, 변경분 전체를 한 번의 호출(한 트랜잭션)로 반영합니다.
+-- 중간에 실패하면 아무것도 반영되지 않습니다.
+-- 이 쿼리를 Supabase Dashboard > SQL Editor에서 실행하세요.
+
+-- p_updates = [{"curriculum_id": 3, "name": "삼각함수", "level": 2, "sort_order": 2}, ...]
+-- p_inserts = [{"key": "대수 (고등) > 삼각함수", "parent_key": "대수 (고등)", "parent_id": null,
+--               "name": "삼각함수", "level": 2, "sort_order": 2}, ...]
+--   parent_id: 이미 존재하는 부모 노드의 ID, parent_key: 같은 호출에서 새로 만드는 부모 노드의 key
+-- 반환값: 새로 만든 노드의 {"key": curriculum_id, ...}
+CREATE OR REPLACE FUNCTION apply_curriculum_tree(p_updates JSONB, p_inserts JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_level INTEGER;
+    v_result JSONB;
+BEGIN
+    -- 이름 변경 / 순서 변경 / 레벨 보정
+    UPDATE curriculums c SET
+        name = u.name,
+        level = u.level,
+        sort_order = u.sort_order,
+        updated_at = timezone('utc'::text, now())
+    FROM jsonb_to_recordset(p_updates) AS u(curriculum_id BIGINT, name TEXT, level INTEGER, sort_order INTEGER)
+    WHERE c.curriculum_id = u.curriculum_id;
+
+    CREATE TEMP TABLE IF NOT EXISTS curriculum_tree_keys (key TEXT PRIMARY KEY, curriculum_id BIGINT) ON COMMIT DROP;
+
+    -- 부모가 먼저 만들어지도록 레벨 순서대로 한 번에 한 레벨씩 삽입
+    FOR v_level IN
+        SELECT DISTINCT (i->>'level')::integer FROM jsonb_array_elements(p_inserts) AS i ORDER BY 1
+    LOOP
+        WITH src AS (
+            SELECT i.key, i.name, i.level, i.sort_order, COALESCE(i.parent_id, k.curriculum_id) AS parent_id
+            FROM jsonb_to_recordset(p_inserts) AS i(key TEXT, parent_key TEXT, parent_id BIGINT, name TEXT, level INTEGER, sort_order INTEGER)
+            LEFT JOIN curriculum_tree_keys k ON k.key = i.parent_key
+            WHERE i.level = v_level
+        ), inserted AS (
+            INSERT INTO curriculums (name, parent_id, level, sort_order)
+            SELECT name, parent_id, level, sort_order FROM src
+            RETURNING curriculum_id, name, parent_id
+        )
+        -- 형제 노드의 이름은 서로 다르므로 (부모, 이름)으로 key 를 다시 찾습니다
+        INSERT INTO curriculum_tree_keys (key, curriculum_id)
+        SELECT src.key, inserted.curriculum_id
+        FROM inserted
+        JOIN src ON src.name = inserted.name AND src.parent_id IS NOT DISTINCT FROM inserted.parent_id;
+    END LOOP;
+
+    SELECT COALESCE(jsonb_object_agg(key, curriculum_id), '{}'::jsonb) INTO v_result FROM curriculum_tree_keys;
+    DROP TABLE curriculum_tree_keys;
+    RETURN v_result;
+END;
+$$;
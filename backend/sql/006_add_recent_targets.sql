@@ -0,0 +1,31 @@
+-- 최근 사용한 문제집 / 단원 (문제 추가 화면의 "최근 사용" 칩 표시용)
+-- 조회할 때마다 기록하지 않고, 서버가 메모리에 모아 두었다가 주기적으로 한 번에 반영합니다.
+-- 이 쿼리를 Supabase Dashboard > SQL Editor에서 실행하세요.
+
+CREATE TABLE IF NOT EXISTS recent_targets (
+    user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
+    target_type TEXT NOT NULL, -- 'folder' or 'curriculum'
+    target_id BIGINT NOT NULL,
+    last_used_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    use_count INTEGER DEFAULT 0 NOT NULL,
+    PRIMARY KEY (user_id, target_type, target_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_recent_targets_user_time ON recent_targets(user_id, target_type, last_used_at DESC);
+
+-- 모아 둔 사용 기록 반영: p_items = [{"user_id": 1, "target_type": "folder", "target_id": 3,
+--                                   "last_used_at": "2026-02-08T10:00:00+00:00", "uses": 4}, ...]
+CREATE OR REPLACE FUNCTION record_recent_targets(p_items JSONB)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO recent_targets (user_id, target_type, target_id, last_used_at, use_count)
+    SELECT i.user_id, i.target_type, i.target_id, i.last_used_at, i.uses
+    FROM jsonb_to_recordset(p_items) AS i(user_id BIGINT, target_type TEXT, target_id BIGINT, last_used_at TIMESTAMPTZ, uses INTEGER)
+    -- 그사이 삭제되었거나 다른 사용자의 문제집은 기록하지 않습니다
+    WHERE (i.target_type = 'folder' AND EXISTS (SELECT 1 FROM folders f WHERE f.folder_id = i.target_id AND f.user_id = i.user_id))
+       OR (i.target_type = 'curriculum' AND EXISTS (SELECT 1 FROM curriculums c WHERE c.curriculum_id = i.target_id))
+    ON CONFLICT (user_id, target_type, target_id) DO UPDATE SET
+        last_used_at = GREATEST(recent_targets.last_used_at, EXCLUDED.last_used_at),
+        use_count = recent_targets.use_count + EXCLUDED.use_count;
+$$;
@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.join(BACKEND_DIR, "benchmarks")]
+
+
+@pytest.fixture(scope="session")
+def stub():
+    """In-memory Supabase (benchmarks/supabase_stub.py) for the whole session."""
+    from supabase_stub import start_stub
+    server, stub = start_stub(curriculum_path=None)
+    stub.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield stub
+    server.shutdown()
+
+
+@pytest.fixture(scope="session")
+def client(stub):
+    """TestClient for main.app, configured against the stub and a temporary directory."""
+    work_dir = tempfile.mkdtemp(prefix="odapclean-tests-")
+    os.environ.update({
+        "SUPABASE_URL": stub.url,
+        "SUPABASE_KEY": "test.test.test",
+        "BCRYPT_ROUNDS": "4",
+        "JOB_DB_PATH": os.path.join(work_dir, "jobs.db"),
+        "VERSION_TABLE_PATH": os.path.join(work_dir, "versions.bin"),
+        "IMAGE_CACHE_DIR": os.path.join(work_dir, "image_cache"),
+        "IMPORT_DIR": os.path.join(work_dir, "imports"),
+        "PROFILE_DIR": os.path.join(work_dir, "profiles"),
+        "STORAGE_CHECK_CACHE": os.path.join(work_dir, "storage_check.json"),
+    })
+    import main
+    from fastapi.testclient import TestClient
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def user(client):
+    """A freshly registered user: {"user_id", "headers"} with its Authorization header."""
+    username = f"user-{uuid.uuid4().hex[:8]}"
+    response = client.post("/api/v1/register", json={"username": username, "password": "password123",
+                                                     "email": f"{username}@example.com"})
+    response.raise_for_status()
+    user_id = response.json()["user_id"]
+    response = client.post("/api/v1/token", data={"username": username, "password": "password123"})
+    response.raise_for_status()
+    return {"user_id": user_id, "headers": {"Authorization": f"Bearer {response.json()['access_token']}"}}
+
+
+@pytest.fixture
+def make_problem(stub):
+    """Inserts a problem row straight into the stub and returns it."""
+    def make(user_id: int, **values):
+        with stub.lock:
+            return stub.db.insert("problems", [{"user_id": user_id, "title": "Problem", **values}])[0]
+    return make
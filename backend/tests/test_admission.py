@@ -0,0 +1,45 @@
+import threading
+
+import anyio
+
+
+def test_over_limit_request_is_rejected_while_threadpool_is_busy(client, user):
+    import main
+    main.admission.configure("statistics", rate=0, burst=0, concurrency=4, cpu=True)
+    limiter = client.portal.call(anyio.to_thread.current_default_thread_limiter)
+    borrowers = [object() for _ in range(int(limiter.total_tokens))]
+    for borrower in borrowers:
+        client.portal.call(limiter.acquire_on_behalf_of_nowait, borrower)
+    responses = []
+    try:
+        request = threading.Thread(target=lambda: responses.append(
+            client.get("/api/v1/statistics", headers=user["headers"])), daemon=True)
+        request.start()
+        # Would hang until a thread is free if the check ran in the threadpool
+        request.join(timeout=5)
+        answered_while_busy = bool(responses)
+    finally:
+        for borrower in borrowers:
+            client.portal.call(limiter.release_on_behalf_of, borrower)
+        main.admission.configure("statistics", **main.ADMISSION_LIMITS["statistics"])
+    request.join(timeout=5)
+
+    assert answered_while_busy, "request waited for the threadpool"
+    assert responses[0].status_code == 429
+    assert "Retry-After" in responses[0].headers
+
+
+def test_forged_forwarded_for_does_not_reset_the_client_bucket(client):
+    import main
+    main.admission.configure("auto_crop", rate=0, burst=1, concurrency=2, cpu=True)
+    try:
+        # The proxy appends the real address after whatever the client sent
+        statuses = [
+            client.post("/api/v1/utils/auto-crop", headers={"X-Forwarded-For": f"10.0.0.{i}, 203.0.113.7"}).status_code
+            for i in range(3)
+        ]
+    finally:
+        main.admission.configure("auto_crop", **main.ADMISSION_LIMITS["auto_crop"])
+
+    # The first request is admitted (and rejected for its missing file), the rest are over the limit
+    assert statuses == [422, 429, 429]
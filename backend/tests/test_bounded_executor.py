@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.bounded_executor import BoundedExecutor, ExecutorBusy
+
+
+def test_cancelled_awaiter_keeps_slot_until_worker_finishes():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=0)
+    started = threading.Event()
+    finish = threading.Event()
+
+    def blocking():
+        started.set()
+        finish.wait(5)
+        return "done"
+
+    async def scenario():
+        waiter = asyncio.create_task(executor.run(blocking))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        # The worker is still running, so the only slot is still taken
+        assert executor.stats()["running"] == 1
+        with pytest.raises(ExecutorBusy):
+            await executor.run(lambda: None)
+
+        finish.set()
+        for _ in range(100):
+            if executor.stats()["running"] == 0 and executor._pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert await executor.run(lambda: "next") == "next"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        finish.set()
+        executor.shutdown()
+
+    stats = executor.stats()
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+    assert stats["queued"] == 0
@@ -0,0 +1,36 @@
+import os
+import zipfile
+
+
+def test_problem_list_includes_rows_committed_by_a_running_import(client, user):
+    import main
+    from utils.bulk_import import ProblemImportJob
+
+    job_id = "test" + os.urandom(6).hex()
+    job_dir = os.path.join(main.IMPORT_DIR, job_id)
+    os.makedirs(job_dir)
+    with zipfile.ZipFile(os.path.join(job_dir, "archive.zip"), "w") as zf:
+        for i in range(3):
+            zf.writestr(f"p{i}.png", b"image")
+    rows = [{"title": f"Imported {i}", "folder": None, "curriculum": None, "problem_image": f"p{i}.png",
+             "answer_image": None, "hints": ["hint"]} for i in range(3)]
+    ProblemImportJob.create(job_dir, user["user_id"], rows, auto_crop=False)
+
+    # Cached before the import starts
+    assert client.get("/api/v1/problems", headers=user["headers"]).json() == []
+
+    job = main._import_job(job_id)
+    job.batch_size = 1
+    listed = []
+    notify = job.on_batch
+
+    def on_batch(user_id):
+        notify(user_id)
+        listed.append(len(client.get("/api/v1/problems", headers=user["headers"]).json()))
+
+    job.on_batch = on_batch
+    state = job.run()
+
+    assert state["status"] == "completed"
+    # After each batch's problem insert and its hint insert
+    assert listed == [1, 1, 2, 2, 3, 3]
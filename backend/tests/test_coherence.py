@@ -0,0 +1,91 @@
+from utils.coherence import PerUserVersionedCache
+from utils.phash_index import PerceptualHashIndex
+from utils.search_index import ProblemSearchIndex
+
+
+class Entry:
+    def __init__(self, items):
+        self.items = items
+        self.version = None
+
+
+def make_cache(data, versions, max_users=512):
+    builds = []
+
+    def build(user_id):
+        builds.append(user_id)
+        return Entry(list(data.get(user_id, [])))
+
+    return PerUserVersionedCache(build, max_users, version=lambda user_id: versions.get(user_id, 0)), builds
+
+
+def test_entry_is_rebuilt_when_the_version_moves():
+    data, versions = {1: ["a"]}, {1: 0}
+    cache, builds = make_cache(data, versions)
+    assert cache.get(1).items == ["a"]
+    assert cache.get(1).items == ["a"]
+    data[1].append("b")
+    versions[1] = 1  # written by another worker
+    assert cache.get(1).items == ["a", "b"]
+    assert builds == [1, 1]
+
+
+def test_local_write_applies_in_place_only_after_the_previous_version():
+    data, versions = {1: ["a"]}, {1: 0}
+    cache, builds = make_cache(data, versions)
+    cache.get(1)
+
+    versions[1] = 1
+    with cache.lock:
+        cache.writable(1, 1).items.append("b")
+    assert cache.get(1).items == ["a", "b"]
+
+    # Version 2 was written elsewhere; this worker's write is version 3
+    data[1] = ["a", "b", "c", "d"]
+    versions[1] = 3
+    with cache.lock:
+        assert cache.writable(1, 3) is None
+    assert cache.get(1).items == ["a", "b", "c", "d"]
+    assert builds == [1, 1]
+
+
+def test_write_during_build_is_served_once_but_not_cached():
+    versions = {1: 0}
+    cache = None
+
+    def build(user_id):
+        # A write lands after the loader has read the rows
+        versions[1] = 1
+        with cache.lock:
+            cache.writable(1, 1)
+        return Entry(["stale"])
+
+    cache = PerUserVersionedCache(build, version=lambda user_id: versions[user_id])
+    assert cache.get(1).items == ["stale"]
+    assert 1 not in cache._entries
+
+
+def test_least_recently_used_user_is_dropped():
+    cache, builds = make_cache({}, {}, max_users=2)
+    cache.get(1)
+    cache.get(2)
+    cache.get(1)
+    cache.get(3)
+    cache.get(1)
+    cache.get(2)
+    assert builds == [1, 2, 3, 2]
+
+
+def test_indexes_share_the_coherence_rules():
+    versions = {7: 0}
+    search = ProblemSearchIndex(lambda user_id: [({"problem_id": 1, "title": "삼각함수"}, [])],
+                                version=lambda user_id: versions[user_id])
+    hashes = PerceptualHashIndex(lambda user_id: [(1, 0b1010)], version=lambda user_id: versions[user_id])
+    assert [r["problem"]["problem_id"] for r in search.search(7, "삼각")] == [1]
+    assert hashes.hash_of(7, 1) == 0b1010
+
+    versions[7] = 1
+    search.upsert(7, {"problem_id": 2, "title": "삼각형"}, [], version=1)
+    hashes.add(7, 2, 0b1011, version=1)
+    assert {r["problem"]["problem_id"] for r in search.search(7, "삼각")} == {1, 2}
+    assert [m["problem_id"] for m in hashes.query(7, 0b1010, 1)] == [1, 2]
@@ -0,0 +1,19 @@
+def test_retried_daily_activity_job_counts_solves_once(client, user, make_problem, monkeypatch):
+    import main
+
+    queued = []
+    monkeypatch.setattr(main.job_queue, "enqueue", lambda job_type, payload, **kwargs: queued.append(payload))
+    problem = make_problem(user["user_id"])
+    for is_correct in (False, True):
+        response = client.post(f"/api/v1/problems/{problem['problem_id']}/solve", headers=user["headers"],
+                               json={"is_correct": is_correct, "time_spent": 30})
+        assert response.status_code == 200, response.text
+    assert len(queued) == 2
+
+    # Every job runs twice, as after a timeout once the RPC had committed
+    for payload in queued + queued:
+        main.apply_daily_activity(payload)
+
+    activity = client.get("/api/v1/activity", headers=user["headers"]).json()
+    days = [day for day in activity["days"] if day["attempts"]]
+    assert [(d["attempts"], d["correct"], d["total_time_spent"], d["distinct_problems"]) for d in days] == [(2, 1, 60, 1)]
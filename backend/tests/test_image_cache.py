@@ -0,0 +1,31 @@
+import os
+import time
+
+from utils.image_cache import ImageDiskCache
+
+
+def test_load_skips_files_removed_by_another_worker(tmp_path, monkeypatch):
+    for name in ("a" * 64, "b" * 64, "c.tmp"):
+        (tmp_path / name).write_bytes(b"x" * 10)
+    old = time.time() - 7200
+    os.utime(tmp_path / "c.tmp", (old, old))
+
+    # Another worker evicts "a..." and cleans up the stale tmp between listdir and stat/remove
+    real_stat, real_remove = os.stat, os.remove
+
+    def racing_stat(path, *args, **kwargs):
+        if str(path).endswith("a" * 64):
+            raise FileNotFoundError(path)
+        return real_stat(path, *args, **kwargs)
+
+    def racing_remove(path, *args, **kwargs):
+        real_remove(path, *args, **kwargs)
+        if str(path).endswith("c.tmp"):
+            raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, "stat", racing_stat)
+    monkeypatch.setattr(os, "remove", racing_remove)
+    cache = ImageDiskCache(str(tmp_path), max_bytes=1024)
+
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == 10
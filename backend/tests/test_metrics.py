@@ -0,0 +1,12 @@
+def test_metrics_require_the_admin_token(client, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    assert client.get("/api/v1/metrics").status_code == 404
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "admin-secret")
+    assert client.get("/api/v1/metrics").status_code == 403
+    assert client.get("/api/v1/metrics", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    response = client.get("/api/v1/metrics", headers={"X-Admin-Token": "admin-secret"})
+    assert response.status_code == 200
+    assert "auth_hashing" in response.json()
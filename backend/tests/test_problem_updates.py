@@ -0,0 +1,55 @@
+def test_batch_update_rejects_unknown_curriculum(client, user, make_problem):
+    problem = make_problem(user["user_id"])
+
+    response = client.post("/api/v1/problems/batch/update", headers=user["headers"],
+                           json={"problem_ids": [problem["problem_id"]], "curriculum_id": 987654})
+
+    assert response.status_code == 400, response.text
+    assert response.json()["detail"] == "Curriculum not found"
+
+
+def test_batch_update_accepts_curriculum_added_outside_the_api(client, stub, user, make_problem):
+    problem = make_problem(user["user_id"])
+    with stub.lock:
+        curriculum = stub.db.insert("curriculums", [{"name": "Added by script", "parent_id": None,
+                                                     "level": 0, "sort_order": 0}])[0]
+
+    response = client.post("/api/v1/problems/batch/update", headers=user["headers"],
+                           json={"problem_ids": [problem["problem_id"]], "curriculum_id": curriculum["curriculum_id"]})
+
+    assert response.status_code == 200, response.text
+    assert response.json() == [{"problem_id": problem["problem_id"], "status": "updated"}]
+
+
+def test_single_update_rejects_unknown_curriculum(client, user, make_problem):
+    problem = make_problem(user["user_id"])
+
+    response = client.put(f"/api/v1/problems/{problem['problem_id']}", headers=user["headers"],
+                          json={"curriculum_id": 987654})
+
+    assert response.status_code == 400, response.text
+
+
+def test_events_are_published_after_the_problem_list_version_changes(client, user, make_problem, monkeypatch):
+    import main
+
+    key = f"problems:{user['user_id']}"
+    seen = []
+    publish = main.event_broker.publish
+
+    def recording_publish(user_id, event):
+        seen.append((event["type"], main.versions.version(key)))
+        publish(user_id, event)
+
+    monkeypatch.setattr(main.event_broker, "publish", recording_publish)
+    problem = make_problem(user["user_id"])
+
+    response = client.put(f"/api/v1/problems/{problem['problem_id']}", headers=user["headers"], json={"title": "Renamed"})
+    assert response.status_code == 200, response.text
+    after_single = main.versions.version(key)
+    response = client.post("/api/v1/problems/batch/update", headers=user["headers"],
+                           json={"problem_ids": [problem["problem_id"]], "folder_id": None})
+    assert response.status_code == 200, response.text
+    after_batch = main.versions.version(key)
+
+    assert seen == [("problem_updated", after_single), ("resync", after_batch)]
@@ -0,0 +1,72 @@
+import textwrap
+
+from scripts import check_queries
+
+
+def check_source(tmp_path, source: str) -> list:
+    path = tmp_path / "endpoint.py"
+    path.write_text(textwrap.dedent(source))
+    return [problem.split(": ", 1)[1] for problem in check_queries.check_files([str(path)])]
+
+
+def test_api_code_passes_the_query_checks():
+    assert check_queries.check_files() == []
+
+
+def test_unscoped_query_on_per_user_table_is_reported(tmp_path):
+    problems = check_source(tmp_path, """
+        def list_folders():
+            return [f['folder_id'] for f in supabase.table('folders').select("folder_id").execute().data]
+    """)
+    assert problems == ["'folders' is queried without UserScope"]
+
+
+def test_cross_user_query_can_be_marked(tmp_path):
+    assert check_source(tmp_path, """
+        def all_folders():
+            rows = supabase.table('folders').select("folder_id").execute().data  # unscoped: admin report
+            return [f['folder_id'] for f in rows]
+    """) == []
+
+
+def test_select_star_is_reported(tmp_path):
+    problems = check_source(tmp_path, """
+        def get_problem(user_id):
+            return scoped(user_id).select('problems', "*").execute().data
+    """)
+    assert "select lists no columns (*)" in problems
+
+
+def test_column_that_is_only_filtered_or_ordered_on_is_reported(tmp_path):
+    problems = check_source(tmp_path, """
+        def latest(user_id):
+            rows = scoped(user_id).select('solve_logs', "problem_id, is_correct, created_at")\\
+                .eq('is_correct', True).order('created_at', desc=True).execute().data
+            return [row['problem_id'] for row in rows]
+    """)
+    assert problems == ["selected but never read: is_correct, created_at"]
+
+
+def test_columns_read_by_a_called_function_or_unpacked_count_as_used(tmp_path):
+    assert check_source(tmp_path, """
+        def summarize(rows):
+            return {row['problem_id']: row['is_correct'] for row in rows}
+
+        def stats(user_id):
+            return summarize(scoped(user_id).select('solve_logs', "problem_id, is_correct").execute().data)
+
+        def titles(user_id):
+            rows = scoped(user_id).select('problems', "problem_id, title").execute().data
+            return [models.Problem(**row) for row in rows]
+    """) == []
+
+
+def test_columns_marker_and_counts_are_not_checked(tmp_path):
+    assert check_source(tmp_path, """
+        def exists(user_id):
+            # columns: existence check
+            return bool(scoped(user_id).select('problems', "problem_id").limit(1).execute().data)
+
+        def count(user_id):
+            return scoped(user_id).select('problems', "problem_id", count="exact").execute().count
+    """) == []
@@ -0,0 +1,48 @@
+import threading
+import time
+
+from utils.recent_usage import PartialFlushError, RecentUsageBuffer
+
+
+def test_failing_flushes_do_not_pile_up_threads():
+    release = threading.Event()
+    calls = []
+
+    def failing_flush(items):
+        calls.append(len(items))
+        release.wait(5)
+        raise RuntimeError("database down")
+
+    buffer = RecentUsageBuffer(failing_flush, load=lambda user_id: [], max_pending=2)
+    threads_before = threading.active_count()
+    for target_id in range(50):
+        buffer.record(1, "folder", target_id)
+
+    assert threading.active_count() <= threads_before + 1
+    deadline = time.monotonic() + 2
+    while not calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(calls) == 1
+    release.set()
+
+
+def test_partial_flush_requeues_only_unsent_items():
+    sent = []
+
+    def flush_first_batch(items):
+        sent.extend(items[:2])
+        raise PartialFlushError(items[2:], "second batch failed")
+
+    buffer = RecentUsageBuffer(flush_first_batch, load=lambda user_id: [])
+    for target_id in range(3):
+        buffer.record(1, "folder", target_id, at=100.0 + target_id)
+
+    assert buffer.flush() == 2
+    stats = buffer.stats()
+    assert stats["pending"] == 1
+    assert stats["flushed"] == 2
+
+    retried = []
+    buffer.flush_items = retried.extend
+    buffer.flush()
+    assert [(item["target_id"], item["uses"]) for item in retried] == [(2, 1)]
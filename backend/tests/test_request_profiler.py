@@ -0,0 +1,23 @@
+import json
+import time
+
+
+def test_profile_metadata_does_not_store_query_values(client, user, monkeypatch):
+    import main
+    monkeypatch.setattr(main.request_profiler, "token", "profile-secret")
+    token = user["headers"]["Authorization"].split()[1]
+
+    response = client.get("/api/v1/problems", params={"token": token, "sort_by": "title_asc"},
+                          headers={**user["headers"], "X-Debug-Profile": "profile-secret"})
+    profile_id = response.headers["X-Profile-Id"]
+    path = None
+    for _ in range(50):
+        path = main.request_profiler.store.path_for(profile_id)
+        if path:
+            break
+        time.sleep(0.05)
+
+    with open(path) as f:
+        saved = f.read()
+    assert token not in saved
+    assert json.loads(saved)["metadata"]["query"] == "token=REDACTED&sort_by=REDACTED"
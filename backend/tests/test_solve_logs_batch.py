@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta, timezone
+
+
+def test_batch_mixes_items_with_and_without_client_timestamp(client, user, make_problem):
+    problem = make_problem(user["user_id"])
+    solved_at = datetime.now(timezone.utc) - timedelta(hours=2)
+    items = [
+        {"client_key": "offline-1", "problem_id": problem["problem_id"], "is_correct": True,
+         "client_created_at": solved_at.isoformat()},
+        {"client_key": "online-1", "problem_id": problem["problem_id"], "is_correct": False},
+    ]
+
+    response = client.post("/api/v1/solve-logs/batch", json=items, headers=user["headers"])
+
+    assert response.status_code == 200, response.text
+    assert [r["status"] for r in response.json()] == ["created", "created"]
+
+
+def test_batch_is_idempotent_per_client_key(client, user, make_problem):
+    problem = make_problem(user["user_id"])
+    items = [{"client_key": "k1", "problem_id": problem["problem_id"]}]
+
+    first = client.post("/api/v1/solve-logs/batch", json=items, headers=user["headers"])
+    second = client.post("/api/v1/solve-logs/batch", json=items, headers=user["headers"])
+
+    assert first.json()[0]["status"] == "created"
+    assert second.json()[0]["status"] == "duplicate"
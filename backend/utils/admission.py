@@ -0,0 +1,127 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is over its limits; carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class RouteLimit:
+    def __init__(self, rate: float, burst: int, concurrency: int, cpu: bool = False):
+        self.rate = rate                # sustained requests per second per client
+        self.burst = burst              # token bucket size per client
+        self.concurrency = concurrency  # requests in flight in this worker
+        self.cpu = cpu                  # also takes a slot of the global CPU budget
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected_rate = 0
+        self.rejected_concurrency = 0
+        self.rejected_cpu = 0
+        self.buckets = OrderedDict()    # client key -> [tokens, last refill time]
+
+
+class AdmissionController:
+    """
+    Admission control for expensive endpoints.
+
+    Each route has a per-client token bucket (429 when empty), a cap on
+    requests in flight (503), and CPU-bound routes share a global budget
+    of slots (503). All checks are made up front under one lock, so an
+    over-limit request is rejected immediately instead of queueing in
+    the threadpool. Limits apply per worker process.
+    """
+
+    def __init__(self, cpu_slots: int, max_clients: int = 10000):
+        self.cpu_slots = cpu_slots
+        self.max_clients = max_clients
+        self.cpu_in_use = 0
+        self.routes: Dict[str, RouteLimit] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, route: str, rate: float, burst: int, concurrency: int, cpu: bool = False):
+        with self._lock:
+            self.routes[route] = RouteLimit(rate, burst, concurrency, cpu)
+
+    def _refill(self, limit: RouteLimit, client: str, now: float) -> list:
+        bucket = limit.buckets.get(client)
+        if bucket is None:
+            bucket = [float(limit.burst), now]
+            limit.buckets[client] = bucket
+            while len(limit.buckets) > self.max_clients:
+                limit.buckets.popitem(last=False)
+        else:
+            bucket[0] = min(limit.burst, bucket[0] + (now - bucket[1]) * limit.rate)
+            bucket[1] = now
+            limit.buckets.move_to_end(client)
+        return bucket
+
+    def acquire(self, route: str, client: str):
+        limit = self.routes.get(route)
+        if limit is None:
+            return
+        with self._lock:
+            bucket = self._refill(limit, client, time.monotonic())
+            if bucket[0] < 1:
+                limit.rejected_rate += 1
+                wait = (1 - bucket[0]) / limit.rate if limit.rate > 0 else 60
+                raise AdmissionRejected(429, "Too many requests, please slow down", max(1, math.ceil(wait)))
+            if limit.in_flight >= limit.concurrency:
+                limit.rejected_concurrency += 1
+                raise AdmissionRejected(503, "Server is busy, please retry shortly", 1)
+            if limit.cpu and self.cpu_in_use >= self.cpu_slots:
+                limit.rejected_cpu += 1
+                raise AdmissionRejected(503, "Server is busy, please retry shortly", 1)
+            bucket[0] -= 1
+            limit.in_flight += 1
+            limit.admitted += 1
+            if limit.cpu:
+                self.cpu_in_use += 1
+
+    def release(self, route: str):
+        limit = self.routes.get(route)
+        if limit is None:
+            return
+        with self._lock:
+            limit.in_flight -= 1
+            if limit.cpu:
+                self.cpu_in_use -= 1
+
+    @contextmanager
+    def admit(self, route: str, client: str):
+        self.acquire(route, client)
+        try:
+            yield
+        finally:
+            self.release(route)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "cpu_slots": self.cpu_slots,
+                "cpu_in_use": self.cpu_in_use,
+                "routes": {
+                    name: {
+                        "rate": limit.rate,
+                        "burst": limit.burst,
+                        "concurrency": limit.concurrency,
+                        "cpu": limit.cpu,
+                        "in_flight": limit.in_flight,
+                        "admitted": limit.admitted,
+                        "rejected_rate": limit.rejected_rate,
+                        "rejected_concurrency": limit.rejected_concurrency,
+                        "rejected_cpu": limit.rejected_cpu,
+                        "tracked_clients": len(limit.buckets),
+                    }
+                    for name, limit in self.routes.items()
+                },
+            }
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorBusy(Exception):
+    """Raised when a BoundedExecutor already has max_queue tasks waiting."""
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a hard limit on the number of waiting tasks.
+
+    Used to keep CPU-heavy work (e.g. bcrypt) off FastAPI's shared
+    threadpool. Submissions beyond max_queue fail fast with ExecutorBusy
+    instead of piling up, and queueing/run times are tracked for metrics.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0  # queued + running
+        self._running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorBusy(f"{self.name} executor is saturated")
+            self._pending += 1
+            self.submitted += 1
+
+        enqueued_at = time.perf_counter()
+
+        def task():
+            started_at = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                wait = started_at - enqueued_at
+                self.total_wait_seconds += wait
+                self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.total_run_seconds += time.perf_counter() - started_at
+
+        def release(future):
+            # The slot belongs to the worker, not the awaiter: a cancelled
+            # request must not free it while fn is still running.
+            with self._lock:
+                self._pending -= 1
+                if future.cancelled() or future.exception() is not None:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+
+        try:
+            future = self._pool.submit(task)
+        except RuntimeError:
+            # Pool already shut down
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_wait_ms": (self.total_wait_seconds / finished * 1000) if finished else 0.0,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+                "avg_run_ms": (self.total_run_seconds / finished * 1000) if finished else 0.0,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
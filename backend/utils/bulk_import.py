@@ -0,0 +1,369 @@
+import csv
+import io
+import json
+import os
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from utils.queries import UserScope
+
+MANIFEST_NAMES = ("manifest.json", "manifest.csv")
+
+
+class ManifestError(Exception):
+    """Raised for archives or manifests that cannot be imported."""
+
+
+def parse_manifest(data: bytes, name: str) -> List[dict]:
+    """
+    Parses a JSON (list of objects) or CSV manifest into normalized rows:
+    title, problem_image, answer_image, folder, curriculum, hints (list).
+    """
+    if name.endswith(".json"):
+        try:
+            raw_rows = json.loads(data.decode("utf-8-sig"))
+        except ValueError as e:
+            raise ManifestError(f"Invalid manifest JSON: {e}")
+        if isinstance(raw_rows, dict):
+            raw_rows = raw_rows.get("problems", [])
+        if not isinstance(raw_rows, list):
+            raise ManifestError("Manifest JSON must be a list of problems")
+    else:
+        raw_rows = list(csv.DictReader(io.StringIO(data.decode("utf-8-sig"))))
+
+    rows = []
+    for i, raw in enumerate(raw_rows):
+        if not isinstance(raw, dict):
+            raise ManifestError(f"Manifest row {i + 1} is not an object")
+        title = (raw.get("title") or "").strip()
+        problem_image = (raw.get("problem_image") or "").strip()
+        if not title or not problem_image:
+            raise ManifestError(f"Manifest row {i + 1} needs title and problem_image")
+
+        hints = raw.get("hints") or []
+        if isinstance(hints, str):
+            # Same convention as create_problem: comma separated
+            hints = [h.strip() for h in hints.split(",") if h.strip()]
+
+        rows.append({
+            "title": title,
+            "problem_image": problem_image,
+            "answer_image": (raw.get("answer_image") or "").strip() or None,
+            "folder": _int_or_name(raw.get("folder", raw.get("folder_id"))),
+            "curriculum": _int_or_name(raw.get("curriculum", raw.get("curriculum_id"))),
+            "hints": [str(h) for h in hints],
+        })
+    return rows
+
+
+def _int_or_name(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, int):
+        return value
+    value = str(value).strip()
+    return int(value) if value.isdigit() else value
+
+
+def read_manifest(archive_path: str, manifest: Optional[bytes] = None, manifest_name: str = "") -> List[dict]:
+    """
+    Reads the manifest from the uploaded manifest file or, if not given,
+    from manifest.json / manifest.csv inside the archive, and checks that
+    every referenced image exists in the archive.
+    """
+    if not zipfile.is_zipfile(archive_path):
+        raise ManifestError("Uploaded file is not a ZIP archive")
+
+    with zipfile.ZipFile(archive_path) as zf:
+        names = set(zf.namelist())
+        if manifest is None:
+            for candidate in MANIFEST_NAMES:
+                if candidate in names:
+                    manifest = zf.read(candidate)
+                    manifest_name = candidate
+                    break
+            else:
+                raise ManifestError("Archive has no manifest.json or manifest.csv")
+
+        rows = parse_manifest(manifest, manifest_name)
+        for i, row in enumerate(rows):
+            for key in ("problem_image", "answer_image"):
+                if row[key] and row[key] not in names:
+                    raise ManifestError(f"Manifest row {i + 1}: '{row[key]}' not found in archive")
+    if not rows:
+        raise ManifestError("Manifest is empty")
+    return rows
+
+
+class ProblemImportJob:
+    """
+    Imports problems described by a manifest from a ZIP archive on disk.
+
+    Progress is checkpointed to state.json next to the archive after every
+    step, so an interrupted import can be resumed: rows already inserted are
+    skipped and rows whose images were uploaded but not yet inserted reuse
+    the uploaded URLs.
+
+    on_batch(user_id) is called after every insert of problems or hints, so
+    caches of the user's problems can be invalidated while the job runs.
+    """
+
+    def __init__(self, job_dir: str, supabase, upload_image: Callable[[int, bytes, str], str],
+                 process_image: Optional[Callable[[bytes], bytes]] = None,
+                 batch_size: int = 20, parallelism: int = 4,
+                 on_batch: Optional[Callable[[int], None]] = None):
+        self.job_dir = job_dir
+        self.supabase = supabase
+        self.upload_image = upload_image
+        self.process_image = process_image
+        self.batch_size = batch_size
+        self.parallelism = parallelism
+        self.on_batch = on_batch
+        self.archive_path = os.path.join(job_dir, "archive.zip")
+        self.state_path = os.path.join(job_dir, "state.json")
+        self._zip_lock = threading.Lock()
+
+    # --- State ---
+
+    @classmethod
+    def create(cls, job_dir: str, user_id: int, rows: List[dict], auto_crop: bool) -> dict:
+        state = {
+            "job_id": os.path.basename(job_dir),
+            "user_id": user_id,
+            "status": "queued",
+            "auto_crop": auto_crop,
+            "rows": rows,
+            "total": len(rows),
+            "done": {},      # row index -> problem_id
+            "pending": {},   # row index -> uploaded image urls, not yet inserted
+            "errors": {},    # row index -> message
+            "pid": None,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+        }
+        _write_json(os.path.join(job_dir, "state.json"), state)
+        return state
+
+    def load_state(self) -> dict:
+        with open(self.state_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_state(self, state: dict):
+        state["updated_at"] = time.time()
+        _write_json(self.state_path, state)
+
+    # --- Execution ---
+
+    def run(self):
+        state = self.load_state()
+        state["status"] = "running"
+        state["pid"] = os.getpid()
+        state["errors"] = {}
+        self.save_state(state)
+
+        try:
+            user_id = state["user_id"]
+            rows = state["rows"]
+            folder_ids = self._resolve_folders(user_id, rows)
+            curriculum_ids = self._resolve_curriculums(rows)
+            self._recover_pending(user_id, state)
+
+            todo = [i for i in range(len(rows)) if str(i) not in state["done"]]
+            with zipfile.ZipFile(self.archive_path) as zf, \
+                    ThreadPoolExecutor(max_workers=self.parallelism) as pool:
+                for start in range(0, len(todo), self.batch_size):
+                    batch = todo[start:start + self.batch_size]
+                    self._run_batch(zf, pool, state, batch, folder_ids, curriculum_ids)
+
+            state["status"] = "completed_with_errors" if state["errors"] else "completed"
+        except Exception as e:
+            print(f"Problem import {state['job_id']} failed: {e}")
+            state["status"] = "failed"
+            state["error"] = str(e)
+        state["pid"] = None
+        self.save_state(state)
+        return state
+
+    def _run_batch(self, zf, pool, state, batch, folder_ids, curriculum_ids):
+        user_id = state["user_id"]
+        rows = state["rows"]
+
+        def prepare(i):
+            row = rows[i]
+            key = str(i)
+            if key in state["pending"]:
+                return i, state["pending"][key], None
+            try:
+                urls = {
+                    "problem_image_url": self._upload_entry(zf, user_id, row["problem_image"], state["auto_crop"]),
+                    "answer_image_url": self._upload_entry(zf, user_id, row["answer_image"], state["auto_crop"])
+                    if row["answer_image"] else None,
+                }
+                return i, urls, None
+            except Exception as e:
+                return i, None, str(e)
+
+        prepared = []
+        for i, urls, error in pool.map(prepare, batch):
+            if error:
+                state["errors"][str(i)] = error
+                continue
+            state["pending"][str(i)] = urls
+            prepared.append(i)
+        # Checkpoint uploads before inserting so a crash does not re-upload
+        self.save_state(state)
+        if not prepared:
+            return
+
+        db = UserScope(self.supabase, user_id)
+        problems_data = []
+        for i in prepared:
+            row = rows[i]
+            problems_data.append({
+                "title": row["title"],
+                "folder_id": folder_ids.get(row["folder"]) if row["folder"] is not None else None,
+                "curriculum_id": curriculum_ids.get(row["curriculum"]) if row["curriculum"] is not None else None,
+                **state["pending"][str(i)],
+            })
+        response = db.insert('problems', problems_data).execute()
+        self._inserted(user_id)
+
+        hints_data = []
+        for i, problem in zip(prepared, response.data):
+            problem_id = problem['problem_id']
+            hints_data.extend(
+                {"problem_id": problem_id, "content": h, "step_number": n + 1}
+                for n, h in enumerate(rows[i]["hints"])
+            )
+        if hints_data:
+            db.insert('hints', hints_data).execute()
+            self._inserted(user_id)
+
+        for i, problem in zip(prepared, response.data):
+            state["done"][str(i)] = problem['problem_id']
+            state["pending"].pop(str(i), None)
+        self.save_state(state)
+
+    def _upload_entry(self, zf, user_id: int, name: str, auto_crop: bool) -> str:
+        # ZipFile handles are not safe for concurrent reads
+        with self._zip_lock:
+            data = zf.read(name)
+        ext = name.rsplit(".", 1)[-1].lower() if "." in name else "jpg"
+        if auto_crop and self.process_image:
+            data = self.process_image(data)
+            ext = "jpg"
+        return self.upload_image(user_id, data, ext)
+
+    def _recover_pending(self, user_id: int, state: dict):
+        """
+        Rows left in 'pending' by an interrupted run may or may not have been
+        inserted. Match them against existing problems by image URL.
+        """
+        if not state["pending"]:
+            return
+        url_to_row = {urls["problem_image_url"]: key for key, urls in state["pending"].items()}
+        db = UserScope(self.supabase, user_id)
+        existing = db.select('problems', "problem_id, problem_image_url")\
+            .in_('problem_image_url', list(url_to_row)).execute().data
+        if not existing:
+            return
+
+        recovered = {url_to_row[p['problem_image_url']]: p['problem_id'] for p in existing}
+        with_hints = db.select('hints', "problem_id")\
+            .in_('problem_id', list(recovered.values())).execute().data
+        has_hints = {h['problem_id'] for h in with_hints}
+
+        hints_data = []
+        for key, problem_id in recovered.items():
+            if problem_id not in has_hints:
+                hints_data.extend(
+                    {"problem_id": problem_id, "content": h, "step_number": n + 1}
+                    for n, h in enumerate(state["rows"][int(key)]["hints"])
+                )
+            state["done"][key] = problem_id
+            state["pending"].pop(key)
+        if hints_data:
+            db.insert('hints', hints_data).execute()
+            self._inserted(user_id)
+        self.save_state(state)
+
+    def _inserted(self, user_id: int):
+        if self.on_batch:
+            self.on_batch(user_id)
+
+    def _resolve_folders(self, user_id: int, rows: List[dict]) -> dict:
+        """Maps manifest folder values (id or name) to folder ids, creating missing folders."""
+        wanted = {row["folder"] for row in rows if row["folder"] is not None}
+        if not wanted:
+            return {}
+        db = UserScope(self.supabase, user_id)
+        folders = db.select('folders', "folder_id, name").execute().data
+        by_id = {f['folder_id'] for f in folders}
+        by_name = {f['name']: f['folder_id'] for f in folders}
+
+        mapping = {}
+        missing = []
+        for value in wanted:
+            if isinstance(value, int):
+                if value not in by_id:
+                    raise ManifestError(f"Folder {value} not found")
+                mapping[value] = value
+            elif value in by_name:
+                mapping[value] = by_name[value]
+            else:
+                missing.append(value)
+
+        if missing:
+            created = db.insert('folders', [{"name": name} for name in missing]).execute().data
+            for folder in created:
+                mapping[folder['name']] = folder['folder_id']
+        return mapping
+
+    def _resolve_curriculums(self, rows: List[dict]) -> dict:
+        """Maps manifest curriculum values (id or name) to curriculum ids."""
+        wanted = {row["curriculum"] for row in rows if row["curriculum"] is not None}
+        if not wanted:
+            return {}
+        curriculums = self.supabase.table('curriculums').select("curriculum_id, name, level").execute().data
+        by_id = {c['curriculum_id'] for c in curriculums}
+        by_name = {}
+        # Names repeat across levels (e.g. 삼각함수); prefer the most specific one
+        for c in sorted(curriculums, key=lambda c: c['level'] or 0):
+            by_name[c['name']] = c['curriculum_id']
+
+        mapping = {}
+        for value in wanted:
+            if isinstance(value, int) and value in by_id:
+                mapping[value] = value
+            elif value in by_name:
+                mapping[value] = by_name[value]
+            else:
+                raise ManifestError(f"Curriculum '{value}' not found")
+        return mapping
+
+
+def job_summary(state: dict) -> dict:
+    return {
+        "job_id": state["job_id"],
+        "status": state["status"],
+        "total": state["total"],
+        "processed": len(state["done"]) + len(state["errors"]),
+        "imported": len(state["done"]),
+        "failed": len(state["errors"]),
+        "errors": [
+            {"row": int(i) + 1, "error": message} for i, message in sorted(state["errors"].items(), key=lambda x: int(x[0]))
+        ],
+        "problem_ids": [state["done"][k] for k in sorted(state["done"], key=int)],
+        "error": state.get("error"),
+    }
+
+
+def _write_json(path: str, data: dict):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
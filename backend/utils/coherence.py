@@ -0,0 +1,194 @@
+import mmap
+import os
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows (local development runs a single process)
+    fcntl = None
+
+
+class VersionTable:
+    """
+    Per-entity version counters shared by all worker processes on the host.
+
+    The counters live in a memory-mapped file: a fixed array of uint64
+    slots addressed by a hash of the entity key (e.g. "problems:42").
+    Writers bump the key after changing the data, and in-process caches
+    remember the version they were built at and reload when it differs.
+    Reads are a single aligned 8-byte load; bumps take an flock so
+    concurrent increments from different processes are not lost.
+
+    Two keys may share a slot, which only causes an unnecessary reload.
+    """
+
+    def __init__(self, path: str, slots: int = 65536):
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._pid = None
+        self._open()
+
+    def _open(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = self.slots * 8
+        with self._file_lock():
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        self._mmap = mmap.mmap(self._fd, size)
+        self._counters = memoryview(self._mmap).cast("Q")
+        self._pid = os.getpid()
+
+    def _check_pid(self):
+        # flock is tied to the open file; a forked worker needs its own
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._open()
+
+    def _file_lock(self):
+        return _FileLock(self._fd)
+
+    def _slot(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % self.slots
+
+    def version(self, key: str) -> int:
+        self._check_pid()
+        return self._counters[self._slot(key)]
+
+    def bump(self, key: str) -> int:
+        """Increments the key's version and returns the new value."""
+        self._check_pid()
+        slot = self._slot(key)
+        with self._lock, self._file_lock():
+            value = (self._counters[slot] + 1) & 0xFFFFFFFFFFFFFFFF
+            self._counters[slot] = value
+        return value
+
+
+class _FileLock:
+    def __init__(self, fd: int):
+        self.fd = fd
+
+    def __enter__(self):
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+
+class VersionedValue:
+    """
+    A single cached value, reloaded when its key's version changes.
+
+    max_age bounds staleness for writes that do not go through the API
+    (e.g. the curriculum loader script), which cannot bump the version.
+    """
+
+    def __init__(self, versions: VersionTable, key: str, loader: Callable[[], Any], max_age: Optional[float] = None):
+        self.versions = versions
+        self.key = key
+        self.loader = loader
+        self.max_age = max_age
+        self._value = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        current = self.versions.version(self.key)
+        with self._lock:
+            fresh = self.max_age is None or time.monotonic() - self._loaded_at < self.max_age
+            if self._version == current and fresh:
+                return self._value
+
+        # Version is read before loading, so a write during the load triggers another reload
+        value = self.loader()
+        with self._lock:
+            self._value = value
+            self._version = current
+            self._loaded_at = time.monotonic()
+        return value
+
+
+class PerUserVersionedCache:
+    """
+    Per-user in-process structures (search index, hash trees) kept coherent
+    with a version counter, shared by the indexes that are built from the
+    database on first use and then updated in place by the write endpoints.
+
+    get() returns the user's entry, building it with build(user_id) when
+    it is missing or version(user_id) has moved on. The version is read
+    before building, so a write during the build triggers another build.
+
+    Local writes call writable() with the version returned by their bump,
+    while holding `lock`. It returns the entry to update in place only if
+    it was at the version just before that bump; if another worker wrote
+    in between, the entry is dropped and rebuilt on next use. A write
+    that happens while an entry is being built marks the result as not
+    cacheable: it is served once and the next get() builds it again.
+
+    Entries must have a `version` attribute. At most max_users are kept,
+    least recently used first out.
+    """
+
+    def __init__(self, build: Callable[[int], Any], max_users: int = 512,
+                 version: Optional[Callable[[int], int]] = None):
+        self.build = build
+        self.max_users = max_users
+        self.version = version
+        self.lock = threading.RLock()
+        self._entries = OrderedDict()
+        self._writes = Counter()  # user_id -> writes seen while the entry was not loaded
+
+    def get(self, user_id: int) -> Any:
+        current = self.version(user_id) if self.version else None
+        with self.lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.version == current:
+                self._entries.move_to_end(user_id)
+                return entry
+            writes_before = self._writes[user_id]
+
+        entry = self.build(user_id)
+        entry.version = current
+
+        with self.lock:
+            # Another request may have built it concurrently; keep the first one
+            existing = self._entries.get(user_id)
+            if existing is not None and existing.version == current:
+                return existing
+            if self._writes[user_id] != writes_before:
+                # A write raced with the build; serve this result but do not cache it
+                return entry
+            self._entries[user_id] = entry
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return entry
+
+    def writable(self, user_id: int, version: Optional[int]) -> Any:
+        """The entry to update for a local write, or None. Call with `lock` held."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            # Not built yet; it will be loaded fresh on next use
+            self._writes[user_id] += 1
+            return None
+        if version is not None:
+            if entry.version != version - 1:
+                # Missed a write from another worker; rebuild on next use
+                self._entries.pop(user_id)
+                self._writes[user_id] += 1
+                return None
+            entry.version = version
+        return entry
+
+    def invalidate(self, user_id: int):
+        with self.lock:
+            self._entries.pop(user_id, None)
+            self._writes[user_id] += 1
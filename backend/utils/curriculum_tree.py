@@ -0,0 +1,81 @@
+from typing import Dict, Iterable, List, Optional
+
+
+class CurriculumTree:
+    """
+    Index over the curriculum rows: children in sort order, depth and
+    ancestor chain of every node, and a parents-first order for walking
+    the tree. Built once per version of the curriculum table and shared
+    read-only between requests.
+
+    Nodes whose parent is missing are treated as roots.
+    """
+
+    def __init__(self, rows: Iterable[dict]):
+        self.nodes: Dict[int, dict] = {row['curriculum_id']: row for row in rows}
+        self.children: Dict[Optional[int], List[int]] = {}
+        for row in sorted(self.nodes.values(), key=lambda r: (r['sort_order'] or 0, r['curriculum_id'])):
+            parent = row['parent_id'] if row['parent_id'] in self.nodes else None
+            self.children.setdefault(parent, []).append(row['curriculum_id'])
+
+        # Parents before children; a node is placed once even if the data has a cycle
+        self.order: List[int] = []
+        self.depth: Dict[int, int] = {}
+        self.parent: Dict[int, Optional[int]] = {}
+        stack = [(cid, None, 0) for cid in reversed(self.children.get(None, []))]
+        while stack:
+            cid, parent, depth = stack.pop()
+            if cid in self.depth:
+                continue
+            self.order.append(cid)
+            self.depth[cid] = depth
+            self.parent[cid] = parent
+            stack.extend((child, cid, depth + 1) for child in reversed(self.children.get(cid, [])))
+        self.max_depth = max(self.depth.values(), default=-1)
+
+    @property
+    def roots(self) -> List[int]:
+        return self.children.get(None, [])
+
+    def descendants(self, curriculum_id: int) -> set:
+        """The curriculum itself plus all of its descendants."""
+        result = {curriculum_id}
+        stack = [curriculum_id]
+        while stack:
+            for child in self.children.get(stack.pop(), []):
+                if child not in result:
+                    result.add(child)
+                    stack.append(child)
+        return result
+
+    def ancestor_at(self, curriculum_id: int, depth: int) -> Optional[int]:
+        """The ancestor (or the node itself) at the given depth, None if the node is shallower."""
+        node_depth = self.depth.get(curriculum_id)
+        if node_depth is None or node_depth < depth:
+            return None
+        while node_depth > depth:
+            curriculum_id = self.parent[curriculum_id]
+            node_depth -= 1
+        return curriculum_id
+
+    def path(self, curriculum_id: int) -> List[int]:
+        """The node followed by its ancestors up to the root."""
+        result = []
+        while curriculum_id is not None and curriculum_id in self.depth:
+            result.append(curriculum_id)
+            curriculum_id = self.parent[curriculum_id]
+        return result
+
+    def rollup(self, values: Dict[int, Dict[str, int]], fields: Iterable[str]) -> Dict[int, Dict[str, int]]:
+        """
+        Sums per-node counters over every subtree in one bottom-up pass.
+        Returns an entry for every node in the tree.
+        """
+        fields = list(fields)
+        totals = {cid: {f: values.get(cid, {}).get(f, 0) for f in fields} for cid in self.order}
+        for cid in reversed(self.order):
+            parent = self.parent[cid]
+            if parent is not None:
+                for f in fields:
+                    totals[parent][f] += totals[cid][f]
+        return totals
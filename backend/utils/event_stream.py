@@ -0,0 +1,175 @@
+import asyncio
+import json
+import threading
+from typing import AsyncIterator, Callable, Dict, Optional, Set
+
+
+class TooManyStreams(Exception):
+    """Raised when a user already has the maximum number of open streams in this worker."""
+
+
+class Subscription:
+    def __init__(self, user_id: int, max_queue: int, version: int):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.seen = version     # highest event version delivered or resynced to
+        self.overflowed = False
+        self.closed = False
+
+
+class EventBroker:
+    """
+    Per-user event fan-out for server-sent event streams.
+
+    Handlers publish from threadpool threads; events are handed to the
+    event loop and put on each of the user's subscription queues. Queues
+    are bounded: a client that falls behind has its queue dropped and
+    gets a single "resync" event, telling it to refetch instead.
+
+    Subscribers only exist in the worker that holds the connection. Every
+    published event carries the user's shared version (version(user_id),
+    bumped by the publisher). A stream that sees the version move past
+    what it has delivered without a local event (a write in another
+    worker) also sends "resync".
+    """
+
+    def __init__(self, version: Callable[[int], int], max_queue: int = 100, max_streams_per_user: int = 5):
+        self.version = version
+        self.max_queue = max_queue
+        self.max_streams_per_user = max_streams_per_user
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+        self.resyncs = 0
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    def close(self):
+        """Ends all streams (on shutdown)."""
+        with self._lock:
+            subscriptions = [sub for subs in self._subscriptions.values() for sub in subs]
+        for sub in subscriptions:
+            sub.closed = True
+            self._put(sub, None)
+
+    def subscribe(self, user_id: int) -> Subscription:
+        with self._lock:
+            subs = self._subscriptions.setdefault(user_id, set())
+            if len(subs) >= self.max_streams_per_user:
+                raise TooManyStreams()
+            sub = Subscription(user_id, self.max_queue, self.version(user_id))
+            subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subscriptions.get(sub.user_id)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscriptions[sub.user_id]
+
+    def publish(self, user_id: int, event: dict):
+        """Thread-safe. event must have "type" and "version"."""
+        self.published += 1
+        if self._loop is None:
+            return
+        with self._lock:
+            subs = list(self._subscriptions.get(user_id, ()))
+        for sub in subs:
+            self._loop.call_soon_threadsafe(self._put, sub, event)
+
+    def _put(self, sub: Subscription, event: Optional[dict]):
+        if event is None:
+            # Closing: make room for the sentinel if needed
+            while sub.queue.full():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait(None)
+            return
+        if sub.overflowed:
+            return
+        try:
+            sub.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflows += 1
+            sub.overflowed = True
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+
+    async def stream(self, sub: Subscription, heartbeat: float, poll_interval: float,
+                     last_event_id: Optional[int] = None) -> AsyncIterator[str]:
+        """Yields SSE frames until the client disconnects or the broker closes."""
+        try:
+            yield self._frame({"type": "hello", "version": sub.seen})
+            if last_event_id is not None and last_event_id < sub.seen:
+                # Reconnected after missing events
+                yield self._resync(sub, sub.seen)
+            idle = 0.0
+            behind_since_last_poll = False
+            while not sub.closed:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    event = False
+                if event is None:
+                    break
+                if sub.overflowed:
+                    sub.overflowed = False
+                    yield self._resync(sub, self.version(sub.user_id))
+                    idle = 0.0
+                    continue
+                if event:
+                    if event["version"] <= sub.seen:
+                        # Already covered by the state at subscribe time or by a resync
+                        continue
+                    sub.seen = event["version"]
+                    self.delivered += 1
+                    yield self._frame(event)
+                    idle = 0.0
+                    continue
+
+                # Nothing queued: check for writes made through other workers. A local
+                # publish bumps the version slightly before its event is queued, so only
+                # resync when the version is still ahead on the next poll.
+                current = self.version(sub.user_id)
+                if current > sub.seen:
+                    if behind_since_last_poll:
+                        yield self._resync(sub, current)
+                        behind_since_last_poll = False
+                        idle = 0.0
+                        continue
+                    behind_since_last_poll = True
+                else:
+                    behind_since_last_poll = False
+                idle += poll_interval
+                if idle >= heartbeat:
+                    idle = 0.0
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+    def _resync(self, sub: Subscription, version: int) -> str:
+        self.resyncs += 1
+        sub.seen = max(sub.seen, version)
+        return self._frame({"type": "resync", "version": sub.seen})
+
+    @staticmethod
+    def _frame(event: dict) -> str:
+        return f"id: {event['version']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str, ensure_ascii=False)}\n\n"
+
+    def stats(self) -> dict:
+        with self._lock:
+            streams = sum(len(subs) for subs in self._subscriptions.values())
+            users = len(self._subscriptions)
+        return {
+            "streams": streams,
+            "users": users,
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+            "resyncs": self.resyncs,
+        }
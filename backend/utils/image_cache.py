@@ -0,0 +1,163 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+class ImageDiskCache:
+    """
+    Size-bounded LRU cache of image files on local disk.
+
+    Entries are addressed by a string key and stored as plain files so that
+    they can be served directly with a FileResponse. Recency is tracked in
+    memory and rebuilt from file mtimes when the process starts. Worker
+    processes may share the directory; files written by another process are
+    adopted on first access.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> size in bytes
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                # Renamed, evicted or cleaned up by another worker since listdir
+                continue
+            if name.endswith(".tmp"):
+                # Leftover from an interrupted write (recent ones may belong to another live worker)
+                if st.st_mtime < time.time() - 3600:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                continue
+            files.append((st.st_mtime, name, st.st_size))
+
+        # Oldest first, so the most recently used files end up at the back
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _file_name(self, key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, self._file_name(key))
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the file path for the key and marks it as recently used,
+        or None if the key is not cached.
+        """
+        name = self._file_name(key)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if name not in self._entries:
+                # Another worker process sharing the directory may have written it
+                try:
+                    size = os.path.getsize(path)
+                except FileNotFoundError:
+                    self.misses += 1
+                    return None
+                self._entries[name] = size
+                self._total_bytes += size
+                self._evict(keep=name)
+            self._entries.move_to_end(name)
+            self.hits += 1
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(name)
+            return None
+        return path
+
+    def put(self, key: str, data: bytes) -> str:
+        """
+        Writes data for the key atomically and evicts least recently used
+        entries until the cache fits in max_bytes again.
+        """
+        name = self._file_name(key)
+        path = os.path.join(self.directory, name)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._forget(name)
+            self._entries[name] = len(data)
+            self._total_bytes += len(data)
+            self._evict(keep=name)
+        return path
+
+    def get_or_create(self, key: str, factory: Callable[[], bytes]) -> str:
+        """
+        Returns the cached file for the key, calling factory to produce it
+        on a miss. Concurrent misses for the same key run factory only once.
+        """
+        path = self.get(key)
+        if path:
+            return path
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                # Another request may have filled it while we were waiting
+                path = self.get(key)
+                if path:
+                    return path
+                return self.put(key, factory())
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+    def _forget(self, name: str):
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self, keep: Optional[str] = None):
+        while self._total_bytes > self.max_bytes and self._entries:
+            name, size = next(iter(self._entries.items()))
+            if name == keep:
+                # A single entry larger than the whole cache is still served once
+                break
+            self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
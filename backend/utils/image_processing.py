@@ -1,3 +1,5 @@
+import time
+
 import cv2
 import numpy as np
 from fastapi import UploadFile
@@ -66,46 +68,107 @@ def four_point_transform(image, pts):
     # return the warped image
     return warped
 
-async def auto_crop_image(file_data: bytes) -> bytes:
+def decode_image(file_data: bytes, flags: int = cv2.IMREAD_COLOR):
     """
-    Detects the largest quadrilateral contour in the image and performs
-    a perspective transform to crop it.
+    Decodes image bytes into a NumPy array (BGR, or grayscale with
+    cv2.IMREAD_GRAYSCALE).
     """
-    # Convert bytes to numpy array
     nparr = np.frombuffer(file_data, np.uint8)
-    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
+    image = cv2.imdecode(nparr, flags)
+
     if image is None:
         raise ValueError("Could not decode image")
 
-    # Resize for faster processing (keep ratio)
-    # We process on a smaller image but crop the original
-    ratio = image.shape[0] / 500.0
-    orig = image.copy()
-    image_small = cv2.resize(image, (int(image.shape[1] / ratio), 500))
+    return image
+
+async def auto_crop_image(file_data: bytes) -> bytes:
+    """
+    Detects the largest quadrilateral contour in the image and performs
+    a perspective transform to crop it.
+    """
+    return crop_document(file_data)
+
+# Document detection pipeline: the image is scaled to DETECT_WORK_HEIGHT, edges
+# are found with Canny, and the DETECT_MAX_CONTOURS largest contours are
+# simplified with approxPolyDP (epsilon as a fraction of the perimeter) until
+# one has four corners. benchmarks/document_detection.py measures the effect
+# of changing these on accuracy and latency.
+DETECT_WORK_HEIGHT = 500
+DETECT_CANNY_LOW = 75
+DETECT_CANNY_HIGH = 200
+DETECT_MAX_CONTOURS = 5
+DETECT_APPROX_EPSILON = 0.02
+
+def find_document_contour(image, work_height: int = DETECT_WORK_HEIGHT,
+                          canny_low: int = DETECT_CANNY_LOW, canny_high: int = DETECT_CANNY_HIGH,
+                          max_contours: int = DETECT_MAX_CONTOURS,
+                          approx_epsilon: float = DETECT_APPROX_EPSILON, timings: dict = None):
+    """
+    Runs the detection pipeline on a decoded BGR image. Returns
+    (quad, largest, ratio): the first four-point approximation among the
+    largest contours (None if there is none) and the largest contour (None
+    if no edges were found), both in the coordinates of the scaled image,
+    and the ratio that scales them back to the original.
+
+    When a timings dict is passed, the seconds spent in each stage are
+    added to it under "resize", "edges", "contours" and "approx".
+    """
+    t0 = time.perf_counter()
+    # Process a smaller image (keeping the ratio); callers map results back to the original
+    ratio = image.shape[0] / float(work_height)
+    image_small = cv2.resize(image, (int(image.shape[1] / ratio), work_height))
+    t1 = time.perf_counter()
 
     # Convert to grayscale, blur, and find edges
     gray = cv2.cvtColor(image_small, cv2.COLOR_BGR2GRAY)
     gray = cv2.GaussianBlur(gray, (5, 5), 0)
-    edged = cv2.Canny(gray, 75, 200)
+    edged = cv2.Canny(gray, canny_low, canny_high)
+    t2 = time.perf_counter()
 
     # Find contours
-    cnts = cv2.findContours(edged.copy(), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    cnts = cv2.findContours(edged, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
     cnts = cnts[0] if len(cnts) == 2 else cnts[1]
-    cnts = sorted(cnts, key=cv2.contourArea, reverse=True)[:5]
+    cnts = sorted(cnts, key=cv2.contourArea, reverse=True)[:max_contours]
+    t3 = time.perf_counter()
 
-    screenCnt = None
+    quad = None
 
     # Loop over the contours to find the document
     for c in cnts:
         # Approximate the contour
         peri = cv2.arcLength(c, True)
-        approx = cv2.approxPolyDP(c, 0.02 * peri, True)
+        approx = cv2.approxPolyDP(c, approx_epsilon * peri, True)
 
-        # If our approximated contour has 4 points, then we can assume we found the screen
+        # If our approximated contour has 4 points, then we can assume we found the document
         if len(approx) == 4:
-            screenCnt = approx
+            quad = approx
             break
+    t4 = time.perf_counter()
+
+    if timings is not None:
+        for stage, seconds in (("resize", t1 - t0), ("edges", t2 - t1), ("contours", t3 - t2), ("approx", t4 - t3)):
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+    return quad, (cnts[0] if cnts else None), ratio
+
+def detect_document_corners(file_data: bytes, **params):
+    """
+    Corners of the detected document in original image coordinates, ordered
+    top-left, top-right, bottom-right, bottom-left, or None when no
+    quadrilateral was found. Keyword arguments are passed on to
+    find_document_contour.
+    """
+    quad, _, ratio = find_document_contour(decode_image(file_data), **params)
+    if quad is None:
+        return None
+    return order_points(quad.reshape(4, 2).astype("float32") * ratio)
+
+def crop_document(file_data: bytes, **params) -> bytes:
+    """
+    Synchronous implementation of auto_crop_image, for use from worker threads.
+    """
+    image = decode_image(file_data)
+    screenCnt, _, ratio = find_document_contour(image, **params)
 
     if screenCnt is None:
         # If no quadrilateral found, return original image (or maybe just Canny for debug?)
@@ -113,7 +176,7 @@ async def auto_crop_image(file_data: bytes) -> bytes:
         return file_data
 
     # Apply the four point transform to obtain a top-down view of the original image
-    warped = four_point_transform(orig, screenCnt.reshape(4, 2) * ratio)
+    warped = four_point_transform(image, screenCnt.reshape(4, 2) * ratio)
 
     # Convert to grayscale for "scanned" look (optional, maybe keep color for problems)
     # warped = cv2.cvtColor(warped, cv2.COLOR_BGR2GRAY)
@@ -129,48 +192,17 @@ async def auto_crop_image(file_data: bytes) -> bytes:
         
     return encoded_image.tobytes()
 
-def detect_document_bounds(file_data: bytes) -> dict:
+def detect_document_bounds(file_data: bytes, **params) -> dict:
     """
     Detects the document in the image and returns the bounding box coordinates
     (x, y, width, height) relative to the original image size.
     """
-    # Convert bytes to numpy array
-    nparr = np.frombuffer(file_data, np.uint8)
-    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    if image is None:
-        raise ValueError("Could not decode image")
-
-    # Resize for faster processing
-    ratio = image.shape[0] / 500.0
-    image_small = cv2.resize(image, (int(image.shape[1] / ratio), 500))
-
-    # Convert to grayscale, blur, and find edges
-    gray = cv2.cvtColor(image_small, cv2.COLOR_BGR2GRAY)
-    gray = cv2.GaussianBlur(gray, (5, 5), 0)
-    edged = cv2.Canny(gray, 75, 200)
+    image = decode_image(file_data)
+    found_cnt, largest, ratio = find_document_contour(image, **params)
 
-    # Find contours
-    cnts = cv2.findContours(edged.copy(), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
-    cnts = cnts[0] if len(cnts) == 2 else cnts[1]
-    cnts = sorted(cnts, key=cv2.contourArea, reverse=True)[:5]
-
-    found_cnt = None
-
-    # Loop over the contours to find the document
-    for c in cnts:
-        # Approximate the contour
-        peri = cv2.arcLength(c, True)
-        approx = cv2.approxPolyDP(c, 0.02 * peri, True)
-
-        # Prefer 4 points, but take the largest significant contour if not
-        if len(approx) == 4:
-            found_cnt = approx
-            break
-            
-    if found_cnt is None and len(cnts) > 0:
-        # Fallback to largest contour
-        found_cnt = cnts[0]
+    # Prefer 4 points, but take the largest significant contour if not
+    if found_cnt is None:
+        found_cnt = largest
 
     if found_cnt is None:
         # Return full image bounds if nothing found
@@ -191,3 +223,76 @@ def detect_document_bounds(file_data: bytes) -> dict:
         "width": int(w * ratio),
         "height": int(h * ratio)
     }
+
+def resize_image(file_data: bytes, width: int, fmt: str = "jpg", quality: int = 85) -> bytes:
+    """
+    Resizes the image to the given width (keeping the aspect ratio) and
+    encodes it in the requested format. Images are never upscaled.
+    """
+    image = decode_image(file_data)
+
+    if width < image.shape[1]:
+        height = max(1, int(image.shape[0] * width / image.shape[1]))
+        # INTER_AREA gives the best quality when shrinking
+        image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+    if fmt == "webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+    elif fmt == "png":
+        params = []
+    else:
+        fmt = "jpg"
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+
+    success, encoded_image = cv2.imencode(f".{fmt}", image, params)
+    if not success:
+        raise ValueError("Could not encode resized image")
+
+    return encoded_image.tobytes()
+
+def to_jpeg(file_data: bytes, max_width: int = 1600, quality: int = 85):
+    """
+    Re-encodes any supported image as a baseline JPEG no wider than max_width.
+    Returns (jpeg bytes, width, height).
+    """
+    image = decode_image(file_data)
+
+    if image.shape[1] > max_width:
+        height = max(1, int(image.shape[0] * max_width / image.shape[1]))
+        image = cv2.resize(image, (max_width, height), interpolation=cv2.INTER_AREA)
+
+    success, encoded_image = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not success:
+        raise ValueError("Could not encode image")
+
+    return encoded_image.tobytes(), image.shape[1], image.shape[0]
+
+HASH_SIZE = 8
+HASH_SAMPLE_SIZE = 32
+
+def _dct_matrix(n: int):
+    # Orthonormal DCT-II basis, so dct(x) = M @ x and the 2D DCT is M @ X @ M.T
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m
+
+_DCT = _dct_matrix(HASH_SAMPLE_SIZE)
+
+def perceptual_hash(file_data: bytes) -> int:
+    """
+    64-bit perceptual hash (pHash) of the image. The image is reduced to
+    32x32 grayscale and each bit records whether one of the 8x8 lowest
+    DCT frequencies is above their median, so re-encoded, resized or
+    slightly brightened copies of a photo hash to nearby values (compare
+    with the Hamming distance).
+    """
+    image = decode_image(file_data, cv2.IMREAD_GRAYSCALE)
+    small = cv2.resize(image, (HASH_SAMPLE_SIZE, HASH_SAMPLE_SIZE), interpolation=cv2.INTER_AREA)
+    freq = _DCT @ small.astype(np.float64) @ _DCT.T
+    low = freq[:HASH_SIZE, :HASH_SIZE].flatten()
+    # The DC term only reflects overall brightness; leave it out of the median
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
@@ -0,0 +1,357 @@
+import asyncio
+import inspect
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    job_type TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    user_id INTEGER,
+    status TEXT NOT NULL,           -- queued, running, succeeded, failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_at REAL NOT NULL,
+    dedupe_key TEXT,
+    locked_by TEXT,
+    locked_pid INTEGER,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_run_at ON jobs(status, job_type, run_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs(user_id, created_at);
+-- Only one active (queued or running) job per dedupe key
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedupe_active ON jobs(dedupe_key)
+    WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running');
+"""
+
+JOB_COLUMNS = (
+    "job_id, job_type, payload, user_id, status, attempts, max_attempts, run_at, dedupe_key, "
+    "last_error, result, created_at, updated_at, started_at, finished_at"
+)
+
+
+class JobQueue:
+    """
+    Persistent in-process background job queue.
+
+    Jobs are stored in a local SQLite database so they survive restarts and
+    are shared by all worker processes on the machine. Every process runs a
+    dispatcher that claims due jobs atomically, so a job runs only once.
+    Handlers are plain functions (run on a thread pool) or coroutines.
+    Failed jobs are retried with exponential backoff up to max_attempts,
+    and each job type has a concurrency limit across all processes.
+    """
+
+    def __init__(self, db_path: str, worker_threads: int = 4, poll_interval: float = 1.0,
+                 base_backoff: float = 2.0, max_backoff: float = 600.0, retention_seconds: float = 7 * 24 * 3600):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.retention_seconds = retention_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers = {}  # job_type -> (handler, concurrency, max_attempts)
+        self._executor = ThreadPoolExecutor(max_workers=worker_threads, thread_name_prefix="job")
+        # Queue bookkeeping gets its own thread so long handlers never delay claiming
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-db")
+        self._tasks = set()
+        self._wakeup = None
+        self._loop = None
+        self._dispatcher = None
+        self._stopping = False
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    # --- Storage ---
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections must not be shared
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    @staticmethod
+    def _row_to_dict(row) -> dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    # --- Registration / enqueueing ---
+
+    def register(self, job_type: str, handler: Callable, concurrency: int = 1, max_attempts: int = 5):
+        self._handlers[job_type] = (handler, concurrency, max_attempts)
+
+    def handler(self, job_type: str, concurrency: int = 1, max_attempts: int = 5):
+        def decorator(fn):
+            self.register(job_type, fn, concurrency, max_attempts)
+            return fn
+        return decorator
+
+    def enqueue(self, job_type: str, payload: Optional[dict] = None, user_id: Optional[int] = None,
+                delay: float = 0.0, dedupe_key: Optional[str] = None, max_attempts: Optional[int] = None) -> str:
+        """
+        Adds a job and returns its id. If dedupe_key is given and an active
+        job with the same key exists, that job's id is returned instead.
+        """
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        if max_attempts is None:
+            max_attempts = self._handlers[job_type][2]
+
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        conn = self._conn()
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO jobs (job_id, job_type, payload, user_id, status, max_attempts, run_at, "
+            "dedupe_key, created_at, updated_at) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?, ?)",
+            (job_id, job_type, json.dumps(payload or {}, ensure_ascii=False), user_id, max_attempts,
+             now + delay, dedupe_key, now, now),
+        )
+        if cursor.rowcount == 0:
+            existing = self.find_active(dedupe_key)
+            if existing:
+                return existing["job_id"]
+        self._notify()
+        return job_id
+
+    def _notify(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    # --- Inspection ---
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._conn().execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def find_active(self, dedupe_key: str) -> Optional[dict]:
+        row = self._conn().execute(
+            f"SELECT {JOB_COLUMNS} FROM jobs WHERE dedupe_key = ? AND status IN ('queued', 'running')",
+            (dedupe_key,),
+        ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list(self, user_id: Optional[int] = None, status: Optional[str] = None,
+             job_type: Optional[str] = None, limit: int = 50) -> List[dict]:
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if job_type:
+            clauses.append("job_type = ?")
+            params.append(job_type)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn().execute(
+            f"SELECT {JOB_COLUMNS} FROM jobs {where} ORDER BY created_at DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def stats(self) -> dict:
+        rows = self._conn().execute(
+            "SELECT job_type, status, COUNT(*) AS n FROM jobs GROUP BY job_type, status"
+        ).fetchall()
+        by_type = {}
+        for row in rows:
+            by_type.setdefault(row["job_type"], {})[row["status"]] = row["n"]
+        return {
+            "worker_id": self.worker_id,
+            "running_here": len(self._tasks),
+            "by_type": by_type,
+            "limits": {t: {"concurrency": c, "max_attempts": m} for t, (_, c, m) in self._handlers.items()},
+        }
+
+    # --- Claiming / completion ---
+
+    def _claim(self, job_type: str, concurrency: int) -> Optional[dict]:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            running = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE job_type = ? AND status = 'running'", (job_type,)
+            ).fetchone()[0]
+            if running >= concurrency:
+                conn.execute("COMMIT")
+                return None
+            row = conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs WHERE status = 'queued' AND job_type = ? AND run_at <= ? "
+                "ORDER BY run_at LIMIT 1",
+                (job_type, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_by = ?, locked_pid = ?, "
+                "started_at = ?, updated_at = ? WHERE job_id = ?",
+                (self.worker_id, os.getpid(), now, now, row["job_id"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        job = self._row_to_dict(row)
+        job["attempts"] += 1
+        return job
+
+    def _finish(self, job: dict, result=None, error: Optional[str] = None):
+        now = time.time()
+        conn = self._conn()
+        if error is None:
+            conn.execute(
+                "UPDATE jobs SET status = 'succeeded', result = ?, last_error = NULL, locked_by = NULL, "
+                "locked_pid = NULL, finished_at = ?, updated_at = ? WHERE job_id = ?",
+                (json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                 now, now, job["job_id"]),
+            )
+        elif job["attempts"] < job["max_attempts"]:
+            backoff = min(self.max_backoff, self.base_backoff * (2 ** (job["attempts"] - 1)))
+            backoff *= random.uniform(0.8, 1.2)
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', run_at = ?, last_error = ?, locked_by = NULL, "
+                "locked_pid = NULL, updated_at = ? WHERE job_id = ?",
+                (now + backoff, error, now, job["job_id"]),
+            )
+        else:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', last_error = ?, locked_by = NULL, locked_pid = NULL, "
+                "finished_at = ?, updated_at = ? WHERE job_id = ?",
+                (error, now, now, job["job_id"]),
+            )
+
+    def recover_orphans(self) -> int:
+        """Requeues jobs left 'running' by processes that no longer exist."""
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT job_id, locked_by, locked_pid FROM jobs WHERE status = 'running'"
+        ).fetchall()
+        host = socket.gethostname()
+        recovered = 0
+        for row in rows:
+            locked_host = (row["locked_by"] or "").split(":", 1)[0]
+            if locked_host == host and row["locked_pid"] != os.getpid() and _pid_alive(row["locked_pid"]):
+                continue
+            if locked_host != host and locked_host:
+                # Another machine sharing the file; leave its jobs alone
+                continue
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', locked_by = NULL, locked_pid = NULL, updated_at = ? "
+                "WHERE job_id = ? AND status = 'running'",
+                (time.time(), row["job_id"]),
+            )
+            recovered += 1
+        return recovered
+
+    def purge(self) -> int:
+        cutoff = time.time() - self.retention_seconds
+        cursor = self._conn().execute(
+            "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?", (cutoff,)
+        )
+        return cursor.rowcount
+
+    # --- Dispatching ---
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        recovered = await self._loop.run_in_executor(self._db_executor, self.recover_orphans)
+        if recovered:
+            print(f"Job queue: requeued {recovered} interrupted job(s)")
+        self._dispatcher = asyncio.create_task(self._dispatch_loop())
+
+    async def stop(self, timeout: float = 10.0):
+        self._stopping = True
+        if self._dispatcher:
+            self._wakeup.set()
+            await self._dispatcher
+        if self._tasks:
+            # Unfinished jobs stay 'running' and are requeued on the next start
+            await asyncio.wait(self._tasks, timeout=timeout)
+        self._executor.shutdown(wait=False)
+        self._db_executor.shutdown(wait=False)
+
+    async def _dispatch_loop(self):
+        last_purge = 0.0
+        while not self._stopping:
+            try:
+                claimed = False
+                for job_type, (handler, concurrency, _) in list(self._handlers.items()):
+                    job = await self._loop.run_in_executor(self._db_executor, self._claim, job_type, concurrency)
+                    if job:
+                        claimed = True
+                        task = asyncio.create_task(self._run(job, handler))
+                        self._tasks.add(task)
+                        task.add_done_callback(self._tasks.discard)
+                if time.time() - last_purge > 3600:
+                    last_purge = time.time()
+                    await self._loop.run_in_executor(self._db_executor, self.purge)
+            except Exception as e:
+                print(f"Job queue dispatcher error: {e}")
+                claimed = False
+
+            if not claimed:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _run(self, job: dict, handler: Callable):
+        try:
+            if inspect.iscoroutinefunction(handler):
+                result = await handler(job["payload"])
+            else:
+                result = await self._loop.run_in_executor(self._executor, handler, job["payload"])
+            error = None
+        except Exception as e:
+            print(f"Job {job['job_type']} {job['job_id']} attempt {job['attempts']} failed: {e}")
+            result = None
+            error = "".join(traceback.format_exception_only(type(e), e)).strip()
+        await self._loop.run_in_executor(self._db_executor, self._finish, job, result, error)
+        # A slot for this job type is free again
+        self._wakeup.set()
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,132 @@
+from typing import List, Optional, Tuple
+
+# A4 in points
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+
+# Adobe's predefined Korean CID font; viewers substitute an installed font,
+# so nothing needs to be embedded to render Hangul.
+KOREAN_FONT = b"HYSMyeongJo-Medium"
+
+
+class StreamingPdfWriter:
+    """
+    Minimal PDF writer that produces the document incrementally.
+
+    Each call returns the bytes to append to the output, so pages can be
+    streamed to the client as soon as their images are available. Only
+    what the workbook export needs is supported: JPEG images and lines of
+    (Korean) text. The page tree, cross-reference table and trailer are
+    written by finish().
+    """
+
+    CATALOG_ID = 1
+    PAGES_ID = 2
+    FONT_ID = 3
+    CID_FONT_ID = 4
+
+    def __init__(self):
+        self._offset = 0
+        self._offsets = {}
+        self._next_id = 5
+        self._page_ids = []
+
+    def _alloc(self) -> int:
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+
+    def _object(self, object_id: int, body: bytes, stream: Optional[bytes] = None) -> bytes:
+        out = b"%d 0 obj\n" % object_id + body
+        if stream is not None:
+            out += b"\nstream\n" + stream + b"\nendstream"
+        out += b"\nendobj\n"
+        return out
+
+    def _emit(self, chunks: List[Tuple[int, bytes, Optional[bytes]]]) -> bytes:
+        out = []
+        for object_id, body, stream in chunks:
+            self._offsets[object_id] = self._offset + sum(len(c) for c in out)
+            out.append(self._object(object_id, body, stream))
+        data = b"".join(out)
+        self._offset += len(data)
+        return data
+
+    def start(self) -> bytes:
+        header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self._offset = len(header)
+        fonts = self._emit([
+            (self.FONT_ID, b"<< /Type /Font /Subtype /Type0 /BaseFont /" + KOREAN_FONT +
+             b" /Encoding /UniKS-UCS2-H /DescendantFonts [%d 0 R] >>" % self.CID_FONT_ID, None),
+            (self.CID_FONT_ID, b"<< /Type /Font /Subtype /CIDFontType0 /BaseFont /" + KOREAN_FONT +
+             b" /CIDSystemInfo << /Registry (Adobe) /Ordering (Korea1) /Supplement 1 >>"
+             b" /FontDescriptor << /Type /FontDescriptor /FontName /" + KOREAN_FONT +
+             b" /Flags 6 /FontBBox [0 -148 1001 880] /ItalicAngle 0 /Ascent 880 /Descent -148"
+             b" /CapHeight 880 /StemV 50 >> /DW 1000 >>", None),
+        ])
+        return header + fonts
+
+    def add_page(self, images: List[Tuple[bytes, int, int, float, float, float, float]],
+                 texts: List[Tuple[float, float, float, str]]) -> bytes:
+        """
+        images: (jpeg bytes, pixel width, pixel height, x, y, width, height) in points
+        texts: (x, y, font size, text) in points, y measured from the bottom
+        """
+        page_id = self._alloc()
+        content_id = self._alloc()
+        chunks = []
+        xobjects = []
+        content = []
+
+        for n, (jpeg, px_w, px_h, x, y, w, h) in enumerate(images):
+            image_id = self._alloc()
+            chunks.append((image_id, b"<< /Type /XObject /Subtype /Image /Width %d /Height %d"
+                           b" /ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode /Length %d >>"
+                           % (px_w, px_h, len(jpeg)), jpeg))
+            xobjects.append(b"/Im%d %d 0 R" % (n, image_id))
+            content.append(b"q %.2f 0 0 %.2f %.2f %.2f cm /Im%d Do Q" % (w, h, x, y, n))
+
+        for x, y, size, text in texts:
+            encoded = text.encode("utf-16-be", errors="replace").hex().upper().encode("ascii")
+            content.append(b"BT /F1 %.1f Tf %.2f %.2f Td <%s> Tj ET" % (size, x, y, encoded))
+
+        stream = b"\n".join(content)
+        resources = b"<< /Font << /F1 %d 0 R >> /XObject << %s >> >>" % (self.FONT_ID, b" ".join(xobjects))
+        chunks.append((content_id, b"<< /Length %d >>" % len(stream), stream))
+        chunks.append((page_id, b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources %s /Contents %d 0 R >>"
+                       % (self.PAGES_ID, PAGE_WIDTH, PAGE_HEIGHT, resources, content_id), None))
+        self._page_ids.append(page_id)
+        return self._emit(chunks)
+
+    def finish(self) -> bytes:
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self._page_ids)
+        tail = self._emit([
+            (self.PAGES_ID, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._page_ids)), None),
+            (self.CATALOG_ID, b"<< /Type /Catalog /Pages %d 0 R >>" % self.PAGES_ID, None),
+        ])
+
+        xref_offset = self._offset
+        size = self._next_id
+        xref = [b"xref\n0 %d\n" % size, b"0000000000 65535 f \n"]
+        for object_id in range(1, size):
+            xref.append(b"%010d 00000 n \n" % self._offsets[object_id])
+        xref.append(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, self.CATALOG_ID, xref_offset))
+        return tail + b"".join(xref)
+
+
+def text_width(text: str, size: float) -> float:
+    """Approximate rendered width: full-width for CJK, half-width otherwise."""
+    return sum(size if ord(ch) > 0x2E7F else size * 0.5 for ch in text)
+
+
+def wrap_text(text: str, size: float, max_width: float) -> List[str]:
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        line = ""
+        for ch in paragraph:
+            if line and text_width(line + ch, size) > max_width:
+                lines.append(line)
+                line = ""
+            line += ch
+        lines.append(line)
+    return lines
@@ -0,0 +1,137 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.coherence import PerUserVersionedCache
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def hash_to_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+def hash_from_hex(value: str) -> int:
+    return int(value, 16)
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes with the Hamming distance.
+
+    Children are keyed by their distance to the parent, so a radius query
+    only descends into children whose key lies within [d - r, d + r] (by
+    the triangle inequality) instead of comparing against every hash.
+    Problems sharing a hash share a node. Removing a problem leaves the
+    node in place as a routing point.
+    """
+
+    def __init__(self):
+        self._root = None  # [hash, set of ids, {distance: child}]
+
+    def add(self, value: int, item_id: int):
+        if self._root is None:
+            self._root = [value, {item_id}, {}]
+            return
+        node = self._root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].add(item_id)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, {item_id}, {}]
+                return
+            node = child
+
+    def remove(self, value: int, item_id: int):
+        node = self._root
+        while node is not None:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].discard(item_id)
+                return
+            node = node[2].get(d)
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, int]]:
+        """Returns (id, distance) for every item within radius, nearest first."""
+        results = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= radius:
+                results.extend((item_id, d) for item_id in node[1])
+            for key, child in node[2].items():
+                if d - radius <= key <= d + radius:
+                    stack.append(child)
+        results.sort(key=lambda r: (r[1], r[0]))
+        return results
+
+
+class _UserHashes:
+    def __init__(self):
+        self.tree = BKTree()
+        self.hashes = {}  # problem_id -> hash
+        self.version = None
+
+
+class PerceptualHashIndex:
+    """
+    Per-user BK-trees of problem image hashes.
+
+    A user's tree is built on first use from loader(user_id), which
+    returns (problem_id, hash) pairs, and is then kept in sync by the
+    write endpoints, with the same optional version check as the search
+    index (see PerUserVersionedCache).
+    """
+
+    def __init__(self, loader: Callable[[int], List[Tuple[int, int]]], max_users: int = 512,
+                 version: Optional[Callable[[int], int]] = None):
+        self.loader = loader
+        self._users = PerUserVersionedCache(self._build, max_users, version)
+        self._lock = self._users.lock
+
+    def _build(self, user_id: int) -> _UserHashes:
+        entry = _UserHashes()
+        for problem_id, value in self.loader(user_id):
+            entry.tree.add(value, problem_id)
+            entry.hashes[problem_id] = value
+        return entry
+
+    def add(self, user_id: int, problem_id: int, value: int, version: Optional[int] = None):
+        with self._lock:
+            entry = self._users.writable(user_id, version)
+            if entry is None:
+                return
+            if problem_id in entry.hashes:
+                entry.tree.remove(entry.hashes[problem_id], problem_id)
+            entry.tree.add(value, problem_id)
+            entry.hashes[problem_id] = value
+
+    def remove(self, user_id: int, problem_id: int, version: Optional[int] = None):
+        with self._lock:
+            entry = self._users.writable(user_id, version)
+            if entry is None:
+                return
+            value = entry.hashes.pop(problem_id, None)
+            if value is not None:
+                entry.tree.remove(value, problem_id)
+
+    def invalidate(self, user_id: int):
+        self._users.invalidate(user_id)
+
+    def hash_of(self, user_id: int, problem_id: int) -> Optional[int]:
+        entry = self._users.get(user_id)
+        with self._lock:
+            return entry.hashes.get(problem_id)
+
+    def query(self, user_id: int, value: int, max_distance: int,
+              exclude: Optional[int] = None, limit: int = 10) -> List[Dict]:
+        """Returns up to `limit` {"problem_id", "distance"} within max_distance, nearest first."""
+        entry = self._users.get(user_id)
+        with self._lock:
+            matches = entry.tree.search(value, max_distance)
+        return [{"problem_id": problem_id, "distance": d}
+                for problem_id, d in matches if problem_id != exclude][:limit]
@@ -0,0 +1,84 @@
+from typing import Iterable, Optional
+
+# Tables with a user_id column. Every statement on them is filtered on it.
+USER_TABLES = {
+    "folders",
+    "problems",
+    "recent_targets",
+    "solve_logs",
+    "study_sessions",
+    "user_daily_activity",
+    "user_daily_problems",
+}
+
+# Tables owned through a parent row: child table -> parent table.
+# Reads are filtered on the parent's user_id with an inner join.
+CHILD_TABLES = {
+    "hints": "problems",
+    "study_session_curriculums": "study_sessions",
+    "study_session_folders": "study_sessions",
+}
+
+
+def columns(model, exclude: Iterable[str] = (), extra: Iterable[str] = ()) -> str:
+    """Select list for the fields of a response model, e.g. columns(models.Folder)."""
+    skip = set(exclude)
+    names = [name for name in model.model_fields if name not in skip]
+    return ", ".join(names + list(extra))
+
+
+def _check_columns(table: str, select: str):
+    if "*" in select:
+        raise ValueError(f"{table}: list the columns instead of selecting *")
+
+
+class UserScope:
+    """
+    Query builder for one user's rows.
+
+    Per-user tables always get `user_id = <user>`: reads and deletes are
+    filtered on it, inserts and upserts have it set on every row. Child
+    tables are read through an inner join on the parent's owner. There
+    is no way to build an unfiltered statement through this class, so
+    an endpoint cannot download other users' rows by forgetting a filter.
+
+    Selects must name their columns; "*" is rejected.
+    """
+
+    def __init__(self, client, user_id: int):
+        self.client = client
+        self.user_id = user_id
+
+    def _table(self, table: str):
+        if table not in USER_TABLES:
+            raise ValueError(f"{table} is not a per-user table")
+        return self.client.table(table)
+
+    def select(self, table: str, select: str, count: Optional[str] = None):
+        _check_columns(table, select)
+        parent = CHILD_TABLES.get(table)
+        if parent:
+            return self.client.table(table).select(f"{select}, {parent}!inner(user_id)", count=count) \
+                .eq(f"{parent}.user_id", self.user_id)
+        return self._table(table).select(select, count=count).eq('user_id', self.user_id)
+
+    def insert(self, table: str, rows):
+        if table in CHILD_TABLES:
+            # The caller has just created or checked the parent rows
+            return self.client.table(table).insert(rows)
+        return self._table(table).insert(self._owned(rows))
+
+    def upsert(self, table: str, rows, **kwargs):
+        return self._table(table).upsert(self._owned(rows), **kwargs)
+
+    def update(self, table: str, data: dict):
+        data = {k: v for k, v in data.items() if k != 'user_id'}
+        return self._table(table).update(data).eq('user_id', self.user_id)
+
+    def delete(self, table: str):
+        return self._table(table).delete().eq('user_id', self.user_id)
+
+    def _owned(self, rows):
+        if isinstance(rows, dict):
+            return {**rows, "user_id": self.user_id}
+        return [{**row, "user_id": self.user_id} for row in rows]
@@ -0,0 +1,195 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class PartialFlushError(Exception):
+    """Raised by a flush callback that sent only some items; `unsent` lists the rest."""
+
+    def __init__(self, unsent: List[dict], message: str):
+        super().__init__(message)
+        self.unsent = unsent
+
+
+class RecentUsageBuffer:
+    """
+    Write-behind buffer for "recently used" folders and curriculums.
+
+    record() only touches memory: accesses are coalesced per
+    (user, target_type, target_id) into the latest time and a use count,
+    and flushed in batches every `interval` seconds by a background task
+    (and once more on shutdown). A failed flush puts the items back; if the
+    flush callback raises PartialFlushError, only its unsent items, since
+    the uses in committed batches must not be added again.
+
+    Each worker also keeps a per-user view of the most recent targets.
+    It is loaded from the database on first use (or when older than
+    max_age, to pick up other workers' flushes) and then kept current by
+    record(), so top() usually needs no query.
+    """
+
+    def __init__(self, flush: Callable[[List[dict]], None], load: Callable[[int], List[dict]],
+                 per_user: int = 20, max_users: int = 2048, max_pending: int = 10000, max_age: float = 300):
+        self.flush_items = flush
+        self.load = load
+        self.per_user = per_user
+        self.max_users = max_users
+        self.max_pending = max_pending
+        self.max_age = max_age
+        self._pending: Dict[Tuple[int, str, int], list] = {}  # key -> [last_used_at, uses]
+        self._views = OrderedDict()  # user_id -> (loaded_at, {(target_type, target_id): [last_used_at, use_count]})
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._early_flush = False  # an early flush thread is running
+        self._task = None
+        self.recorded = 0
+        self.flushed = 0
+        self.flush_failures = 0
+        self.view_loads = 0
+
+    def record(self, user_id: int, target_type: str, target_id: Optional[int], at: Optional[float] = None):
+        if target_id is None:
+            return
+        at = at or time.time()
+        key = (user_id, target_type, target_id)
+        with self._lock:
+            self.recorded += 1
+            entry = self._pending.get(key)
+            if entry:
+                entry[0] = max(entry[0], at)
+                entry[1] += 1
+            else:
+                self._pending[key] = [at, 1]
+            view = self._views.get(user_id)
+            if view:
+                self._touch(view[1], target_type, target_id, at, 1)
+            # Too many distinct keys between ticks; flush early rather than grow.
+            # At most one early flush at a time, also while the database is failing.
+            flush_now = len(self._pending) >= self.max_pending and not self._early_flush
+            if flush_now:
+                self._early_flush = True
+        if flush_now:
+            threading.Thread(target=self._flush_early, daemon=True).start()
+
+    def _flush_early(self):
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._early_flush = False
+
+    def forget(self, user_id: int, target_type: str, target_id: int):
+        with self._lock:
+            self._pending.pop((user_id, target_type, target_id), None)
+            view = self._views.get(user_id)
+            if view:
+                view[1].pop((target_type, target_id), None)
+
+    def top(self, user_id: int, target_type: str, limit: int) -> List[dict]:
+        with self._lock:
+            view = self._views.get(user_id)
+            fresh = view is not None and time.time() - view[0] < self.max_age
+            if fresh:
+                self._views.move_to_end(user_id)
+        if not fresh:
+            view = self._load_view(user_id)
+        with self._lock:
+            targets = [(key, value) for key, value in view[1].items() if key[0] == target_type]
+        targets.sort(key=lambda item: item[1][0], reverse=True)
+        return [
+            {"target_id": key[1], "last_used_at": value[0], "use_count": value[1]}
+            for key, value in targets[:limit]
+        ]
+
+    def _load_view(self, user_id: int) -> tuple:
+        rows = self.load(user_id)
+        targets = {}
+        for row in rows:
+            targets[(row['target_type'], row['target_id'])] = [row['last_used_at'], row['use_count']]
+        with self._lock:
+            self.view_loads += 1
+            # Accesses not flushed yet are newer than anything in the database
+            for (uid, target_type, target_id), (at, uses) in self._pending.items():
+                if uid == user_id:
+                    self._touch(targets, target_type, target_id, at, uses)
+            view = (time.time(), targets)
+            self._views[user_id] = view
+            self._views.move_to_end(user_id)
+            while len(self._views) > self.max_users:
+                self._views.popitem(last=False)
+        return view
+
+    def _touch(self, targets: dict, target_type: str, target_id: int, at: float, uses: int):
+        entry = targets.get((target_type, target_id))
+        if entry:
+            entry[0] = max(entry[0], at)
+            entry[1] += uses
+        else:
+            targets[(target_type, target_id)] = [at, uses]
+        if len(targets) > self.per_user:
+            oldest = min(targets, key=lambda key: targets[key][0])
+            del targets[oldest]
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            items = [
+                {"user_id": user_id, "target_type": target_type, "target_id": target_id,
+                 "last_used_at": at, "uses": uses}
+                for (user_id, target_type, target_id), (at, uses) in pending.items()
+            ]
+            try:
+                self.flush_items(items)
+            except Exception as e:
+                print(f"Recent usage flush failed: {e}")
+                if isinstance(e, PartialFlushError):
+                    unsent = [(item["user_id"], item["target_type"], item["target_id"]) for item in e.unsent]
+                else:
+                    unsent = list(pending)
+                with self._lock:
+                    self.flush_failures += 1
+                    self.flushed += len(items) - len(unsent)
+                    for key in unsent:
+                        at, uses = pending[key]
+                        entry = self._pending.setdefault(key, [at, 0])
+                        entry[0] = max(entry[0], at)
+                        entry[1] += uses
+                return len(items) - len(unsent)
+            with self._lock:
+                self.flushed += len(items)
+            return len(items)
+
+    async def start(self, interval: float):
+        self._task = asyncio.create_task(self._flush_loop(interval))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await asyncio.get_running_loop().run_in_executor(None, self.flush)
+
+    async def _flush_loop(self, interval: float):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            await loop.run_in_executor(None, self.flush)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "cached_users": len(self._views),
+                "recorded": self.recorded,
+                "flushed": self.flushed,
+                "flush_failures": self.flush_failures,
+                "early_flush_running": self._early_flush,
+                "view_loads": self.view_loads,
+            }
@@ -0,0 +1,388 @@
+import asyncio
+import contextvars
+import functools
+import hmac
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from fastapi.routing import APIRoute
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# Profile of the request being handled; copied into threadpool calls with the context
+_current = contextvars.ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """Samples collected for one request."""
+
+    def __init__(self, name: str, trigger: str, root_frame, loop_thread: int, max_samples: int):
+        self.profile_id = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+        self.name = name
+        self.trigger = trigger
+        self.root_frame = root_frame    # frame of the route handler coroutine
+        self.loop_thread = loop_thread
+        self.max_samples = max_samples
+        self.threads: Dict[int, int] = {}  # worker thread id -> nesting depth of attached calls
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.last_sample = self.start
+        self.end = None
+        self.frames: Dict[tuple, int] = {}
+        self.samples: List[List[int]] = []
+        self.weights: List[float] = []
+        self.dropped = 0
+
+    def attach(self):
+        tid = threading.get_ident()
+        self.threads[tid] = self.threads.get(tid, 0) + 1
+
+    def detach(self):
+        tid = threading.get_ident()
+        depth = self.threads.get(tid, 0) - 1
+        if depth > 0:
+            self.threads[tid] = depth
+        else:
+            self.threads.pop(tid, None)
+
+    def _frame_index(self, key: tuple) -> int:
+        index = self.frames.get(key)
+        if index is None:
+            index = self.frames[key] = len(self.frames)
+        return index
+
+    def add_sample(self, stack: List[tuple], weight: float):
+        if len(self.samples) >= self.max_samples:
+            self.dropped += 1
+            return
+        self.samples.append([self._frame_index(key) for key in stack])
+        self.weights.append(weight)
+
+    def speedscope(self, metadata: dict) -> dict:
+        end = (self.end or time.perf_counter()) - self.start
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": self.name,
+            "exporter": "odapclean request profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": [{"name": name, "file": file, "line": line} for name, file, line in self.frames]},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": end * 1000,
+                "samples": self.samples,
+                "weights": self.weights,
+            }],
+            "metadata": metadata,
+        }
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for individual requests.
+
+    One background thread runs only while a profile is active. Every
+    `interval` seconds it takes sys._current_frames() and, for each active
+    profile, keeps the stacks of the threads working for that request:
+    the event loop thread while the handler coroutine is on its stack,
+    and threadpool threads while they run the endpoint, its synchronous
+    dependencies or response validation (see ProfiledRoute). Time where
+    no thread is running the request (waiting for a threadpool slot or
+    for the loop) is recorded as "(waiting)". Blocking I/O such as
+    Supabase round trips shows up as the frames blocked in the socket read.
+    """
+
+    def __init__(self, interval: float = 0.005, max_samples: int = 20000, max_active: int = 4):
+        self.interval = interval
+        self.max_samples = max_samples
+        self.max_active = max_active
+        self._active: Dict[str, RequestProfile] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = None
+        self._code_names: Dict[object, tuple] = {}
+        self.started = 0
+        self.skipped = 0
+
+    def begin(self, name: str, trigger: str, root_frame) -> Optional[RequestProfile]:
+        with self._lock:
+            if len(self._active) >= self.max_active:
+                self.skipped += 1
+                return None
+            profile = RequestProfile(name, trigger, root_frame, threading.get_ident(), self.max_samples)
+            self._active[profile.profile_id] = profile
+            self.started += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+            self._wake.notify()
+        return profile
+
+    def finish(self, profile: RequestProfile):
+        with self._lock:
+            self._active.pop(profile.profile_id, None)
+        profile.end = time.perf_counter()
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                while not self._active:
+                    self._wake.wait()
+                profiles = list(self._active.values())
+            frames = sys._current_frames()
+            now = time.perf_counter()
+            for profile in profiles:
+                self._sample(profile, frames, now, own)
+            time.sleep(self.interval)
+
+    def _sample(self, profile: RequestProfile, frames: dict, now: float, own: int):
+        weight = (now - profile.last_sample) * 1000
+        profile.last_sample = now
+        stacks = []
+        frame = frames.get(profile.loop_thread)
+        stack = self._stack(frame, stop=profile.root_frame)
+        if stack is not None:
+            stacks.append([("[event loop]", "", 0)] + stack)
+        for tid in list(profile.threads):
+            if tid != own and tid != profile.loop_thread and tid in frames:
+                stack = self._stack(frames[tid], stop=_attached_code)
+                stacks.append([("[worker thread]", "", 0)] + (stack or []))
+        if not stacks:
+            stacks.append([("(waiting)", "", 0)])
+        for stack in stacks:
+            profile.add_sample(stack, weight / len(stacks))
+
+    def _stack(self, frame, stop) -> Optional[List[tuple]]:
+        """
+        Root-first stack above `stop` (a frame object, or a code object marking
+        where the request's work starts). None when `stop` is not on the stack.
+        """
+        stack = []
+        while frame is not None:
+            if frame is stop or frame.f_code is stop:
+                stack.reverse()
+                return stack
+            stack.append(self._frame_key(frame.f_code))
+            frame = frame.f_back
+        return None
+
+    def _frame_key(self, code) -> tuple:
+        key = self._code_names.get(code)
+        if key is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            key = self._code_names[code] = (name, code.co_filename, code.co_firstlineno)
+        return key
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"active": len(self._active), "started": self.started, "skipped": self.skipped}
+
+
+def attached(func):
+    """Wraps a synchronous callable so the thread running it is sampled for the current request."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        profile.attach()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.detach()
+    return wrapper
+
+
+_attached_code = attached(lambda: None).__code__
+
+
+class ProfileStore:
+    """Profiles as speedscope JSON files in a directory, oldest removed past max_files or max_bytes."""
+
+    def __init__(self, directory: str, max_files: int, max_bytes: int):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, profile_id: str) -> Optional[str]:
+        if not profile_id.replace("-", "").isalnum():
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.speedscope.json")
+        return path if os.path.exists(path) else None
+
+    def save(self, profile_id: str, document: dict):
+        path = os.path.join(self.directory, f"{profile_id}.speedscope.json")
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(document, f, separators=(",", ":"))
+        os.replace(tmp, path)
+        self._prune()
+
+    def _files(self) -> List[tuple]:
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".speedscope.json"):
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, name, st.st_size))
+        return sorted(files)
+
+    def _prune(self):
+        with self._lock:
+            files = self._files()
+            total = sum(size for _, _, size in files)
+            while files and (len(files) > self.max_files or total > self.max_bytes):
+                _, name, size = files.pop(0)
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def list(self) -> List[dict]:
+        entries = []
+        for _, name, size in reversed(self._files()):
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    metadata = json.load(f).get("metadata", {})
+            except (OSError, ValueError):
+                continue
+            entries.append({**metadata, "size": size})
+        return entries
+
+
+def redact_query(query: str) -> str:
+    """
+    Query string with every value replaced, so credentials passed in the URL
+    (the event stream sends its token as ?token=) never reach profile files.
+    """
+    return urlencode([(key, "REDACTED" if value else "") for key, value in parse_qsl(query, keep_blank_values=True)])
+
+
+def folded(document: dict) -> str:
+    """Collapsed stacks ("a;b;c <microseconds>" per line) for flamegraph.pl and similar tools."""
+    frames = document["shared"]["frames"]
+    totals: Dict[str, float] = {}
+    profile = document["profiles"][0]
+    for sample, weight in zip(profile["samples"], profile["weights"]):
+        key = ";".join(frames[i]["name"] for i in sample)
+        totals[key] = totals.get(key, 0) + weight
+    return "".join(f"{key} {round(value * 1000)}\n" for key, value in sorted(totals.items()))
+
+
+class RequestProfiler:
+    """
+    Decides which requests are profiled and stores the results.
+
+    A request is profiled when it carries `header` set to the admin token,
+    or at random with probability sample_rate. The profile id is returned
+    in the X-Profile-Id response header.
+    """
+
+    def __init__(self, store: ProfileStore, sampler: SamplingProfiler, sample_rate: float = 0.0,
+                 token: Optional[str] = None, header: str = "X-Debug-Profile"):
+        self.store = store
+        self.sampler = sampler
+        self.sample_rate = sample_rate
+        self.token = token
+        self.header = header
+        self.saved = 0
+        self.save_failures = 0
+
+    def trigger(self, request) -> Optional[str]:
+        value = request.headers.get(self.header)
+        if value and self.token and hmac.compare_digest(value, self.token):
+            return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def _save(self, profile: RequestProfile, metadata: dict):
+        try:
+            self.store.save(profile.profile_id, profile.speedscope(metadata))
+            self.saved += 1
+        except Exception as e:
+            self.save_failures += 1
+            print(f"Could not save profile {profile.profile_id}: {e}")
+
+    def route_class(self):
+        profiler = self
+
+        class ProfiledRoute(APIRoute):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                # Threadpool work of the request is only sampled through these wrappers
+                wrapped = {}
+
+                def attach_calls(dependant):
+                    call = dependant.call
+                    if call is not None and inspect.isfunction(call) and not (
+                            inspect.iscoroutinefunction(call) or inspect.isgeneratorfunction(call)
+                            or inspect.isasyncgenfunction(call)):
+                        dependant.call = wrapped.setdefault(call, attached(call))
+                    for sub in dependant.dependencies:
+                        attach_calls(sub)
+
+                attach_calls(self.dependant)
+                # Response validation also runs in the threadpool for sync endpoints
+                for attr in ("secure_cloned_response_field", "response_field"):
+                    field = getattr(self, attr, None)
+                    if field is not None and "validate" not in vars(field):
+                        field.validate = attached(field.validate)
+
+            def get_route_handler(self):
+                handler = super().get_route_handler()
+                name = f"{','.join(sorted(self.methods))} {self.path}"
+
+                async def profiled_handler(request):
+                    trigger = profiler.trigger(request)
+                    profile = trigger and profiler.sampler.begin(name, trigger, sys._getframe())
+                    if not profile:
+                        return await handler(request)
+                    token = _current.set(profile)
+                    status_code = None
+                    try:
+                        response = await handler(request)
+                        status_code = response.status_code
+                        response.headers["X-Profile-Id"] = profile.profile_id
+                        return response
+                    finally:
+                        _current.reset(token)
+                        profiler.sampler.finish(profile)
+                        metadata = {
+                            "profile_id": profile.profile_id,
+                            "name": name,
+                            "path": request.url.path,
+                            "query": redact_query(request.url.query),
+                            "status_code": status_code,
+                            "trigger": trigger,
+                            "started_at": profile.started_at,
+                            "duration_ms": (profile.end - profile.start) * 1000,
+                            "samples": len(profile.samples),
+                            "dropped_samples": profile.dropped,
+                        }
+                        # Written off the request path
+                        asyncio.get_running_loop().run_in_executor(None, profiler._save, profile, metadata)
+
+                return profiled_handler
+
+        return ProfiledRoute
+
+    def stats(self) -> dict:
+        return {**self.sampler.stats(), "sample_rate": self.sample_rate, "saved": self.saved,
+                "save_failures": self.save_failures}
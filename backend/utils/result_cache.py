@@ -0,0 +1,82 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class VersionedResultCache:
+    """
+    LRU cache of encoded query results, keyed by user and query parameters.
+
+    Every entry stores the version it was computed at: the caller's tuple
+    of VersionTable counters, read before the query ran. A lookup with any
+    other version is a miss and drops the entry. Writers only bump a
+    counter, which is an O(1) invalidation of all the user's results in
+    every worker. A result whose query raced with a write is stored under
+    the older version and never served.
+
+    Entries are evicted least recently used first once there are more
+    than max_entries or their values take more than max_bytes.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (version, value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.too_large = 0
+
+    def get(self, key: Hashable, version: tuple) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != version:
+                self.misses += 1
+                self.stale += 1
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, version: tuple, value: bytes):
+        size = sys.getsizeof(value)
+        if size > self.max_bytes:
+            self.too_large += 1
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        # Called with the lock held
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "too_large": self.too_large,
+            }
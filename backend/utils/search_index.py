@@ -0,0 +1,152 @@
+import heapq
+import math
+import unicodedata
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from utils.coherence import PerUserVersionedCache
+
+TITLE_WEIGHT = 2.0
+HINT_WEIGHT = 1.0
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Character bigrams per word, which works for Korean without a morphological
+    analyzer (e.g. "삼각함수의" -> 삼각, 각함, 함수, 수의). Single-character
+    words become unigrams so they stay searchable.
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    tokens = []
+    word = []
+    for ch in text + " ":
+        if ch.isalnum():
+            word.append(ch)
+            continue
+        if len(word) == 1:
+            tokens.append(word[0])
+        else:
+            tokens.extend(word[i] + word[i + 1] for i in range(len(word) - 1))
+        word = []
+    return tokens
+
+
+class _UserIndex:
+    def __init__(self):
+        self.docs = {}       # problem_id -> {"problem": row, "tokens": Counter}
+        self.postings = {}   # token -> {problem_id: weight}
+        self.version = None
+
+    def add(self, problem: dict, hints: Iterable[str]):
+        problem_id = problem['problem_id']
+        hints = list(hints)
+        self.remove(problem_id)
+        weights = Counter()
+        for token in tokenize(problem.get('title', '')):
+            weights[token] += TITLE_WEIGHT
+        for hint in hints:
+            for token in tokenize(hint):
+                weights[token] += HINT_WEIGHT
+        self.docs[problem_id] = {"problem": problem, "tokens": weights, "hints": hints}
+        for token, weight in weights.items():
+            self.postings.setdefault(token, {})[problem_id] = weight
+
+    def remove(self, problem_id: int):
+        doc = self.docs.pop(problem_id, None)
+        if not doc:
+            return
+        for token in doc["tokens"]:
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.pop(problem_id, None)
+                if not posting:
+                    del self.postings[token]
+
+
+class ProblemSearchIndex:
+    """
+    In-process inverted index over problem titles and hints, one per user.
+
+    A user's index is built on first search from loader(user_id), which
+    returns (problem row, [hint contents]) pairs, and is then kept in sync
+    by the write endpoints. Lookups only touch the postings of the query's
+    bigrams, so cost depends on the matches rather than the library size.
+
+    If version(user_id) is given (a shared VersionTable lookup), an index
+    is rebuilt when another worker process has changed the user's problems.
+    Local writes pass the version returned by their bump; they are applied
+    in place only if no other write happened in between (see
+    PerUserVersionedCache).
+    """
+
+    def __init__(self, loader: Callable[[int], List[tuple]], max_users: int = 512,
+                 version: Optional[Callable[[int], int]] = None):
+        self.loader = loader
+        self._users = PerUserVersionedCache(self._build, max_users, version)
+        self._lock = self._users.lock
+
+    def _build(self, user_id: int) -> _UserIndex:
+        index = _UserIndex()
+        for problem, hints in self.loader(user_id):
+            index.add(problem, hints)
+        return index
+
+    def upsert(self, user_id: int, problem: dict, hints: Optional[List[str]] = None, version: Optional[int] = None):
+        """Adds or updates a problem. hints=None keeps the indexed hints."""
+        with self._lock:
+            index = self._users.writable(user_id, version)
+            if index is None:
+                return
+            if hints is None:
+                doc = index.docs.get(problem['problem_id'])
+                hints = doc["hints"] if doc else []
+                problem = {**doc["problem"], **problem} if doc else problem
+            index.add(problem, hints)
+
+    def remove(self, user_id: int, problem_id: int, version: Optional[int] = None):
+        with self._lock:
+            index = self._users.writable(user_id, version)
+            if index is not None:
+                index.remove(problem_id)
+
+    def invalidate(self, user_id: int):
+        self._users.invalidate(user_id)
+
+    def search(self, user_id: int, query: str, limit: int = 20,
+               folder_id: Optional[int] = None, curriculum_ids: Optional[Set[int]] = None) -> List[dict]:
+        """
+        Returns up to `limit` results as {"problem", "score"} ranked
+        by a TF-IDF score over query bigrams, scaled by the fraction of query
+        bigrams matched.
+        """
+        query_tokens = Counter(tokenize(query))
+        if not query_tokens:
+            return []
+
+        index = self._users.get(user_id)
+        with self._lock:
+            n_docs = max(len(index.docs), 1)
+            scores: Dict[int, float] = {}
+            matched: Dict[int, int] = {}
+            for token, query_count in query_tokens.items():
+                posting = index.postings.get(token)
+                if not posting:
+                    continue
+                idf = math.log(1 + n_docs / len(posting))
+                for problem_id, weight in posting.items():
+                    scores[problem_id] = scores.get(problem_id, 0.0) + query_count * weight * idf
+                    matched[problem_id] = matched.get(problem_id, 0) + query_count
+
+            total = sum(query_tokens.values())
+            candidates = []
+            for problem_id, score in scores.items():
+                problem = index.docs[problem_id]["problem"]
+                if folder_id is not None and problem.get('folder_id') != folder_id:
+                    continue
+                if curriculum_ids is not None and problem.get('curriculum_id') not in curriculum_ids:
+                    continue
+                coverage = matched[problem_id] / total
+                candidates.append((score * coverage, problem_id, problem))
+
+        top = heapq.nlargest(limit, candidates, key=lambda c: (c[0], c[1]))
+        return [{"problem": problem, "score": round(score, 4)} for score, _, problem in top]
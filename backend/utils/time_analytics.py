@@ -0,0 +1,270 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+WEEK_SECONDS = 7 * 24 * 3600
+
+
+class SolveLogColumns:
+    """
+    Columnar copy of one user's solve logs, ordered by solve_log_id.
+    time_spent is NaN where the client did not report it.
+    """
+
+    def __init__(self):
+        self.solve_log_id = np.empty(0, dtype=np.int64)
+        self.problem_id = np.empty(0, dtype=np.int64)
+        self.created_at = np.empty(0, dtype=np.float64)  # epoch seconds
+        self.time_spent = np.empty(0, dtype=np.float64)
+        self.is_correct = np.empty(0, dtype=bool)
+
+    def __len__(self):
+        return len(self.solve_log_id)
+
+    @property
+    def last_id(self) -> int:
+        return int(self.solve_log_id[-1]) if len(self) else 0
+
+    def extend(self, rows: List[dict]) -> "SolveLogColumns":
+        """Returns a new SolveLogColumns with rows appended; self is left untouched."""
+        if not rows:
+            return self
+        n = len(rows)
+        extended = SolveLogColumns()
+        extended.solve_log_id = np.concatenate([self.solve_log_id, np.fromiter((r['solve_log_id'] for r in rows), np.int64, n)])
+        extended.problem_id = np.concatenate([self.problem_id, np.fromiter((r['problem_id'] for r in rows), np.int64, n)])
+        extended.created_at = np.concatenate([self.created_at, np.fromiter(
+            (datetime.fromisoformat(r['created_at'].replace('Z', '+00:00')).timestamp() for r in rows), np.float64, n)])
+        extended.time_spent = np.concatenate([self.time_spent, np.fromiter(
+            (np.nan if r['time_spent'] is None else r['time_spent'] for r in rows), np.float64, n)])
+        extended.is_correct = np.concatenate([self.is_correct, np.fromiter((bool(r['is_correct']) for r in rows), bool, n)])
+        return extended
+
+
+class SolveLogColumnStore:
+    """
+    Per-user cache of SolveLogColumns, kept up to date incrementally.
+
+    Each lookup only fetches logs newer than the cached watermark and
+    compares the total row count to detect deletions (e.g. cascades from
+    problem deletes), in which case the user's columns are rebuilt.
+
+    If version(user_id) is given (a shared VersionTable lookup), cached
+    columns are returned without any query while the version is unchanged.
+    """
+
+    def __init__(self, fetch_since: Callable[[int, int], List[dict]], count: Callable[[int], int], max_users: int = 256,
+                 version: Optional[Callable[[int], int]] = None):
+        self.fetch_since = fetch_since
+        self.count = count
+        self.max_users = max_users
+        self.version = version
+        self._users = OrderedDict()  # user_id -> (columns, version)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> SolveLogColumns:
+        current = self.version(user_id) if self.version else None
+        with self._lock:
+            columns, cached_version = self._users.get(user_id, (None, None))
+            if columns is not None:
+                self._users.move_to_end(user_id)
+                if current is not None and cached_version == current:
+                    return columns
+
+        if columns is None:
+            columns = SolveLogColumns()
+        # Cached columns are shared between requests, so never mutate them in place
+        columns = columns.extend(self.fetch_since(user_id, columns.last_id))
+        if len(columns) != self.count(user_id):
+            columns = SolveLogColumns().extend(self.fetch_since(user_id, 0))
+
+        with self._lock:
+            self._users[user_id] = (columns, current)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return columns
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+
+def _group_percentiles(codes: np.ndarray, values: np.ndarray, n_groups: int, qs) -> np.ndarray:
+    """
+    Linear-interpolated percentiles of values per group code, for all groups
+    at once. Returns an array of shape (len(qs), n_groups), NaN for empty groups.
+    """
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    result = np.full((len(qs), n_groups), np.nan)
+    present = counts > 0
+    for qi, q in enumerate(qs):
+        pos = starts[present] + q * (counts[present] - 1)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.ceil(pos).astype(np.int64)
+        result[qi, present] = sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+    return result
+
+
+def _group_stats(codes: np.ndarray, n_groups: int, columns: SolveLogColumns, valid: np.ndarray,
+                 first_idx: np.ndarray, last_idx: np.ndarray, problem_codes: np.ndarray,
+                 trend_start: float, weeks: int) -> Dict[str, np.ndarray]:
+    """
+    Computes all time statistics for every group code in one pass of
+    vectorized operations. codes has one entry per log (-1 = no group).
+    """
+    mask = valid & (codes >= 0)
+    g = codes[mask]
+    t = columns.time_spent[mask]
+    ts = columns.created_at[mask]
+
+    attempts = np.bincount(g, minlength=n_groups)
+    total = np.bincount(g, weights=t, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / attempts
+    median, p90 = _group_percentiles(g, t, n_groups, (0.5, 0.9))
+
+    # Weekly means over the trend window, and a least-squares slope per group
+    week = np.floor((ts - trend_start) / WEEK_SECONDS).astype(np.int64)
+    in_window = (week >= 0) & (week < weeks)
+    flat = g[in_window] * weeks + week[in_window]
+    week_counts = np.bincount(flat, minlength=n_groups * weeks).reshape(n_groups, weeks)
+    week_sums = np.bincount(flat, weights=t[in_window], minlength=n_groups * weeks).reshape(n_groups, weeks)
+
+    x = (ts - trend_start) / WEEK_SECONDS
+    sx = np.bincount(g, weights=x, minlength=n_groups)
+    sy = total
+    sxx = np.bincount(g, weights=x * x, minlength=n_groups)
+    sxy = np.bincount(g, weights=x * t, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        denominator = attempts * sxx - sx * sx
+        slope = np.where(np.abs(denominator) > 1e-9, (attempts * sxy - sx * sy) / denominator, np.nan)
+
+    # Improvement between the first and the latest attempt of each re-solved problem
+    resolved = (first_idx != last_idx) & (problem_codes >= 0)
+    pc = problem_codes[resolved]
+    first_t = columns.time_spent[first_idx[resolved]]
+    last_t = columns.time_spent[last_idx[resolved]]
+    resolved_count = np.bincount(pc, minlength=n_groups)
+    improvement = np.bincount(pc, weights=first_t - last_t, minlength=n_groups)
+    improvement_rate = np.bincount(pc, weights=(first_t - last_t) / np.maximum(first_t, 1.0), minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_improvement = improvement / resolved_count
+        mean_improvement_rate = improvement_rate / resolved_count * 100
+
+    return {
+        "attempts": attempts,
+        "mean": mean,
+        "median": median,
+        "p90": p90,
+        "slope": slope,
+        "week_counts": week_counts,
+        "week_sums": week_sums,
+        "resolved": resolved_count,
+        "mean_improvement": mean_improvement,
+        "mean_improvement_rate": mean_improvement_rate,
+    }
+
+
+def _nan_to_none(value) -> Optional[float]:
+    value = float(value)
+    return None if np.isnan(value) else round(value, 2)
+
+
+def latest_outcomes(columns: SolveLogColumns) -> Dict[int, bool]:
+    """Problem id -> whether its latest attempt (by created_at) was correct."""
+    if not len(columns):
+        return {}
+    order = np.lexsort((columns.solve_log_id, columns.created_at, columns.problem_id))
+    pids = columns.problem_id[order]
+    last = np.concatenate([np.flatnonzero(np.diff(pids)), [len(pids) - 1]])
+    return dict(zip(pids[last].tolist(), columns.is_correct[order][last].tolist()))
+
+
+def compute_time_analytics(columns: SolveLogColumns, problems: List[dict], now: float, weeks: int = 12,
+                           extra_groupings: Optional[Dict[str, List[Optional[int]]]] = None) -> dict:
+    """
+    Time-spent statistics (mean, median, p90, weekly trend and re-solve
+    improvement) overall, per curriculum and per folder.
+
+    problems maps problem ids to folder_id / curriculum_id. extra_groupings
+    adds groupings by name, each a group id (or None) per entry of problems.
+    Returns plain dicts keyed by group id; the caller attaches names.
+    """
+    valid = ~np.isnan(columns.time_spent)
+
+    # Map each log to its problem's position in the problems list
+    problem_ids = np.array([p['problem_id'] for p in problems], dtype=np.int64)
+    order = np.argsort(problem_ids)
+    sorted_ids = problem_ids[order]
+    pos = np.searchsorted(sorted_ids, columns.problem_id)
+    pos = np.minimum(pos, max(len(sorted_ids) - 1, 0))
+    known = (sorted_ids[pos] == columns.problem_id) if len(sorted_ids) else np.zeros(len(columns), dtype=bool)
+    log_problem = np.where(known, order[pos] if len(order) else 0, -1)
+
+    # First and latest timed attempt of each problem
+    timed = np.flatnonzero(valid & known)
+    by_problem_then_time = timed[np.lexsort((columns.created_at[timed], log_problem[timed]))]
+    lp = log_problem[by_problem_then_time]
+    boundaries = np.flatnonzero(np.diff(lp)) + 1
+    first_idx = by_problem_then_time[np.concatenate([[0], boundaries])] if len(lp) else np.empty(0, np.int64)
+    last_idx = by_problem_then_time[np.concatenate([boundaries - 1, [len(lp) - 1]])] if len(lp) else np.empty(0, np.int64)
+    first_problem = lp[np.concatenate([[0], boundaries])] if len(lp) else np.empty(0, np.int64)
+
+    trend_start = now - weeks * WEEK_SECONDS
+    result = {"weeks": weeks, "trend_start": trend_start}
+
+    groupings = {
+        "overall": np.zeros(len(problems), dtype=np.int64),
+        "curriculum": np.array([p['curriculum_id'] or -1 for p in problems], dtype=np.int64),
+        "folder": np.array([p['folder_id'] or -1 for p in problems], dtype=np.int64),
+    }
+    for name, group_of in (extra_groupings or {}).items():
+        groupings[name] = np.array([-1 if g is None else g for g in group_of], dtype=np.int64)
+    for name, problem_group in groupings.items():
+        # Densify group ids into codes 0..n-1
+        group_ids, dense = np.unique(problem_group, return_inverse=True)
+        dense = np.where(problem_group >= 0, dense, -1)
+        keep = group_ids >= 0
+        remap = np.cumsum(keep) - 1
+        dense = np.where(dense >= 0, remap[dense], -1)
+        group_ids = group_ids[keep]
+
+        codes = np.where(log_problem >= 0, dense[np.maximum(log_problem, 0)], -1) if len(problems) else np.full(len(columns), -1)
+        problem_codes = dense[first_problem] if len(first_problem) else np.empty(0, np.int64)
+        stats = _group_stats(codes, len(group_ids), columns, valid, first_idx, last_idx,
+                             problem_codes, trend_start, weeks)
+
+        items = {}
+        for i, group_id in enumerate(group_ids):
+            if stats["attempts"][i] == 0:
+                continue
+            weekly = []
+            for w in range(weeks):
+                count = int(stats["week_counts"][i, w])
+                if count:
+                    weekly.append({
+                        "week_start": datetime.fromtimestamp(trend_start + w * WEEK_SECONDS, timezone.utc),
+                        "attempts": count,
+                        "mean_time": round(float(stats["week_sums"][i, w] / count), 2),
+                    })
+            items[int(group_id)] = {
+                "attempts": int(stats["attempts"][i]),
+                "mean_time": _nan_to_none(stats["mean"][i]),
+                "median_time": _nan_to_none(stats["median"][i]),
+                "p90_time": _nan_to_none(stats["p90"][i]),
+                "trend_per_week": _nan_to_none(stats["slope"][i]),
+                "weekly": weekly,
+                "resolved_problems": int(stats["resolved"][i]),
+                "mean_improvement": _nan_to_none(stats["mean_improvement"][i]),
+                "mean_improvement_rate": _nan_to_none(stats["mean_improvement_rate"][i]),
+            }
+        result[name] = items
+    return result
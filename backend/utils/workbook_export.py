@@ -0,0 +1,152 @@
+import json
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from utils.pdf_writer import PAGE_HEIGHT, PAGE_WIDTH, StreamingPdfWriter, wrap_text
+
+MARGIN = 40
+TITLE_SIZE = 14
+HINT_SIZE = 10
+LINE_GAP = 1.5
+
+
+def prefetch(items: List, fetch: Callable, concurrency: int) -> Iterator:
+    """
+    Yields (item, result) in order while keeping at most `concurrency`
+    fetches in flight, so only a bounded window of results is in memory.
+    Exceptions are yielded as results instead of raised.
+    """
+    def safe_fetch(item):
+        try:
+            return fetch(item)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        window = deque()
+        it = iter(items)
+        for item in it:
+            window.append((item, pool.submit(safe_fetch, item)))
+            if len(window) >= concurrency:
+                break
+        while window:
+            item, future = window.popleft()
+            next_item = next(it, None)
+            if next_item is not None:
+                window.append((next_item, pool.submit(safe_fetch, next_item)))
+            yield item, future.result()
+
+
+def _image_urls(problem: dict, include_answers: bool) -> List[Optional[str]]:
+    return [problem.get('problem_image_url'), problem.get('answer_image_url') if include_answers else None]
+
+
+class _ChunkBuffer:
+    """Write-only file object that collects bytes until drained (for streaming zipfile)."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(problems: List[dict], hints: Dict[int, List[dict]], fetch_image: Callable[[str], bytes],
+             include_answers: bool, concurrency: int) -> Iterable[bytes]:
+    """Streams a ZIP of the problem (and answer) images plus manifest.json."""
+    buffer = _ChunkBuffer()
+    manifest = []
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for index, (problem, images) in enumerate(
+                prefetch(problems, lambda p: [fetch_image(u) if u else None for u in _image_urls(p, include_answers)],
+                         concurrency), start=1):
+            entry = {
+                "problem_id": problem['problem_id'],
+                "title": problem['title'],
+                "folder_id": problem.get('folder_id'),
+                "curriculum_id": problem.get('curriculum_id'),
+                "hints": [h['content'] for h in hints.get(problem['problem_id'], [])],
+            }
+            if isinstance(images, Exception):
+                entry["error"] = str(images)
+                images = [None, None]
+            for kind, url, data in zip(("problem", "answer"), _image_urls(problem, include_answers), images):
+                if data is None:
+                    continue
+                ext = url.rsplit('.', 1)[-1].split('?', 1)[0].lower() if '.' in url else 'jpg'
+                name = f"{index:03d}_{problem['problem_id']}_{kind}.{ext}"
+                info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+                # Images are already compressed
+                info.compress_type = zipfile.ZIP_STORED
+                zf.writestr(info, data)
+                entry[f"{kind}_image"] = name
+                yield buffer.drain()
+            manifest.append(entry)
+
+        info = zipfile.ZipInfo("manifest.json", date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        zf.writestr(info, json.dumps({"problems": manifest}, ensure_ascii=False, indent=2))
+    yield buffer.drain()
+
+
+def _image_page(writer: StreamingPdfWriter, title: str, image, hint_lines: List[str]) -> bytes:
+    texts = []
+    y = PAGE_HEIGHT - MARGIN - TITLE_SIZE
+    for line in wrap_text(title, TITLE_SIZE, PAGE_WIDTH - 2 * MARGIN):
+        texts.append((MARGIN, y, TITLE_SIZE, line))
+        y -= TITLE_SIZE * LINE_GAP
+
+    hint_height = len(hint_lines) * HINT_SIZE * LINE_GAP
+    images = []
+    if image is not None:
+        jpeg, px_w, px_h = image
+        max_w = PAGE_WIDTH - 2 * MARGIN
+        max_h = y - MARGIN - hint_height - HINT_SIZE
+        scale = min(max_w / px_w, max_h / px_h)
+        w, h = px_w * scale, px_h * scale
+        images.append((jpeg, px_w, px_h, MARGIN, y - h, w, h))
+        y -= h + HINT_SIZE * 2
+
+    for line in hint_lines:
+        texts.append((MARGIN, y, HINT_SIZE, line))
+        y -= HINT_SIZE * LINE_GAP
+    return writer.add_page(images, texts)
+
+
+def iter_pdf(problems: List[dict], hints: Dict[int, List[dict]], fetch_image: Callable[[str], bytes],
+             to_jpeg: Callable[[bytes], tuple], include_answers: bool, concurrency: int) -> Iterable[bytes]:
+    """
+    Streams a PDF with one page per problem (image and hints) and, if
+    include_answers, an answer page after each problem.
+    """
+    def fetch(problem):
+        return [to_jpeg(fetch_image(u)) if u else None for u in _image_urls(problem, include_answers)]
+
+    writer = StreamingPdfWriter()
+    yield writer.start()
+    for index, (problem, images) in enumerate(prefetch(problems, fetch, concurrency), start=1):
+        title = f"{index}. {problem['title']}"
+        hint_lines = []
+        for hint in hints.get(problem['problem_id'], []):
+            hint_lines.extend(wrap_text(f"힌트 {hint['step_number']}. {hint['content']}", HINT_SIZE, PAGE_WIDTH - 2 * MARGIN))
+
+        if isinstance(images, Exception):
+            hint_lines.insert(0, f"(이미지를 불러오지 못했습니다: {images})")
+            images = [None, None]
+
+        yield _image_page(writer, title, images[0], hint_lines)
+        if include_answers and images[1] is not None:
+            yield _image_page(writer, f"{title} - 정답", images[1], [])
+    yield writer.finish()
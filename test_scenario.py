@@ -1,122 +1,549 @@
-import requests
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import struct
+import subprocess
+import sys
+import tempfile
 import time
 import uuid
+import zlib
+from collections import deque
+
+import httpx
 
 BASE_URL = "http://localhost:8000/api/v1"
 
-def run_test():
-    print("Starting API Scenario Test...")
-    
-    # Generate random user credentials
-    random_str = str(uuid.uuid4())[:8]
-    username = f"testuser_{random_str}"
-    password = "testpassword"
-    email = f"{username}@example.com"
-    
-    # 1. Register
-    print(f"\n1. Registering user: {username}")
-    reg_data = {"username": username, "password": password, "email": email}
-    resp = requests.post(f"{BASE_URL}/register", json=reg_data)
-    if resp.status_code != 200:
-        print(f"Registration failed: {resp.text}")
-        return
-    user_id = resp.json()['user_id']
-    print(f"   -> Registered successfully. User ID: {user_id}")
-    
-    # 2. Login
-    print("\n2. Logging in")
-    login_data = {"username": username, "password": password}
-    resp = requests.post(f"{BASE_URL}/token", data=login_data)
-    if resp.status_code != 200:
-        print(f"Login failed: {resp.text}")
-        return
-    token = resp.json()['access_token']
-    headers = {"Authorization": f"Bearer {token}"}
-    print("   -> Logged in successfully.")
-    
-    # 3. Create Folder
-    print("\n3. Creating Folder")
-    folder_data = {"name": "Test Math Workbook"}
-    resp = requests.post(f"{BASE_URL}/folders", json=folder_data, headers=headers)
-    if resp.status_code != 200:
-        print(f"Create folder failed: {resp.text}")
-        return
-    folder = resp.json()
-    folder_id = folder['folder_id']
-    print(f"   -> Folder created: {folder['name']} (ID: {folder_id})")
-    
-    # 4. Create Curriculum
-    print("\n4. Creating Curriculum")
-    curr_data = {"name": "Calculus I", "level": 1, "sort_order": 1}
-    resp = requests.post(f"{BASE_URL}/curriculums", json=curr_data, headers=headers)
-    if resp.status_code != 200:
-        print(f"Create curriculum failed: {resp.text}")
-        return
-    curr = resp.json()
-    curr_id = curr['curriculum_id']
-    print(f"   -> Curriculum created: {curr['name']} (ID: {curr_id})")
-    
-    # 5. Create Problem
-    print("\n5. Creating Problem")
-    prob_data = {
-        "title": "Derivative of x^2",
-        "folder_id": folder_id,
-        "curriculum_id": curr_id,
-        "hints": ["Power rule", "n*x^(n-1)"]
-    }
-    resp = requests.post(f"{BASE_URL}/problems", json=prob_data, headers=headers)
-    if resp.status_code != 200:
-        print(f"Create problem failed: {resp.text}")
-        return
-    problem = resp.json()
-    problem_id = problem['problem_id']
-    print(f"   -> Problem created: {problem['title']} (ID: {problem_id})")
-    
-    # 6. Create Study Session
-    print("\n6. Creating Study Session")
-    session_data = {
-        "name": "Midterm Prep",
-        "mode": "all",
-        "folder_ids": [folder_id],
-        "curriculum_ids": [curr_id]
-    }
-    resp = requests.post(f"{BASE_URL}/sessions", json=session_data, headers=headers)
-    if resp.status_code != 200:
-        print(f"Create session failed: {resp.text}")
-        return
-    session = resp.json()
-    session_id = session['study_session_id']
-    print(f"   -> Session created: {session['name']} (ID: {session_id})")
-    
-    # 7. Get Session Problems
-    print("\n7. Fetching Session Problems")
-    resp = requests.get(f"{BASE_URL}/sessions/{session_id}/problems", headers=headers)
-    if resp.status_code != 200:
-        print(f"Get session problems failed: {resp.text}")
-        return
-    problems = resp.json()
-    print(f"   -> Found {len(problems)} problems in session.")
-    if len(problems) == 0:
-        print("   !! No problems found, check logic.")
-    
-    # 8. Solve Problem
-    print("\n8. Solving Problem")
-    solve_data = {
-        "study_session_id": session_id,
-        "solution": "2x",
-        "is_correct": True,
-        "time_spent": 45
-    }
-    resp = requests.post(f"{BASE_URL}/problems/{problem_id}/solve", json=solve_data, headers=headers)
-    if resp.status_code != 200:
-        print(f"Solve problem failed: {resp.text}")
-        return
-    print("   -> Problem solved and log saved.")
-    
-    print("\n✅ All tests passed successfully!")
+# API scenario test and load generator.
+#
+#   python test_scenario.py
+#       One user registers, logs in, sets up a folder, problems and a study
+#       session, then runs every scenario once. Exits 1 on any failed request.
+#
+#   python test_scenario.py --users 50 --duration 120 --ramp-up 30
+#       Closed model: up to 50 virtual users, each running scenarios back to
+#       back with --think-time pauses. Users are added linearly over 30 s.
+#
+#   python test_scenario.py --users 200 --arrival-rate 40 --stages 30:10,60:40,30:0
+#       Open model: scenario iterations start at a fixed rate (here ramping to
+#       10/s, then 40/s, then down) on whichever virtual user is idle. When all
+#       users are busy the iteration is dropped and counted.
+#
+#   python test_scenario.py --local --users 20 --duration 60 --db-latency 0.01
+#       Starts the in-memory Supabase stand-in (backend/benchmarks/supabase_stub.py)
+#       and a uvicorn server on it first, so capacity can be measured without a
+#       live backend.
+#
+# --mix sets the scenario weights, e.g. browse=5,open=3,solve=3,register=1,stats=1.
+# The report (per-endpoint throughput, latency percentiles, status codes and
+# error rates) is printed as text; --json writes it to a file as well.
 
-if __name__ == "__main__":
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+
+SCENARIOS = ("browse", "open", "solve", "register", "stats")
+DEFAULT_MIX = "browse=5,open=3,solve=3,register=1,stats=1"
+PERCENTILES = (50, 90, 95, 99)
+
+
+# --- Images ---
+
+def make_png(width: int, height: int, seed: int) -> bytes:
+    """A grayscale page with a few dark blocks, different for every seed."""
+    rng = random.Random(seed)
+    pixels = [bytearray([235]) * width for _ in range(height)]
+    for _ in range(rng.randint(4, 9)):
+        x0, y0 = rng.randrange(width - 20), rng.randrange(height - 10)
+        x1, y1 = min(width, x0 + rng.randint(20, width // 2)), min(height, y0 + rng.randint(6, height // 4))
+        shade = rng.randint(10, 120)
+        for y in range(y0, y1):
+            pixels[y][x0:x1] = bytes([shade]) * (x1 - x0)
+    raw = b"".join(b"\x00" + bytes(row) for row in pixels)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b""))
+
+
+# --- Recording ---
+
+def percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def latency_summary(values: list) -> dict:
+    values = sorted(values)
+    summary = {"mean": sum(values) / len(values) if values else 0.0}
+    for p in PERCENTILES:
+        summary[f"p{p}"] = percentile(values, p)
+    summary["max"] = values[-1] if values else 0.0
+    return summary
+
+
+class Recorder:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.endpoints = {}   # "GET /problems/{id}" -> {"latencies": [...], "status": {...}, "errors": n}
+        self.scenarios = {}   # name -> {"latencies": [...], "failed": n}
+        self.timeline = {}    # second -> {"requests", "errors", "vus"}
+        self.dropped = 0
+        self.active_vus = 0
+        self.failures = []
+
+    def _second(self) -> dict:
+        second = int(time.perf_counter() - self.started)
+        return self.timeline.setdefault(second, {"requests": 0, "errors": 0, "vus": self.active_vus})
+
+    def request(self, name: str, elapsed: float, status: str, error: bool):
+        entry = self.endpoints.setdefault(name, {"latencies": [], "status": {}, "errors": 0})
+        entry["latencies"].append(elapsed * 1000)
+        entry["status"][status] = entry["status"].get(status, 0) + 1
+        second = self._second()
+        second["requests"] += 1
+        second["vus"] = max(second["vus"], self.active_vus)
+        if error:
+            entry["errors"] += 1
+            second["errors"] += 1
+
+    def scenario(self, name: str, elapsed: float, ok: bool):
+        entry = self.scenarios.setdefault(name, {"latencies": [], "failed": 0})
+        if ok:
+            entry["latencies"].append(elapsed * 1000)
+        else:
+            entry["failed"] += 1
+
+    def report(self, config: dict) -> dict:
+        duration = time.perf_counter() - self.started
+        total = sum(len(e["latencies"]) for e in self.endpoints.values())
+        errors = sum(e["errors"] for e in self.endpoints.values())
+        endpoints = {}
+        for name in sorted(self.endpoints):
+            entry = self.endpoints[name]
+            count = len(entry["latencies"])
+            endpoints[name] = {
+                "requests": count,
+                "throughput_rps": count / duration,
+                "errors": entry["errors"],
+                "error_rate": entry["errors"] / count,
+                "status": dict(sorted(entry["status"].items())),
+                "latency_ms": latency_summary(entry["latencies"]),
+            }
+        scenarios = {}
+        for name in sorted(self.scenarios):
+            entry = self.scenarios[name]
+            scenarios[name] = {
+                "completed": len(entry["latencies"]),
+                "failed": entry["failed"],
+                "throughput_per_s": len(entry["latencies"]) / duration,
+                "duration_ms": latency_summary(entry["latencies"]),
+            }
+        all_latencies = [v for e in self.endpoints.values() for v in e["latencies"]]
+        return {
+            "config": config,
+            "duration_s": duration,
+            "requests": total,
+            "throughput_rps": total / duration if duration else 0.0,
+            "errors": errors,
+            "error_rate": errors / total if total else 0.0,
+            "latency_ms": latency_summary(all_latencies),
+            "dropped_iterations": self.dropped,
+            "scenarios": scenarios,
+            "endpoints": endpoints,
+            "timeline": [{"second": s, **self.timeline[s]} for s in sorted(self.timeline)],
+            "failures": self.failures[:20],
+        }
+
+
+def print_report(report: dict):
+    c = report["config"]
+    model = f"arrival rate {c['arrival_rate']}/s" if c["arrival_rate"] else f"think time {c['think_time']} s"
+    print(f"\n{c['users']} virtual users, {model}, {report['duration_s']:.1f} s against {c['base_url']}")
+    print(f"{report['requests']} requests, {report['throughput_rps']:.1f} req/s, "
+          f"{report['errors']} errors ({report['error_rate'] * 100:.2f}%), "
+          f"{report['dropped_iterations']} dropped iterations")
+    lat = report["latency_ms"]
+    print(f"latency ms: p50 {lat['p50']:.1f}  p90 {lat['p90']:.1f}  p95 {lat['p95']:.1f}  p99 {lat['p99']:.1f}  max {lat['max']:.1f}")
+
+    print(f"\n{'scenario':<10} {'done':>7} {'failed':>7} {'iter/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for name, s in report["scenarios"].items():
+        d = s["duration_ms"]
+        print(f"{name:<10} {s['completed']:>7} {s['failed']:>7} {s['throughput_per_s']:>8.2f} "
+              f"{d['p50']:>9.1f} {d['p95']:>9.1f} {d['max']:>9.1f}")
+
+    width = max([len(name) for name in report["endpoints"]] + [8])
+    print(f"\n{'endpoint':<{width}} {'reqs':>7} {'req/s':>7} {'err%':>6} {'mean':>8} {'p50':>8} {'p90':>8} "
+          f"{'p95':>8} {'p99':>8} {'max':>8}  status")
+    for name, e in report["endpoints"].items():
+        d = e["latency_ms"]
+        status = " ".join(f"{code}:{n}" for code, n in e["status"].items())
+        print(f"{name:<{width}} {e['requests']:>7} {e['throughput_rps']:>7.1f} {e['error_rate'] * 100:>6.1f} "
+              f"{d['mean']:>8.1f} {d['p50']:>8.1f} {d['p90']:>8.1f} {d['p95']:>8.1f} {d['p99']:>8.1f} {d['max']:>8.1f}  {status}")
+    for failure in report["failures"]:
+        print(f"  ! {failure}")
+
+
+# --- Virtual users ---
+
+class ScenarioFailed(Exception):
+    pass
+
+
+class VirtualUser:
+    def __init__(self, index: int, client: httpx.AsyncClient, recorder: Recorder, images: list, seed_problems: int):
+        self.index = index
+        self.client = client
+        self.recorder = recorder
+        self.images = images
+        self.seed_problems = seed_problems
+        self.rng = random.Random(index)
+        self.headers = {}
+        self.ready = False
+        self.folder_ids = []
+        self.curriculum_ids = []
+        self.problem_ids = []
+        self.session_id = None
+
+    async def call(self, name: str, method: str, path: str, expect=(200,), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers=self.headers, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.request(name, time.perf_counter() - start, type(e).__name__, True)
+            self.recorder.failures.append(f"{name}: {type(e).__name__} {e}")
+            raise ScenarioFailed(name)
+        ok = response.status_code in expect
+        self.recorder.request(name, time.perf_counter() - start, str(response.status_code), not ok)
+        if not ok:
+            self.recorder.failures.append(f"{name}: {response.status_code} {response.text[:200]}")
+            raise ScenarioFailed(name)
+        return response.json() if response.headers.get("content-type", "").startswith("application/json") else response
+
+    async def setup(self):
+        username = f"load_{uuid.uuid4().hex[:10]}"
+        password = "load-test-password"
+        await self.call("POST /register", "POST", "/register",
+                        json={"username": username, "password": password, "email": f"{username}@example.com"})
+        token = await self.call("POST /token", "POST", "/token", data={"username": username, "password": password})
+        self.headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+        folder = await self.call("POST /folders", "POST", "/folders", json={"name": f"Workbook {self.index}"})
+        self.folder_ids = [folder["folder_id"]]
+        curriculums = await self.call("GET /curriculums", "GET", "/curriculums")
+        self.curriculum_ids = [c["curriculum_id"] for c in curriculums] or [None]
+        for _ in range(self.seed_problems):
+            await self.register_problem()
+        session = await self.call("POST /sessions", "POST", "/sessions",
+                                  json={"name": "Load test", "mode": "all", "folder_ids": self.folder_ids})
+        self.session_id = session["study_session_id"]
+        self.ready = True
+
+    async def register_problem(self):
+        content, answer = self.rng.sample(self.images, 2)
+        data = {"title": f"Problem {len(self.problem_ids) + 1}", "folder_id": str(self.rng.choice(self.folder_ids)),
+                "hints": "Read the question,Draw a diagram"}
+        curriculum_id = self.rng.choice(self.curriculum_ids)
+        if curriculum_id is not None:
+            data["curriculum_id"] = str(curriculum_id)
+        problem = await self.call("POST /problems", "POST", "/problems", data=data, files={
+            "content_image": ("content.png", content, "image/png"),
+            "answer_image": ("answer.png", answer, "image/png"),
+        })
+        self.problem_ids.append(problem["problem_id"])
+
+    # Scenarios
+
+    async def browse(self):
+        await self.call("GET /folders", "GET", "/folders")
+        await self.call("GET /curriculums", "GET", "/curriculums")
+        await self.call("GET /problems?folder_id", "GET", "/problems", params={"folder_id": self.rng.choice(self.folder_ids)})
+        await self.call("GET /problems?status", "GET", "/problems",
+                        params={"folder_id": self.rng.choice(self.folder_ids), "status": self.rng.choice(["wrong", "not_attempted"])})
+        await self.call("GET /recent-targets", "GET", "/recent-targets")
+
+    async def open(self):
+        if not self.problem_ids:
+            return await self.register()
+        ids = self.rng.sample(self.problem_ids, min(5, len(self.problem_ids)))
+        await self.call("GET /problems/details", "GET", "/problems/details", params=[("ids", i) for i in ids])
+        await self.call("GET /problems/{id}", "GET", f"/problems/{ids[0]}")
+        await self.call("GET /problems/{id}/image", "GET", f"/problems/{ids[0]}/image", params={"width": 320})
+        await self.call("GET /problems/{id}/similar", "GET", f"/problems/{ids[0]}/similar")
+
+    async def solve(self):
+        problems = await self.call("GET /sessions/{id}/problems", "GET", f"/sessions/{self.session_id}/problems")
+        if not problems:
+            return
+        for problem in self.rng.sample(problems, min(2, len(problems))):
+            await self.call("POST /problems/{id}/solve", "POST", f"/problems/{problem['problem_id']}/solve", json={
+                "study_session_id": self.session_id,
+                "solution": "x = 2",
+                "is_correct": self.rng.random() < 0.7,
+                "time_spent": self.rng.randint(20, 300),
+            })
+
+    async def register(self):
+        await self.register_problem()
+
+    async def stats(self):
+        await self.call("GET /statistics", "GET", "/statistics")
+        await self.call("GET /statistics/time", "GET", "/statistics/time")
+        await self.call("GET /statistics/curriculums", "GET", "/statistics/curriculums")
+        await self.call("GET /activity", "GET", "/activity")
+
+    async def iterate(self, scenario: str):
+        start = time.perf_counter()
+        try:
+            if not self.ready:
+                await self.setup()
+                self.recorder.scenario("setup", time.perf_counter() - start, True)
+                start = time.perf_counter()
+            await getattr(self, scenario)()
+            self.recorder.scenario(scenario, time.perf_counter() - start, True)
+        except ScenarioFailed:
+            self.recorder.scenario(scenario if self.ready else "setup", time.perf_counter() - start, False)
+
+
+# --- Schedules ---
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def parse_stages(text: str) -> list:
+    """'30:10,60:50' -> [(30.0, 10.0), (60.0, 50.0)]: ramp to each target over each duration."""
+    stages = []
+    for item in text.split(","):
+        duration, _, target = item.partition(":")
+        stages.append((float(duration), float(target)))
+    return stages
+
+
+def target_at(stages: list, elapsed: float) -> float:
+    previous = 0.0
+    for duration, target in stages:
+        if elapsed < duration:
+            return previous + (target - previous) * (elapsed / duration if duration else 1)
+        elapsed -= duration
+        previous = target
+    return previous
+
+
+async def run_closed(vus: list, stages: list, mix: dict, think_time: float, deadline: float, recorder: Recorder):
+    started = time.perf_counter()
+    names, weights = list(mix), list(mix.values())
+
+    async def loop(vu: VirtualUser):
+        active = False
+        while time.perf_counter() < deadline:
+            if vu.index >= target_at(stages, time.perf_counter() - started):
+                if active:
+                    active = False
+                    recorder.active_vus -= 1
+                await asyncio.sleep(0.1)
+                continue
+            if not active:
+                active = True
+                recorder.active_vus += 1
+            await vu.iterate(vu.rng.choices(names, weights)[0])
+            if think_time:
+                await asyncio.sleep(vu.rng.uniform(0.5, 1.5) * think_time)
+        if active:
+            recorder.active_vus -= 1
+
+    await asyncio.gather(*(loop(vu) for vu in vus))
+
+
+async def run_open(vus: list, stages: list, mix: dict, deadline: float, grace: float, recorder: Recorder):
+    started = time.perf_counter()
+    names, weights = list(mix), list(mix.values())
+    rng = random.Random(0)
+    idle = deque(vus)  # least recently used first, so the load spreads over all users
+    running = set()
+    due = 0.0
+    last = started
+
+    async def run(vu: VirtualUser, scenario: str):
+        recorder.active_vus += 1
+        try:
+            await vu.iterate(scenario)
+        finally:
+            recorder.active_vus -= 1
+            idle.append(vu)
+
+    while time.perf_counter() < deadline:
+        now = time.perf_counter()
+        due += target_at(stages, now - started) * (now - last)
+        last = now
+        while due >= 1:
+            due -= 1
+            if not idle:
+                recorder.dropped += 1
+                continue
+            task = asyncio.create_task(run(idle.popleft(), rng.choices(names, weights)[0]))
+            running.add(task)
+            task.add_done_callback(running.discard)
+        await asyncio.sleep(0.01)
+    if running:
+        await asyncio.wait(running, timeout=grace)
+
+
+async def run_smoke(vu: VirtualUser, mix: dict, recorder: Recorder):
+    for scenario in ["setup"] + list(mix):
+        start = time.perf_counter()
+        try:
+            await (vu.setup() if scenario == "setup" else getattr(vu, scenario)())
+            ok = True
+        except ScenarioFailed:
+            ok = False
+        recorder.scenario(scenario, time.perf_counter() - start, ok)
+        print(f"   {'ok' if ok else 'FAILED':<6} {scenario} ({(time.perf_counter() - start) * 1000:.0f} ms)")
+        if not ok and scenario == "setup":
+            return
+
+
+async def run(args) -> dict:
+    mix = args.mix
+    smoke = args.duration is None and args.stages is None
+    if args.stages:
+        stages = parse_stages(args.stages)
+    else:
+        target = args.arrival_rate or args.users
+        stages = [(args.ramp_up, target), (args.duration or 0, target)]
+    duration = sum(d for d, _ in stages)
+    users = 1 if smoke else args.users
+
+    images = [make_png(480, 640, seed) for seed in range(max(4, min(users, 32)))]
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=users + 10, max_keepalive_connections=users + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        vus = [VirtualUser(i, client, recorder, images, args.seed_problems) for i in range(users)]
+        if smoke:
+            print(f"Running every scenario once against {args.base_url}")
+            await run_smoke(vus[0], mix, recorder)
+        elif args.arrival_rate:
+            await run_open(vus, stages, mix, time.perf_counter() + duration, args.grace, recorder)
+        else:
+            await run_closed(vus, stages, mix, args.think_time, time.perf_counter() + duration, recorder)
+
+    return recorder.report({
+        "base_url": args.base_url,
+        "users": users,
+        "arrival_rate": args.arrival_rate,
+        "think_time": args.think_time,
+        "stages": stages,
+        "mix": mix,
+        "seed_problems": args.seed_problems,
+        "smoke": smoke,
+    })
+
+
+# --- Local server ---
+
+def wait_for(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready in {timeout:.0f} s")
+
+
+def start_local(args, work_dir: str) -> list:
+    stub_port, api_port = args.stub_port, args.port
+    stub = subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "supabase_stub.py"),
+                             "--port", str(stub_port), "--latency", str(args.db_latency)], cwd=BACKEND_DIR)
+    env = dict(os.environ)
+    env.update({
+        "SUPABASE_URL": f"http://127.0.0.1:{stub_port}",
+        "SUPABASE_KEY": "stub.stub.stub",
+        "JOB_DB_PATH": os.path.join(work_dir, "jobs.db"),
+        "IMAGE_CACHE_DIR": os.path.join(work_dir, "image_cache"),
+        "IMPORT_DIR": os.path.join(work_dir, "imports"),
+        "STORAGE_CHECK_CACHE": os.path.join(work_dir, "storage_check.json"),
+        "VERSION_TABLE_PATH": os.path.join(work_dir, "versions.bin"),
+    })
+    api = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(api_port),
+                            "--workers", str(args.workers), "--log-level", "warning"], cwd=BACKEND_DIR, env=env)
+    processes = [stub, api]
     try:
-        run_test()
-    except Exception as e:
-        print(f"\n❌ Test failed with exception: {e}")
+        wait_for(f"http://127.0.0.1:{stub_port}/__stub/stats", stub)
+        wait_for(f"http://127.0.0.1:{api_port}/api/v1/ready", api)
+    except Exception:
+        stop_local(processes)
+        raise
+    args.base_url = f"http://127.0.0.1:{api_port}/api/v1"
+    return processes
+
+
+def stop_local(processes: list):
+    # The API first, so its shutdown flushes still reach the stand-in
+    for process in reversed(processes):
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API scenario test and load generator")
+    parser.add_argument("--base-url", default=os.environ.get("BASE_URL", BASE_URL))
+    parser.add_argument("--users", type=int, default=10, help="Virtual users (the pool size in the open model)")
+    parser.add_argument("--duration", type=float, help="Seconds at full load after the ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=0, help="Seconds to ramp up from zero to full load")
+    parser.add_argument("--stages", help="Ramp schedule as seconds:target pairs, e.g. 30:10,60:50,30:0 "
+                                         "(target is users, or iterations/s with --arrival-rate)")
+    parser.add_argument("--arrival-rate", type=float, help="Scenario iterations started per second (open model)")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean pause between a user's iterations (closed model)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"Scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument("--seed-problems", type=int, default=3, help="Problems each user registers during setup")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--grace", type=float, default=10, help="Seconds to let running iterations finish at the end")
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--local", action="store_true", help="Start the Supabase stand-in and uvicorn before the run")
+    parser.add_argument("--port", type=int, default=8765, help="API port with --local")
+    parser.add_argument("--stub-port", type=int, default=54321, help="Supabase stand-in port with --local")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --local")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="Seconds the stand-in adds to every call with --local")
+    args = parser.parse_args()
+    if args.arrival_rate and args.stages is None and args.duration is None:
+        parser.error("--arrival-rate needs --duration or --stages")
+
+    processes = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        if args.local:
+            processes = start_local(args, work_dir)
+        try:
+            report = asyncio.run(run(args))
+        finally:
+            stop_local(processes)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json}")
+    if report["config"]["smoke"] and (report["errors"] or any(s["failed"] for s in report["scenarios"].values())):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()